@@ -1,5 +1,6 @@
 import asyncio
 from logging.config import fileConfig
+import re
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
@@ -26,6 +27,21 @@ if config.config_file_name is not None:
 # target_metadata is important for autogenerate support
 target_metadata = Base.metadata
 
+# Created by migrations outside the models: the search indexes (the FTS5
+# table and its shadow tables on SQLite, trigram GIN indexes on Postgres)
+# and the monthly token partitions. Autogenerate must not drop them.
+UNMANAGED_TABLES = re.compile(r"users_fts(_\w+)?|tokens_p\d{6}|tokens_default|tokens_unpartitioned")
+UNMANAGED_INDEXES = {"ix_users_name_trgm", "ix_users_email_trgm"}
+
+def include_object(object, name, type_, reflected, compare_to):
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == "table":
+        return not UNMANAGED_TABLES.fullmatch(name)
+    if type_ == "index":
+        return name not in UNMANAGED_INDEXES
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
     url = settings.DATABASE_URL
@@ -34,6 +50,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -53,7 +70,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,68 @@
+"""Add user search indexes
+
+Revision ID: 4f2b9c7e1a3d
+Revises: cabb2a24a8c5
+Create Date: 2026-10-18 09:12:03.184512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2b9c7e1a3d'
+down_revision: Union[str, None] = 'cabb2a24a8c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        # Trigram GIN indexes let ILIKE '%term%' use an index scan
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)")
+
+    elif dialect == "sqlite":
+        # External content FTS5 table over users, kept in sync by triggers.
+        # The trigram tokenizer serves LIKE '%term%' from the index.
+        op.execute(
+            "CREATE VIRTUAL TABLE users_fts USING fts5("
+            "name, email, content='users', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER users_fts_ai AFTER INSERT ON users BEGIN "
+            "INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER users_fts_ad AFTER DELETE ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER users_fts_au AFTER UPDATE OF name, email ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+            "INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email); "
+            "END"
+        )
+        # Index the rows that already exist
+        op.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_users_email_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_users_name_trgm")
+
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS users_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS users_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS users_fts_ai")
+        op.execute("DROP TABLE IF EXISTS users_fts")
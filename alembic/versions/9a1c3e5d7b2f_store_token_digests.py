@@ -0,0 +1,74 @@
+"""Store token digests instead of raw tokens
+
+Revision ID: 9a1c3e5d7b2f
+Revises: 4f2b9c7e1a3d
+Create Date: 2026-10-18 10:41:27.559031
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a1c3e5d7b2f'
+down_revision: Union[str, None] = '4f2b9c7e1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+tokens = sa.table(
+    'tokens',
+    sa.column('id', sa.Integer()),
+    sa.column('token', sa.String()),
+    sa.column('token_digest', sa.String()),
+)
+
+
+def upgrade() -> None:
+    op.add_column('tokens', sa.Column('token_digest', sa.String(length=64), nullable=True))
+
+    # Backfill digests of the existing tokens in batches
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(tokens.c.id, tokens.c.token)
+            .where(tokens.c.id > last_id)
+            .order_by(tokens.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            tokens.update().where(tokens.c.id == sa.bindparam('row_id')),
+            [
+                {'row_id': row.id, 'token_digest': hashlib.sha256(row.token.encode()).hexdigest()}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('tokens') as batch_op:
+        batch_op.alter_column('token_digest', existing_type=sa.String(length=64), nullable=False)
+        batch_op.drop_index('ix_tokens_token')
+        batch_op.drop_column('token')
+        batch_op.create_index('ix_tokens_token_digest_type', ['token_digest', 'type'], unique=False)
+
+
+def downgrade() -> None:
+    # Raw tokens cannot be recovered from their digests, so the restored
+    # column holds the digest and every stored token stops matching.
+    with op.batch_alter_table('tokens') as batch_op:
+        batch_op.drop_index('ix_tokens_token_digest_type')
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=True))
+
+    op.execute(tokens.update().values(token=tokens.c.token_digest))
+
+    with op.batch_alter_table('tokens') as batch_op:
+        batch_op.alter_column('token', existing_type=sa.String(), nullable=False)
+        batch_op.create_index('ix_tokens_token', ['token'], unique=False)
+        batch_op.drop_column('token_digest')
@@ -0,0 +1,30 @@
+"""Add replication heartbeat
+
+Revision ID: b7c2e4a9d1f3
+Revises: 6e3d8b1f0c4a
+Create Date: 2026-10-18 17:42:36.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c2e4a9d1f3'
+down_revision: Union[str, None] = '6e3d8b1f0c4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('replication_heartbeat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('replication_heartbeat')
@@ -0,0 +1,335 @@
+"""
+Concurrent load test built from the api_tests scenarios.
+
+Each virtual user is an asyncio task with its own keep-alive connection
+that repeatedly picks a weighted workflow (register, login, refresh, list,
+get, update, delete). Latencies are recorded per endpoint; the summary is
+printed and written as JSON, and can be compared with a stored baseline:
+
+    python api_tests/load_test.py --concurrency 50 --duration 30 --output results.json
+    python api_tests/load_test.py --baseline baseline.json          # fails on regression
+    python api_tests/load_test.py --save-baseline baseline.json
+
+The auth routes are rate limited; start the server with
+RATE_LIMIT_ENABLED=false (or use --start-server, which does so).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from utils import BASE_URL
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "password123"
+USER_PASSWORD = "password123"
+
+DEFAULT_WEIGHTS = {
+    "list": 40,
+    "get": 25,
+    "login": 10,
+    "refresh": 10,
+    "update": 7,
+    "register": 5,
+    "delete": 3,
+}
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.recording = False
+
+    async def call(
+        self, client: httpx.AsyncClient, name: str, method: str, url: str, expected: int, **kwargs: Any
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as exc:
+            response, status = None, type(exc).__name__
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.latencies.setdefault(name, []).append(elapsed)
+            if status != str(expected):
+                errors = self.errors.setdefault(name, {})
+                errors[status] = errors.get(status, 0) + 1
+        if response is None or response.status_code != expected:
+            return None
+        return response
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class VirtualUser:
+    """One client session replaying the api_tests scenarios."""
+
+    def __init__(self, base_url: str, recorder: Recorder, admin_token: str, user_ids: List[int]):
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=30, limits=httpx.Limits(max_connections=1))
+        self.recorder = recorder
+        self.admin_headers = {"Authorization": f"Bearer {admin_token}"}
+        self.user_ids = user_ids
+        self.refresh_token: Optional[str] = None
+
+    async def register(self) -> None:
+        # A1.auth_register.py
+        payload = {
+            "name": "Test User Automator",
+            "email": f"load_{uuid.uuid4().hex}@example.com",
+            "password": USER_PASSWORD,
+            "role": "user",
+        }
+        response = await self.recorder.call(self.client, "POST /auth/register", "POST", "/auth/register", 201, json=payload)
+        if response is not None:
+            self.refresh_token = response.json()["tokens"]["refresh"]["token"]
+
+    async def login(self) -> None:
+        # A2.auth_login.py
+        payload = {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        response = await self.recorder.call(self.client, "POST /auth/login", "POST", "/auth/login", 200, json=payload)
+        if response is not None:
+            self.refresh_token = response.json()["tokens"]["refresh"]["token"]
+
+    async def refresh(self) -> None:
+        # A3.auth_refresh.py
+        if self.refresh_token is None:
+            await self.login()
+            return
+        response = await self.recorder.call(
+            self.client, "POST /auth/refresh-tokens", "POST", "/auth/refresh-tokens", 200,
+            json={"refreshToken": self.refresh_token},
+        )
+        self.refresh_token = response.json()["refresh"]["token"] if response is not None else None
+
+    async def list(self) -> None:
+        # B2.user_get_all.py
+        await self.recorder.call(
+            self.client, "GET /users", "GET", "/users/?page=1&limit=10&sortBy=created_at:desc", 200,
+            headers=self.admin_headers,
+        )
+
+    async def get(self) -> None:
+        # B3.user_get_one.py
+        await self.recorder.call(
+            self.client, "GET /users/{id}", "GET", f"/users/{random.choice(self.user_ids)}", 200,
+            headers=self.admin_headers,
+        )
+
+    async def update(self) -> None:
+        # B4.user_update.py
+        await self.recorder.call(
+            self.client, "PATCH /users/{id}", "PATCH", f"/users/{random.choice(self.user_ids)}", 200,
+            headers=self.admin_headers, json={"name": "Updated Name via Python"},
+        )
+
+    async def delete(self) -> None:
+        # B1.user_create.py followed by B5.user_delete.py
+        payload = {
+            "name": "Created Via Python",
+            "email": f"created_by_admin_{uuid.uuid4().hex}@example.com",
+            "password": USER_PASSWORD,
+            "role": "user",
+        }
+        response = await self.recorder.call(
+            self.client, "POST /users", "POST", "/users/", 201, headers=self.admin_headers, json=payload
+        )
+        if response is not None:
+            await self.recorder.call(
+                self.client, "DELETE /users/{id}", "DELETE", f"/users/{response.json()['id']}", 204,
+                headers=self.admin_headers,
+            )
+
+    async def run(self, workflows: List[str], weights: List[int], deadline: float) -> None:
+        try:
+            while time.monotonic() < deadline:
+                await getattr(self, random.choices(workflows, weights)[0])()
+        finally:
+            await self.client.aclose()
+
+
+async def setup(base_url: str, seed_users: int) -> Dict[str, Any]:
+    """Log in as admin and create the users that get/update target."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        response = await client.post("/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+        response.raise_for_status()
+        token = response.json()["tokens"]["access"]["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        user_ids = []
+        for _ in range(seed_users):
+            response = await client.post("/users/", headers=headers, json={
+                "name": "Load Test Seed",
+                "email": f"load_seed_{uuid.uuid4().hex}@example.com",
+                "password": USER_PASSWORD,
+                "role": "user",
+            })
+            response.raise_for_status()
+            user_ids.append(response.json()["id"])
+    return {"admin_token": token, "user_ids": user_ids}
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values.sort()
+        errors = sum(recorder.errors.get(name, {}).values())
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors,
+            "error_rate": errors / len(values),
+            "errors_by_status": recorder.errors.get(name, {}),
+            "throughput_rps": len(values) / duration,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {"total_requests": total, "throughput_rps": total / duration, "endpoints": endpoints}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_samples: int) -> List[str]:
+    """
+    List what regressed past `tolerance`: total throughput, and the p95/p99
+    and error rate of every endpoint with at least `min_samples` requests in
+    both runs (the workflow mix is random, so rare endpoints are too noisy).
+    """
+    regressions = []
+    if results["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {baseline['throughput_rps']:.1f} -> {results['throughput_rps']:.1f} req/s"
+        )
+    for name, before in baseline["endpoints"].items():
+        after = results["endpoints"].get(name)
+        if after is None or min(before["requests"], after["requests"]) < min_samples:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if after[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {before[key]:.1f} -> {after[key]:.1f}")
+        if after["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {before['error_rate']:.2%} -> {after['error_rate']:.2%}")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"{'endpoint':<26}{'reqs':>8}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, stats in results["endpoints"].items():
+        print(
+            f"{name:<26}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>9.1f}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+        )
+    print(f"total: {results['total_requests']} requests, {results['throughput_rps']:.1f} req/s (latencies in ms)")
+
+
+async def run_load(args: argparse.Namespace, weights: Dict[str, int]) -> Dict[str, Any]:
+    context = await setup(args.base_url, args.seed_users)
+    recorder = Recorder()
+    workflows = [name for name, weight in weights.items() if weight > 0]
+    start = time.monotonic()
+    users = [VirtualUser(args.base_url, recorder, context["admin_token"], context["user_ids"]) for _ in range(args.concurrency)]
+    tasks = [
+        asyncio.create_task(user.run(workflows, [weights[name] for name in workflows], start + args.warmup + args.duration))
+        for user in users
+    ]
+    await asyncio.sleep(args.warmup)
+    recorder.recording = True
+    measured_start = time.monotonic()
+    await asyncio.gather(*tasks)
+    return summarize(recorder, time.monotonic() - measured_start)
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "RATE_LIMIT_ENABLED": "false"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent load test of the API")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before recording")
+    parser.add_argument("--seed-users", type=int, default=20)
+    parser.add_argument(
+        "--weights", help='workflow weights as JSON, e.g. \'{"list": 1, "get": 1}\'; defaults to ' + json.dumps(DEFAULT_WEIGHTS)
+    )
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare with a results file and exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    parser.add_argument("--min-samples", type=int, default=50, help="skip endpoints with fewer requests when comparing")
+    parser.add_argument("--start-server", action="store_true", help="run uvicorn locally for the test")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --start-server")
+    args = parser.parse_args()
+
+    weights = {**DEFAULT_WEIGHTS, **json.loads(args.weights)} if args.weights else DEFAULT_WEIGHTS
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        parser.error(f"unknown workflows: {', '.join(sorted(unknown))}")
+
+    server = None
+    if args.start_server:
+        port = 3999
+        args.base_url = f"http://127.0.0.1:{port}/v1"
+        server = start_server(port, args.workers)
+    try:
+        results = asyncio.run(run_load(args, weights))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results["meta"] = {
+        "timestamp": time.time(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "weights": weights,
+    }
+    print_report(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_samples)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regression against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
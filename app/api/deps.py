@@ -1,43 +1,58 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, models, schemas
+from app import crud, schemas
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.principal import Principal, principal_cache
+from app.core.tokens import TokenError, token_codec
+from app.db.session import SessionLocal, replica_router
+
+# Requests whose reads may be served by a read replica
+READ_ONLY_METHODS = {"GET", "HEAD"}
 
 # This tells FastAPI that the token is found in the "Authorization: Bearer <token>" header
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
 )
 
-def get_db() -> Generator:
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependency that creates a new database session for each request
-    and closes it when the request is done.
+    Dependency that creates a new database session for each request.
+    The session is the request's unit of work: CRUD methods only flush, and
+    everything is committed once when the request succeeds, or rolled back
+    when it raises.
+    Reads of GET/HEAD requests may go to a read replica; the user who made
+    a write, and the users it changed, read from the primary for a short
+    while afterwards.
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    async with SessionLocal(info={"use_replica": request.method in READ_ONLY_METHODS}) as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        if db.info.get("wrote") and replica_router.enabled:
+            user_ids = set(db.info.get("written_user_ids", ()))
+            if db.info.get("user_id") is not None:
+                user_ids.add(db.info["user_id"])
+            await replica_router.mark_write(user_ids)
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> Principal:
     """
     Validates the JWT token and returns the current user.
+    The user is served from the principal cache when possible, so most
+    authenticated requests never hit the database.
     """
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (JWTError, ValidationError):
+        token_data = token_codec.verify(token)
+        user_id = int(token_data.sub)
+    except (TokenError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
@@ -49,22 +64,30 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid token type",
         )
-        
-    user = crud.user.get(db, id=token_data.sub)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
 
-def get_current_active_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    # Read-your-writes: keep users who just wrote on the primary
+    db.info["user_id"] = user_id
+    if db.info.get("use_replica") and await replica_router.is_sticky(user_id):
+        db.info["use_replica"] = False
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await crud.user.get(db, id=user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = principal_cache.set(Principal.from_user(user))
+    return principal
+
+async def get_current_active_user(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_current_active_admin(
-    current_user: models.User = Depends(get_current_active_user),
-) -> models.User:
+async def get_current_active_admin(
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     """
     Dependency to check if the user is an admin.
     """
@@ -1,32 +1,34 @@
 from datetime import timedelta, datetime
 from typing import Any
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, schemas, models
+from app import crud, schemas
 from app.api import deps
 from app.core import security
+from app.core.principal import Principal
+from app.core.tokens import token_codec
 from app.core.config import settings
 from app.utils import email as email_utils
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.AuthResponse, status_code=201)
-def register(
+async def register(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_in: schemas.UserCreate,
 ) -> Any:
     """
     Register a new user.
     """
-    user = crud.user.get_by_email(db, email=user_in.email)
+    user = await crud.user.get_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(status_code=400, detail="Email already taken")
     
     user_in.role = "user"
     
-    user = crud.user.create(db, obj_in=user_in)
+    user = await crud.user.create(db, obj_in=user_in)
     
     access_token_expires = timedelta(minutes=settings.JWT_ACCESS_EXPIRATION_MINUTES)
     refresh_token_expires = timedelta(days=settings.JWT_REFRESH_EXPIRATION_DAYS)
@@ -34,7 +36,7 @@ def register(
     access_token = security.create_access_token(user.id, expires_delta=access_token_expires)
     refresh_token = security.create_refresh_token(user.id, expires_delta=refresh_token_expires)
     
-    crud.token.create(
+    await crud.token.create(
         db, 
         token=refresh_token, 
         user_id=user.id, 
@@ -51,12 +53,12 @@ def register(
     }
 
 @router.post("/login", response_model=schemas.AuthResponse)
-def login(
-    db: Session = Depends(deps.get_db),
+async def login(
+    db: AsyncSession = Depends(deps.get_db),
     email: str = Body(...),
     password: str = Body(...)
 ) -> Any:
-    user = crud.user.authenticate(db, email=email, password=password)
+    user = await crud.user.authenticate(db, email=email, password=password)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
@@ -66,7 +68,7 @@ def login(
     access_token = security.create_access_token(user.id, expires_delta=access_token_expires)
     refresh_token = security.create_refresh_token(user.id, expires_delta=refresh_token_expires)
     
-    crud.token.create(
+    await crud.token.create(
         db, 
         token=refresh_token, 
         user_id=user.id, 
@@ -83,52 +85,47 @@ def login(
     }
 
 @router.post("/logout", status_code=204)
-def logout(
+async def logout(
     refreshToken: str = Body(..., embed=True),
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_db)
 ) -> None:
-    refresh_token_doc = crud.token.get_by_token(db, token=refreshToken, type="refresh")
+    refresh_token_doc = await crud.token.get_by_token(db, token=refreshToken, type="refresh")
     if not refresh_token_doc:
         raise HTTPException(status_code=404, detail="Not found")
     
-    crud.token.blacklist_token(db, refreshToken, "refresh")
+    await crud.token.blacklist_token(db, refreshToken, "refresh")
     return None
 
 @router.post("/refresh-tokens", response_model=schemas.AuthTokens)
-def refresh_tokens(
+async def refresh_tokens(
     refreshToken: str = Body(..., embed=True),
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
     try:
-        payload = security.jwt.decode(refreshToken, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        payload = token_codec.decode(refreshToken)
         if payload["type"] != "refresh":
             raise HTTPException(status_code=401, detail="Invalid token type")
+        user_id = int(payload["sub"])
     except:
          raise HTTPException(status_code=401, detail="Please authenticate")
 
-    refresh_token_doc = crud.token.get_by_token(db, token=refreshToken, type="refresh")
-    if not refresh_token_doc:
-         raise HTTPException(status_code=401, detail="Please authenticate")
-    
-    crud.token.blacklist_token(db, refreshToken, "refresh")
-    
-    user = crud.user.get(db, id=refresh_token_doc.user_id)
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-        
     access_token_expires = timedelta(minutes=settings.JWT_ACCESS_EXPIRATION_MINUTES)
     refresh_token_expires = timedelta(days=settings.JWT_REFRESH_EXPIRATION_DAYS)
     
-    access_token = security.create_access_token(user.id, expires_delta=access_token_expires)
-    new_refresh_token = security.create_refresh_token(user.id, expires_delta=refresh_token_expires)
+    access_token = security.create_access_token(user_id, expires_delta=access_token_expires)
+    new_refresh_token = security.create_refresh_token(user_id, expires_delta=refresh_token_expires)
     
-    crud.token.create(
-        db, 
-        token=new_refresh_token, 
-        user_id=user.id, 
-        type="refresh", 
+    # Blacklist the old token and store the new one atomically
+    rotated = await crud.token.rotate(
+        db,
+        token=refreshToken,
+        new_token=new_refresh_token,
+        user_id=user_id,
+        type="refresh",
         expires=datetime.utcnow() + refresh_token_expires
     )
+    if not rotated:
+         raise HTTPException(status_code=401, detail="Please authenticate")
     
     return {
         "access": {"token": access_token, "expires": datetime.utcnow() + access_token_expires},
@@ -136,18 +133,18 @@ def refresh_tokens(
     }
 
 @router.post("/forgot-password", status_code=204)
-def forgot_password(
+async def forgot_password(
     email: str = Body(..., embed=True),
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_db)
 ) -> None:
-    user = crud.user.get_by_email(db, email=email)
+    user = await crud.user.get_by_email(db, email=email)
     if not user:
         raise HTTPException(status_code=404, detail="No users found with this email")
     
     expires = timedelta(minutes=settings.JWT_RESET_PASSWORD_EXPIRATION_MINUTES)
     reset_token = security.create_token(user.id, expires_delta=expires, type="resetPassword")
     
-    crud.token.create(
+    await crud.token.create(
         db, 
         token=reset_token, 
         user_id=user.id, 
@@ -155,40 +152,51 @@ def forgot_password(
         expires=datetime.utcnow() + expires
     )
     
-    email_utils.send_reset_password_email(email, reset_token)
+    await email_utils.send_reset_password_email(db, email, reset_token)
     return None
 
 @router.post("/reset-password", status_code=204)
-def reset_password(
+async def reset_password(
     token: str = Query(...),
     password: str = Body(..., embed=True),
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_db)
 ) -> None:
     try:
-        token_doc = crud.token.get_by_token(db, token, "resetPassword")
+        token_doc = await crud.token.get_by_token(db, token, "resetPassword")
         if not token_doc:
             raise HTTPException(status_code=401, detail="Password reset failed")
         
-        user = crud.user.get(db, id=token_doc.user_id)
+        user = await crud.user.get(db, id=token_doc.user_id)
         if not user:
             raise HTTPException(status_code=401, detail="Password reset failed")
             
-        crud.user.update(db, db_obj=user, obj_in={"password": password})
-        crud.token.delete_tokens_by_user(db, user.id, "resetPassword")
+        await crud.user.update(db, db_obj=user, obj_in={"password": password})
+        await crud.token.delete_tokens_by_user(db, user.id, "resetPassword")
+    except HTTPException as exc:
+        # Let "busy" responses from the password hasher reach the client
+        if exc.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            raise
+        raise HTTPException(status_code=401, detail="Password reset failed")
     except Exception:
         raise HTTPException(status_code=401, detail="Password reset failed")
     
     return None
 
 @router.post("/send-verification-email", status_code=204)
-def send_verification_email(
-    current_user: models.User = Depends(deps.get_current_user),
-    db: Session = Depends(deps.get_db)
+async def send_verification_email(
+    current_user: Principal = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_db)
 ) -> None:
+    # The cached principal may hold an old address for up to its TTL in
+    # other workers, so send to the one stored now
+    user = await crud.user.get(db, id=current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
     expires = timedelta(minutes=settings.JWT_VERIFY_EMAIL_EXPIRATION_MINUTES)
     verify_token = security.create_token(current_user.id, expires_delta=expires, type="verifyEmail")
     
-    crud.token.create(
+    await crud.token.create(
         db, 
         token=verify_token, 
         user_id=current_user.id, 
@@ -196,22 +204,22 @@ def send_verification_email(
         expires=datetime.utcnow() + expires
     )
     
-    email_utils.send_verification_email(current_user.email, verify_token)
+    await email_utils.send_verification_email(db, user.email, verify_token)
     return None
 
 @router.post("/verify-email", status_code=204)
-def verify_email(
+async def verify_email(
     token: str = Query(...),
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_db)
 ) -> None:
-    token_doc = crud.token.get_by_token(db, token, "verifyEmail")
+    token_doc = await crud.token.get_by_token(db, token, "verifyEmail")
     if not token_doc:
         raise HTTPException(status_code=401, detail="Email verification failed")
     
-    user = crud.user.get(db, id=token_doc.user_id)
+    user = await crud.user.get(db, id=token_doc.user_id)
     if not user:
          raise HTTPException(status_code=401, detail="Email verification failed")
          
-    crud.user.update(db, db_obj=user, obj_in={"is_email_verified": True})
-    crud.token.delete_tokens_by_user(db, user.id, "verifyEmail")
+    await crud.user.update(db, db_obj=user, obj_in={"is_email_verified": True})
+    await crud.token.delete_tokens_by_user(db, user.id, "verifyEmail")
     return None
\ No newline at end of file
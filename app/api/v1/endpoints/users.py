@@ -1,33 +1,36 @@
-from typing import Any, List, Optional
-from fastapi import APIRouter, Body, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, asc, desc
+from typing import Any, List, Optional, Tuple
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, status, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Select, func, or_, select
 
 from app import crud, models, schemas
 from app.api import deps
+from app.core.compression import compression
+from app.core.principal import Principal
+from app.db.session import SessionLocal
+from app.utils import bulk, counting, export, pagination
+from app.utils import search as search_utils
 
 router = APIRouter()
 
-@router.get("/", response_model=schemas.UserPaginatedResponse)
-def read_users(
-    db: Session = Depends(deps.get_db),
-    page: int = 1,
-    limit: int = 100,
-    search: str | None = None,
-    scope: str = "all",
-    role: str | None = None,
-    sortBy: str | None = "id:asc",
-    current_user: models.User = Depends(deps.get_current_active_admin),
-) -> Any:
+# Columns of UserResponse, selected directly for the list and export endpoints
+USER_RESPONSE_COLUMNS = ["id", "email", "name", "role", "is_active", "is_email_verified"]
+# Fields the listing can be sorted (and cursor-paginated) by; other fields
+# sort by id, except these, which are rejected
+USER_SORT_FIELDS = frozenset(USER_RESPONSE_COLUMNS) | {"created_at", "updated_at"}
+USER_UNSORTABLE_FIELDS = frozenset({"hashed_password"})
+
+async def _filter_users(
+    db: AsyncSession, query: Select, *, role: str | None, search: str | None, scope: str
+) -> Select:
     """
-    Retrieve users with advanced filtering, sorting, and pagination.
-    Only Admins can list all users.
+    Apply the role and search filters shared by the listing and the export.
     """
-    query = db.query(models.User)
-
     # 1. Filter by Role
     if role:
-        query = query.filter(models.User.role == role)
+        query = query.where(models.User.role == role)
 
     # 2. Search Logic
     if search:
@@ -35,89 +38,312 @@ def read_users(
         
         if scope == "id":
             if search_int is not None:
-                query = query.filter(models.User.id == search_int)
+                query = query.where(models.User.id == search_int)
             else:
-                query = query.filter(models.User.id == -1) 
+                query = query.where(models.User.id == -1) 
         
-        elif scope == "name":
-            query = query.filter(models.User.name.ilike(f"%{search}%"))
-            
-        elif scope == "email":
-            query = query.filter(models.User.email.ilike(f"%{search}%"))
-            
-        elif scope == "all":
-            conditions = [
-                models.User.name.ilike(f"%{search}%"),
-                models.User.email.ilike(f"%{search}%"),
-            ]
-            if search_int is not None:
-                conditions.append(models.User.id == search_int)
-            
-            query = query.filter(or_(*conditions))
+        elif scope in ("name", "email", "all"):
+            condition = search_utils.search_condition(scope, search, await search_utils.has_fts(db))
+            if scope == "all" and search_int is not None:
+                condition = or_(condition, models.User.id == search_int)
+            query = query.where(condition)
+
+    return query
+
+@router.get(
+    "/",
+    response_model=schemas.UserPaginatedResponse,
+    dependencies=[Depends(compression("small"))],
+)
+async def read_users(
+    db: AsyncSession = Depends(deps.get_db),
+    page: int = 1,
+    limit: int = 100,
+    search: str | None = None,
+    scope: str = "all",
+    role: str | None = None,
+    sortBy: str | None = "id:asc",
+    cursor: str | None = None,
+    countStrategy: counting.CountStrategy = "exact",
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Retrieve users with advanced filtering, sorting, and pagination.
+    Only Admins can list all users.
+
+    Pass `cursor` to switch to keyset pagination: an empty `cursor` returns
+    the first page, then send back the `next_cursor` of each response to get
+    the following one. Deep pages cost the same as the first one. The sort
+    order is carried by the cursor, so `sortBy` only applies to the first page,
+    and `limit` is clamped to 1..1000.
+
+    `countStrategy` picks how `count` is computed: `exact` (default), `window`
+    (same round trip as the page), `estimate` (Postgres planner estimate for
+    large results) or `cached` (exact count reused for a few seconds).
+    `count_estimated` tells whether `count` and `total_pages` are exact.
+
+    With a name/email/all `search`, `sortBy=relevance` orders the page by
+    match quality (page mode only). Other sort fields are limited to the
+    response fields plus `created_at` and `updated_at`; unknown fields sort
+    by id and `hashed_password` is rejected. NULLs sort last either way.
+    """
+    # Rows are selected as plain columns (no ORM objects, no hashed_password)
+    # and serialized straight to JSON without a second validation pass
+    query = await _filter_users(
+        db,
+        select(*[getattr(models.User, column) for column in USER_RESPONSE_COLUMNS]),
+        role=role,
+        search=search,
+        scope=scope,
+    )
 
     # 3. Sorting Logic
-    if sortBy:
+    by_relevance = sortBy == "relevance" and cursor is None
+    try:
+        field_name, direction = pagination.parse_sort(
+            None if by_relevance else sortBy, USER_SORT_FIELDS, USER_UNSORTABLE_FIELDS
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    last_value, last_id = None, None
+    if cursor:
         try:
-            if ":" in sortBy:
-                field_name, direction = sortBy.split(":")
-            else:
-                field_name, direction = sortBy, "asc"
-
-            if hasattr(models.User, field_name):
-                column = getattr(models.User, field_name)
-                if direction.lower() == "desc":
-                    query = query.order_by(desc(column))
-                else:
-                    query = query.order_by(asc(column))
-            else:
-                 query = query.order_by(models.User.id.asc())
-        except Exception:
-            query = query.order_by(models.User.id.asc())
+            field_name, direction, last_value, last_id = pagination.decode_cursor(cursor, USER_SORT_FIELDS)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    column = getattr(models.User, field_name)
+    if field_name not in USER_RESPONSE_COLUMNS:
+        # The cursor needs the sort value of the last row
+        query = query.add_columns(column.label("sort_key"))
+        sort_key = "sort_key"
     else:
-        query = query.order_by(models.User.id.asc())
+        sort_key = field_name
 
     # 4. Pagination Logic
-    total_count = query.count()
-    skip = (page - 1) * limit
-    users = query.offset(skip).limit(limit).all()
+    filtered_query = query
+    total_count = None
+    count_estimated = False
+    next_cursor = None
+
+    if cursor is not None:
+        limit = pagination.clamp_page_size(limit)
+        if last_id is not None:
+            query = query.where(
+                pagination.keyset_filter(
+                    column, models.User.id, direction, last_value, last_id,
+                    dialect_name=db.get_bind().dialect.name,
+                )
+            )
+        query = query.order_by(*pagination.keyset_order_by(column, models.User.id, direction))
+        # Fetch one extra row to know whether another page exists
+        rows = (await db.execute(query.limit(limit + 1))).mappings().all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = pagination.encode_cursor(field_name, direction, last[sort_key], last["id"])
+    else:
+        if by_relevance and search and scope in ("name", "email", "all"):
+            rank = search_utils.rank_expression(scope, search, db.get_bind().dialect.name)
+            query = query.order_by(rank.desc(), models.User.id.asc())
+        else:
+            # Same order as cursor mode, so both page through rows alike
+            query = query.order_by(*pagination.keyset_order_by(column, models.User.id, direction))
+        skip = (page - 1) * limit
+        if countStrategy == "window":
+            query = query.add_columns(func.count().over().label("total_count"))
+        rows = (await db.execute(query.offset(skip).limit(limit))).mappings().all()
+        if countStrategy == "window":
+            if rows:
+                total_count = rows[0]["total_count"]
+            elif skip == 0:
+                total_count = 0
 
-    return {
-        "results": users,
+    # A window count is unavailable past the last page and in cursor mode,
+    # where it would only count the rows after the cursor
+    if total_count is None:
+        total_count, count_estimated = await counting.count_rows(
+            db,
+            filtered_query,
+            countStrategy,
+            table_name=models.User.__tablename__,
+            filtered=bool(role or search),
+            cache_key=(role, search, scope),
+        )
+
+    return ORJSONResponse({
+        "results": [{column: row[column] for column in USER_RESPONSE_COLUMNS} for row in rows],
         "count": total_count,
         "page": page,
         "limit": limit,
-        "total_pages": (total_count + limit - 1) // limit if limit > 0 else 1
-    }
+        "total_pages": (total_count + limit - 1) // limit if limit > 0 else 1,
+        "count_estimated": count_estimated,
+        "next_cursor": next_cursor,
+    })
 
 @router.post("/", response_model=schemas.UserResponse, status_code=201)
-def create_user(
+async def create_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_in: schemas.UserCreate,
-    current_user: models.User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new user. Only Admins can create users directly via this endpoint.
     """
-    user = crud.user.get_by_email(db, email=user_in.email)
+    user = await crud.user.get_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
-    user = crud.user.create(db, obj_in=user_in)
+    user = await crud.user.create(db, obj_in=user_in)
     return user
 
+@router.post("/bulk", response_model=schemas.UserBulkImportResponse)
+async def bulk_create_users(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Bulk-create users from a streamed NDJSON (`application/x-ndjson`) or
+    CSV (`text/csv`, with a header row) body. Only Admins can import users.
+
+    Rows are processed in chunks: duplicate emails are found with one query
+    per chunk, passwords are hashed in parallel and each chunk is inserted
+    and committed as one batch. Invalid or duplicate rows are reported by
+    line number and do not stop the import.
+    """
+    fmt = bulk.detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Upload users as application/x-ndjson or text/csv",
+        )
+
+    report = bulk.ImportReport()
+    seen_emails = set()
+    chunk: List[Tuple[int, schemas.UserCreate]] = []
+
+    async for line, record, error in bulk.iter_records(request.stream(), fmt):
+        if error:
+            report.add_error(line, error)
+            continue
+        try:
+            user_in = schemas.UserCreate(**record)
+        except ValidationError as exc:
+            first = exc.errors()[0]
+            field = ".".join(str(loc) for loc in first["loc"])
+            report.add_error(line, f"{field}: {first['msg']}", email=record.get("email"))
+            continue
+        if user_in.email in seen_emails:
+            report.add_error(line, "Duplicate email in upload", email=user_in.email)
+            continue
+        seen_emails.add(user_in.email)
+        chunk.append((line, user_in))
+
+        if len(chunk) >= bulk.CHUNK_SIZE:
+            await _import_chunk(db, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _import_chunk(db, chunk, report)
+
+    return report.to_response()
+
+async def _import_chunk(
+    db: AsyncSession, chunk: List[Tuple[int, schemas.UserCreate]], report: bulk.ImportReport
+) -> None:
+    existing = await crud.user.get_existing_emails(db, emails=[user_in.email for _, user_in in chunk])
+    fresh = []
+    for line, user_in in chunk:
+        if user_in.email in existing:
+            report.add_error(line, "Email already taken", email=user_in.email)
+        else:
+            fresh.append((line, user_in))
+
+    rejected = await crud.user.create_many(db, objs_in=[user_in for _, user_in in fresh])
+    await db.commit()
+    for i in rejected:
+        # Taken by a concurrent insert since the lookup above
+        line, user_in = fresh[i]
+        report.add_error(line, "Email already taken", email=user_in.email)
+    report.created += len(fresh) - len(rejected)
+
+EXPORT_BATCH_SIZE = 1000
+
+@router.get("/export", dependencies=[Depends(compression("fast"))])
+async def export_users(
+    db: AsyncSession = Depends(deps.get_db),
+    format: str = "ndjson",
+    search: str | None = None,
+    scope: str = "all",
+    role: str | None = None,
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Stream every user matching `role`/`search`/`scope` as NDJSON, CSV or an
+    Arrow IPC stream (`format=ndjson|csv|arrow`, arrow needs `pyarrow`).
+    Only Admins can export users.
+
+    Rows are read from a server-side cursor in batches and encoded as they
+    arrive, so memory use does not grow with the size of the table.
+    """
+    if format not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be one of ndjson, csv, arrow")
+
+    query = await _filter_users(
+        db,
+        select(*[getattr(models.User, column) for column in USER_RESPONSE_COLUMNS]),
+        role=role,
+        search=search,
+        scope=scope,
+    )
+    query = query.order_by(models.User.id.asc()).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    async def batches():
+        # The request session is closed before the body is streamed,
+        # so the cursor gets a session of its own, routed the same way
+        async with SessionLocal(info={"use_replica": db.info.get("use_replica", False)}) as stream_db:
+            result = await stream_db.stream(query)
+            async for partition in result.mappings().partitions():
+                yield partition
+
+    if format == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Arrow export requires pyarrow to be installed")
+        arrow_schema = pa.schema([
+            ("id", pa.int64()),
+            ("email", pa.string()),
+            ("name", pa.string()),
+            ("role", pa.string()),
+            ("is_active", pa.bool_()),
+            ("is_email_verified", pa.bool_()),
+        ])
+        content = export.arrow_chunks(batches(), arrow_schema)
+    elif format == "csv":
+        content = export.csv_chunks(batches(), USER_RESPONSE_COLUMNS)
+    else:
+        content = export.ndjson_chunks(batches(), USER_RESPONSE_COLUMNS)
+
+    return StreamingResponse(
+        content,
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{export.FILE_EXTENSIONS[format]}"'},
+    )
+
 @router.get("/{user_id}", response_model=schemas.UserResponse)
-def read_user_by_id(
+async def read_user_by_id(
     user_id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
-    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get a specific user by id.
     """
-    user = crud.user.get(db, id=user_id)
+    user = await crud.user.get(db, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.id != current_user.id and current_user.role != "admin":
@@ -127,17 +353,17 @@ def read_user_by_id(
     return user
 
 @router.patch("/{user_id}", response_model=schemas.UserResponse)
-def update_user(
+async def update_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_id: int,
     user_in: schemas.UserUpdate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Update a user.
     """
-    user = crud.user.get(db, id=user_id)
+    user = await crud.user.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -148,20 +374,20 @@ def update_user(
             status_code=403, detail="Not enough permissions"
         )
         
-    user = crud.user.update(db, db_obj=user, obj_in=user_in)
+    user = await crud.user.update(db, db_obj=user, obj_in=user_in)
     return user
 
 @router.delete("/{user_id}", status_code=204)
-def delete_user(
+async def delete_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_id: int,
-    current_user: models.User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> None:
     """
     Delete a user. Only Admins can delete users.
     """
-    user = crud.user.get(db, id=user_id)
+    user = await crud.user.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -171,5 +397,5 @@ def delete_user(
         raise HTTPException(
             status_code=400, detail="Users cannot delete themselves"
         )
-    crud.user.remove(db, id=user_id)
+    await crud.user.remove(db, id=user_id)
     return None
\ No newline at end of file
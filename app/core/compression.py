@@ -0,0 +1,279 @@
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import anyio
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+
+# Codec level per profile; "fast" suits large exports, "small" small listings
+LEVELS: Dict[str, Dict[str, int]] = {
+    "fast": {"zstd": 1, "br": 1, "gzip": 1},
+    "default": {"zstd": 3, "br": 4, "gzip": 6},
+    "small": {"zstd": 6, "br": 9, "gzip": 9},
+}
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.apache.arrow.stream",
+)
+
+# Bodies (or stream chunks) at least this large are compressed in a worker thread
+THREAD_THRESHOLD = 256 * 1024
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS: Dict[str, Callable[[int], Any]] = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    enabled: bool = True
+    level: str = "default"
+
+
+def compression(level: str = "default", *, enabled: bool = True) -> Callable[[Request], None]:
+    """
+    Route dependency overriding the compression policy, e.g.
+    `dependencies=[Depends(compression("fast"))]` or `compression(enabled=False)`.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown compression level: {level}")
+    policy = CompressionPolicy(enabled=enabled, level=level)
+
+    def set_policy(request: Request) -> None:
+        request.scope["compression"] = policy
+
+    return set_policy
+
+
+def negotiate(accept_encoding: str, preferred: List[str]) -> Optional[str]:
+    """
+    Pick an encoding from an Accept-Encoding header: highest q-value first,
+    ties broken by the server's preference order.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in preferred:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionStats:
+    def __init__(self) -> None:
+        self.responses: Dict[str, int] = {}
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.cpu_seconds: Dict[str, float] = {}
+        self.skipped = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + bytes_in
+        self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + bytes_out
+        self.cpu_seconds[encoding] = self.cpu_seconds.get(encoding, 0.0) + cpu_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "skipped": self.skipped,
+            "encodings": {
+                encoding: {
+                    "responses": self.responses.get(encoding, 0),
+                    "bytes_in": self.bytes_in.get(encoding, 0),
+                    "bytes_out": self.bytes_out.get(encoding, 0),
+                    "bytes_saved": self.bytes_in.get(encoding, 0) - self.bytes_out.get(encoding, 0),
+                    "cpu_seconds": self.cpu_seconds.get(encoding, 0.0),
+                }
+                for encoding in self.bytes_in
+            },
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with zstd, brotli or gzip as negotiated from
+    Accept-Encoding. Routes change the level or opt out through the
+    `compression()` dependency; streaming bodies are compressed and
+    flushed chunk by chunk so clients still receive them incrementally.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        encodings: Optional[List[str]] = None,
+        enabled: bool = True,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = [e for e in (encodings or ["zstd", "br", "gzip"]) if e in ENCODERS]
+        self.default_policy = CompressionPolicy(enabled=enabled)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send, encoding: str):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.content_length: Optional[int] = None
+        self.encoder: Any = None
+        self.passthrough = False
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            if self._should_compress(Headers(raw=message["headers"])):
+                # Held back until enough of the body is known to decide
+                return
+            self.passthrough = True
+            compression_stats.skipped += 1
+            await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is not None:
+            compressed = await self._encode(body, final=not more_body)
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        # Sized bodies re-chunked by inner middleware are collected whole;
+        # open-ended streams only until they reach the minimum size
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if more_body and (self.content_length is not None or self.buffered < self.middleware.minimum_size):
+            return
+        body = b"".join(self.buffer)
+        self.buffer = []
+
+        if not more_body and len(body) < self.middleware.minimum_size:
+            self.passthrough = True
+            compression_stats.skipped += 1
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        policy = self.scope.get("compression", self.middleware.default_policy)
+        self.encoder = ENCODERS[self.encoding](LEVELS[policy.level][self.encoding])
+        compression_stats.responses[self.encoding] = compression_stats.responses.get(self.encoding, 0) + 1
+        compressed = await self._encode(body, final=not more_body)
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(compressed))
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    def _should_compress(self, headers: Headers) -> bool:
+        policy = self.scope.get("compression", self.middleware.default_policy)
+        if not policy.enabled or "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        if "content-length" in headers:
+            self.content_length = int(headers["content-length"])
+            return self.content_length >= self.middleware.minimum_size
+        return True
+
+    async def _encode(self, body: bytes, final: bool) -> bytes:
+        if len(body) >= THREAD_THRESHOLD:
+            return await anyio.to_thread.run_sync(self._encode_sync, body, final)
+        return self._encode_sync(body, final)
+
+    def _encode_sync(self, body: bytes, final: bool) -> bytes:
+        start = time.thread_time()
+        compressed = self.encoder.compress(body) if body else b""
+        if final:
+            compressed += self.encoder.finish()
+        compression_stats.record(self.encoding, len(body), len(compressed), time.thread_time() - start)
+        return compressed
@@ -21,6 +21,44 @@ class Settings(BaseSettings):
             return v.replace("postgres://", "postgresql://", 1)
         return v
 
+    # Read replicas: comma-separated URLs in the same form as DATABASE_URL.
+    # SELECTs of GET/HEAD requests are spread over them
+    DATABASE_REPLICA_URLS: str | None = None
+    # Seconds a user reads from the primary after writing (read-your-writes)
+    REPLICA_STICKY_SECONDS: float = 5
+    # Where the sticky windows are kept, same forms as RATE_LIMIT_STORAGE;
+    # shm:// or redis:// so they hold whichever worker serves the next request
+    REPLICA_STICKY_STORAGE: str = "shm://"
+    # Replicas further behind than this get no reads until they catch up
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    # Seconds between heartbeat writes and lag checks
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 1
+
+    # Connection pool, sized per worker from the settings below unless
+    # DB_POOL_SIZE / DB_MAX_OVERFLOW are set
+    # Worker processes (the variable uvicorn and gunicorn read as well)
+    WEB_CONCURRENCY: int = 1
+    # Threads for blocking work (sync routes, compression, SMTP) per worker
+    THREADPOOL_SIZE: int = 40
+    # Connections one worker may use at once (pool plus overflow)
+    DB_WORKER_CONNECTIONS: int = 20
+    # Connections all workers together may open; keep it below the server's limit
+    DB_MAX_CONNECTIONS: int | None = 90
+    DB_POOL_SIZE: int | None = None
+    DB_MAX_OVERFLOW: int | None = None
+    # Seconds a request waits for a connection before failing
+    DB_POOL_TIMEOUT_SECONDS: float = 10
+    # Connections are reopened after this many seconds (with jitter)
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # Connections idle for longer are pinged before reuse
+    DB_POOL_LIVENESS_IDLE_SECONDS: float = 30
+
+    # Startup warmup: open pool connections, start the password hashing
+    # workers and initialize the JWT backend before serving requests
+    STARTUP_WARMUP: bool = True
+    # Pooled connections opened on startup (capped by the pool size)
+    DB_POOL_WARMUP_CONNECTIONS: int = 2
+
     # Security & JWT
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
@@ -29,6 +67,74 @@ class Settings(BaseSettings):
     JWT_RESET_PASSWORD_EXPIRATION_MINUTES: int = 10
     JWT_VERIFY_EMAIL_EXPIRATION_MINUTES: int = 10
 
+    # Asymmetric signing: comma-separated PEM files of Ed25519 (EdDSA) or
+    # P-256 (ES256) keys. The first must be a private key and signs new
+    # tokens; the rest (private or public) still verify, for rotation.
+    # Public keys are served at /.well-known/jwks.json. Unset: HMAC only.
+    JWT_KEY_FILES: str | None = None
+    # Keep accepting HMAC (JWT_SECRET) tokens next to JWT_KEY_FILES, so the
+    # switch logs nobody out. Turn off once the HMAC refresh tokens issued
+    # before the switch have expired (JWT_REFRESH_EXPIRATION_DAYS)
+    JWT_ACCEPT_HMAC: bool = True
+    JWT_JWKS_MAX_AGE_SECONDS: int = 300
+
+    # Validated access tokens cached until they expire (0 disables the cache)
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+
+    # Password hashing pool (bcrypt runs in separate processes)
+    # Defaults to one worker per CPU core when unset
+    PASSWORD_HASH_WORKERS: int | None = None
+    # Extra hashing jobs allowed to wait before requests get a 503
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+
+    # Principal cache (skips the user lookup on authenticated requests)
+    # Set either value to 0 to disable the cache
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # Seconds a user listing count is reused with countStrategy=cached
+    USER_COUNT_CACHE_TTL_SECONDS: int = 30
+
+    # Expired/blacklisted token cleanup (0 disables the in-process task)
+    TOKEN_PURGE_INTERVAL_SECONDS: int = 3600
+    TOKEN_PURGE_BATCH_SIZE: int = 1000
+
+    # Rate limiting (token buckets per client address)
+    RATE_LIMIT_ENABLED: bool = True
+    # memory:// (per process), shm:// (shared by the workers on this host,
+    # optionally shm:///path/to/file; memory:// where fcntl is missing, e.g.
+    # Windows) or redis://host:6379/0 (needs `redis`)
+    RATE_LIMIT_STORAGE: str = "shm://"
+    RATE_LIMIT_LOGIN: str = "10/minute"
+    RATE_LIMIT_REGISTER: str = "5/minute"
+    RATE_LIMIT_FORGOT_PASSWORD: str = "3/minute"
+
+    # Response compression
+    # Applies to routes without their own compression() policy
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    # Server preference order; codecs whose package is missing are skipped
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"
+
+    # Metrics (/metrics, Prometheus text format)
+    METRICS_ENABLED: bool = True
+    # Directory where each worker shares its metrics; set it when running
+    # several uvicorn workers so /metrics reports all of them
+    METRICS_DIR: str | None = None
+    METRICS_FLUSH_INTERVAL_SECONDS: int = 5
+
+    # SQL instrumentation
+    # Statements slower than this are logged with their parameter types (0 disables)
+    SQL_SLOW_QUERY_MS: int = 200
+    # Same statement run this many times in one request is logged as a likely N+1
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    # Default statements allowed per request; exceeding it raises in
+    # development/test and is logged elsewhere. Routes override it with
+    # the query_budget() dependency
+    SQL_QUERY_BUDGET: int | None = None
+    # Return X-DB-Queries, X-DB-Time-Ms and X-DB-N-Plus-One headers
+    SQL_DEBUG_HEADERS: bool = False
+
     # CORS
     BACKEND_CORS_ORIGINS: List[Union[str, AnyHttpUrl]] = ["http://localhost:3000", "http://localhost:8000"]
 
@@ -47,6 +153,20 @@ class Settings(BaseSettings):
     SMTP_USERNAME: str | None = None
     SMTP_PASSWORD: str | None = None
     EMAIL_FROM: EmailStr | None = None
+    # Base URL of the links sent in emails
+    FRONTEND_URL: str = "http://localhost:3000"
+
+    # Email outbox delivery (0 disables the in-process sender)
+    EMAIL_POLL_INTERVAL_SECONDS: int = 5
+    EMAIL_SEND_BATCH_SIZE: int = 50
+    EMAIL_MAX_ATTEMPTS: int = 8
+    # Delay before the first retry; doubled after each failure (max 1 hour)
+    EMAIL_RETRY_BASE_SECONDS: int = 30
+    # Cleanup of sent and failed messages older than the retention
+    # (0 disables the in-process task)
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 7
+    EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS: int = 3600
+    EMAIL_OUTBOX_PURGE_BATCH_SIZE: int = 1000
 
     model_config = SettingsConfigDict(
         env_file=".env", 
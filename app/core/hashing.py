@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+from app.core import security
+from app.core.config import settings
+from app.core.metrics import password_hash_duration
+
+logger = logging.getLogger(__name__)
+
+# Cost-4 bcrypt hash of "warmup": verifying it starts a worker and loads
+# the bcrypt backend in it for about a millisecond of CPU
+WARMUP_HASH = "$2b$04$iD7WdfzUl9HdNP5iyHdQxuc8W2L0G3a7LqjAR5/.EEdd/sDGnon4q"
+
+# Passwords per bulk job: small enough that an interactive job queued
+# behind one waits about a second at most
+BULK_JOB_SIZE = 4
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a dedicated process pool so
+    the CPU cost never stalls the event loop. At most `max_workers` jobs
+    run at once and at most `queue_size` more may wait; anything beyond
+    that is rejected with a 503 so callers can back off and retry.
+
+    Bulk hashing is split into small jobs with at most one per worker
+    submitted at a time, so interactive jobs are never queued behind a
+    whole batch, and it does not count toward the interactive bound.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, queue_size: int = 64):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor: Optional[Executor] = None
+        self._bulk_slots: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+
+    @property
+    def workers(self) -> int:
+        return self.max_workers or os.cpu_count() or 1
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # "spawn" avoids forking a process that is already running threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run `func` on the pool. A worker dying (OOM kill, crash) breaks the
+        whole pool, so it is replaced and the job retried once.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            if self._executor is executor:
+                logger.warning("Password hashing pool broke (a worker died), restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.restarts += 1
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any, bounded: bool = True) -> Any:
+        if bounded and self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        self.submitted += 1
+        start = time.perf_counter()
+        try:
+            result = await self._submit(func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.latency_seconds_total += elapsed
+            self.latency_seconds_max = max(self.latency_seconds_max, elapsed)
+            password_hash_duration.observe(elapsed, operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", security.get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", security.verify_password, plain_password, hashed_password)
+
+    async def _run_bulk(self, passwords: List[str]) -> List[str]:
+        if self._bulk_slots is None:
+            self._bulk_slots = asyncio.Semaphore(self.workers)
+        async with self._bulk_slots:
+            self.bulk_in_flight += 1
+            start = time.perf_counter()
+            try:
+                return await self._submit(security.get_password_hashes, passwords)
+            finally:
+                self.bulk_in_flight -= 1
+                password_hash_duration.observe(time.perf_counter() - start, "hash_many")
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a batch of passwords spread over every worker. Bulk jobs wait for
+        a free slot instead of being rejected when the queue is full.
+        """
+        if not passwords:
+            return []
+        slices = [passwords[i:i + BULK_JOB_SIZE] for i in range(0, len(passwords), BULK_JOB_SIZE)]
+        results = await asyncio.gather(*[self._run_bulk(part) for part in slices])
+        return [hashed for part in results for hashed in part]
+
+    async def warm_up(self) -> None:
+        """Start every worker process ahead of the first login."""
+        await asyncio.gather(*[
+            self._run("warmup", security.verify_password, "warmup", WARMUP_HASH, bounded=False)
+            for _ in range(self.workers)
+        ])
+
+    def get_stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "bulk_in_flight": self.bulk_in_flight,
+            "queue_depth": max(self.in_flight - self.workers, 0),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "latency_seconds_avg": self.latency_seconds_total / finished if finished else 0.0,
+            "latency_seconds_max": self.latency_seconds_max,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
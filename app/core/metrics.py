@@ -0,0 +1,379 @@
+"""
+In-process metrics rendered in the Prometheus text format at /metrics.
+
+Collectors are plain counters and histograms updated on the hot path, plus
+callbacks that read the stats already kept by other components when the
+metrics are collected. With METRICS_DIR set, every worker process writes a
+snapshot there every METRICS_FLUSH_INTERVAL_SECONDS and /metrics merges the
+snapshots of all live workers: counters, histograms and additive gauges
+(connections, jobs) are summed, while gauges registered with
+`aggregate="max"` (lag, longest wait) report the largest worker value. Series of a worker that exited disappear
+with it, which Prometheus treats as an ordinary counter reset.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.instrumentation import query_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+Labels = Tuple[str, ...]
+
+# Snapshot files written by MetricsExporter; anything else in METRICS_DIR is ignored
+SNAPSHOT_FILE_RE = re.compile(r"metrics-(\d+)\.json")
+
+AGGREGATIONS = ("sum", "max")
+
+
+class Counter:
+    type = "counter"
+    aggregate = "sum"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Dict[Labels, Any]:
+        return self.values
+
+
+class Histogram:
+    type = "histogram"
+    aggregate = "sum"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Dict[Labels, Any]:
+        return self.values
+
+
+class Callback:
+    """
+    Values read from `func` at collection time, as {labels: value}.
+    `aggregate` says how the values of several workers are combined.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, type: str, func: Callable[[], Dict[Labels, float]],
+        labelnames: Sequence[str] = (), aggregate: str = "sum",
+    ):
+        if aggregate not in AGGREGATIONS:
+            raise ValueError(f"aggregate must be one of {AGGREGATIONS}")
+        if type == "counter" and aggregate != "sum":
+            raise ValueError("Counters can only be summed")
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self.aggregate = aggregate
+
+    def samples(self) -> Dict[Labels, Any]:
+        try:
+            return self.func()
+        except Exception:
+            logger.exception("Metric callback %s failed", self.name)
+            return {}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self, name: str, documentation: str, type: str, func: Callable[[], Dict[Labels, float]],
+        labelnames: Sequence[str] = (), aggregate: str = "sum",
+    ) -> Callback:
+        return self.register(Callback(name, documentation, type, func, labelnames, aggregate))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable view of every metric in this process."""
+        return {
+            "pid": os.getpid(),
+            "metrics": {
+                metric.name: {
+                    "type": metric.type,
+                    "aggregate": metric.aggregate,
+                    "help": metric.documentation,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "samples": [[list(labels), value] for labels, value in metric.samples().items()],
+                }
+                for metric in self.metrics.values()
+            },
+        }
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Combine the samples of several processes, metric by metric: summed, or
+    the largest value for metrics aggregated with "max".
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot["metrics"].items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            combine = max if metric.get("aggregate", "sum") == "max" else lambda a, b: a + b
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["samples"][key] = combine(current, value)
+    return merged
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(merged: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+        for labels, value in metric["samples"].items():
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(names, labels, str(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"]
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"]
+)
+http_request_queries = registry.histogram(
+    "http_request_db_queries", "Database queries run per HTTP request.", ["method", "route"], COUNT_BUCKETS
+)
+
+# --- Database ---
+db_queries = registry.counter("db_queries_total", "Database statements executed.", ["statement"])
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Database statement latency.", ["statement"], QUERY_BUCKETS
+)
+db_pool_checkouts = registry.counter("db_pool_checkouts_total", "Connections checked out of the pool.")
+db_pool_connects = registry.counter("db_pool_connections_created_total", "New database connections opened.")
+
+# --- Hashing and tokens ---
+password_hash_duration = registry.histogram(
+    "password_hash_duration_seconds", "Time to hash or verify a password, queueing included.",
+    ["operation"], (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+tokens_issued = registry.counter("tokens_issued_total", "JWTs issued by type.", ["type"])
+token_verifications = registry.counter(
+    "token_verifications_total", "Access token verifications by result.", ["result"]
+)
+
+STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def instrument_engine(engine: Any, pool_metrics: bool = True) -> None:
+    """
+    Attach cursor listeners, and with `pool_metrics` pool listeners, to an
+    (async) engine. Pool metrics describe a single engine: the primary's.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_start", time.perf_counter())
+        kind = statement.lstrip()[:6].upper()
+        kind = kind if kind in STATEMENT_KINDS else "OTHER"
+        db_queries.inc(kind)
+        db_query_duration.observe(elapsed, kind)
+
+    if not pool_metrics:
+        return
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts.inc()
+
+    @event.listens_for(sync_engine.pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        db_pool_connects.inc()
+
+    def pool_state() -> Dict[Labels, float]:
+        pool = sync_engine.pool
+        state = {}
+        for key in ("size", "checkedin", "checkedout", "overflow"):
+            func = getattr(pool, key, None)
+            if func is not None:
+                state[(key,)] = func()
+        return state
+
+    registry.callback("db_pool_connections", "Pool connections by state.", "gauge", pool_state, ["state"])
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and query count per route template (e.g.
+    /v1/users/{user_id}), keeping label cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Filled in by the SQL instrumentation middleware wrapping this one
+            stats = query_stats.get()
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, path, str(status_code))
+            http_request_duration.observe(elapsed, method, path)
+            http_request_queries.observe(stats.queries if stats is not None else 0, method, path)
+
+
+class MetricsExporter:
+    """Shares this worker's metrics with the other workers through METRICS_DIR."""
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+
+    def write(self) -> None:
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        if self.directory and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def collect(self) -> str:
+        """Render the metrics of this process plus every other live worker."""
+        snapshots = [registry.snapshot()]
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                match = SNAPSHOT_FILE_RE.fullmatch(os.path.basename(path))
+                if match is None:
+                    continue
+                pid = int(match.group(1))
+                if pid == os.getpid() or not _is_alive(pid):
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return render(merge_snapshots(snapshots))
+
+    async def run(self, interval_seconds: float) -> None:
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    self.write()
+                except OSError:
+                    logger.exception("Writing metrics snapshot failed")
+        finally:
+            self.remove()
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,289 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+rate_limited_requests = registry.counter(
+    "rate_limited_requests_total", "Requests rejected by the rate limiter.", ["path"]
+)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A token bucket holding `amount` tokens, refilled evenly over `period` seconds."""
+
+    amount: int
+    period: int
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse limits written as "5/minute" or "100/hour"."""
+        amount, _, period = value.partition("/")
+        period = period.strip().rstrip("s")
+        if period not in PERIODS:
+            raise ValueError(f"Invalid rate limit: {value}")
+        return cls(amount=int(amount), period=PERIODS[period])
+
+    @property
+    def refill_rate(self) -> float:
+        return self.amount / self.period
+
+
+def _consume(tokens: float, updated: float, limit: RateLimit, now: float) -> Tuple[bool, float, float]:
+    """Refill a bucket up to `now` and try to take one token from it."""
+    tokens = min(limit.amount, tokens + (now - updated) * limit.refill_rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / limit.refill_rate
+
+
+class MemoryBackend:
+    """Buckets held in this process only; each worker enforces its own limits."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._deadlines: Dict[str, float] = {}
+
+    async def hit(self, key: str, limit: RateLimit, now: float) -> Tuple[bool, int, float]:
+        tokens, updated = self._buckets.get(key, (limit.amount, now))
+        allowed, tokens, retry_after = _consume(tokens, updated, limit, now)
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > 100000:
+            # Drop buckets that have refilled completely; they carry no state
+            self._buckets = {
+                k: (t, u) for k, (t, u) in self._buckets.items() if now - u < limit.period
+            }
+        return allowed, int(tokens), retry_after
+
+    async def set_deadline(self, key: str, until: float) -> None:
+        self._deadlines[key] = until
+        if len(self._deadlines) > 100000:
+            now = time.time()
+            self._deadlines = {k: t for k, t in self._deadlines.items() if t > now}
+
+    async def get_deadline(self, key: str) -> float:
+        return self._deadlines.get(key, 0.0)
+
+
+class SharedMemoryBackend:
+    """
+    Buckets stored in an mmap-backed file (under /dev/shm when available),
+    so every worker process on the host shares the same counters. The table
+    is 4-way set associative; each set is guarded by an fcntl record lock and
+    the least recently used slot of a full set is recycled.
+
+    The lock is taken on the event loop: it only covers reading and writing
+    four slots of one set, so waiting for it costs less than a thread hop.
+    Needs `fcntl` (POSIX only); raises ImportError elsewhere.
+    """
+
+    SLOT = struct.Struct("<Qdd")  # key hash, tokens, last update
+    WAYS = 4
+
+    def __init__(self, path: str, sets: int = 16384):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self.sets = sets
+        self.set_size = self.SLOT.size * self.WAYS
+        size = self.set_size * sets
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def _lookup(self, key: str) -> Tuple[int, int]:
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") | 1
+        return key_hash, (key_hash % self.sets) * self.set_size
+
+    @contextmanager
+    def _locked(self, offset: int, shared: bool = False) -> Iterator[None]:
+        """Hold the record lock of the set at `offset`; keep the body to slot reads and writes."""
+        mode = self._fcntl.LOCK_SH if shared else self._fcntl.LOCK_EX
+        self._fcntl.lockf(self._fd, mode, self.set_size, offset, os.SEEK_SET)
+        try:
+            yield
+        finally:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, self.set_size, offset, os.SEEK_SET)
+
+    def _find(self, key_hash: int, offset: int) -> Tuple[Optional[int], int, float, float]:
+        """(slot, LRU slot, value, updated) of `key_hash` in its set; slot is None if absent."""
+        oldest, oldest_updated = offset, math.inf
+        for position in range(offset, offset + self.set_size, self.SLOT.size):
+            stored_hash, stored_value, stored_updated = self.SLOT.unpack_from(self._map, position)
+            if stored_hash == key_hash:
+                return position, oldest, stored_value, stored_updated
+            if stored_updated < oldest_updated:
+                oldest, oldest_updated = position, stored_updated
+        return None, oldest, 0.0, 0.0
+
+    async def hit(self, key: str, limit: RateLimit, now: float) -> Tuple[bool, int, float]:
+        key_hash, offset = self._lookup(key)
+        with self._locked(offset):
+            slot, oldest, tokens, updated = self._find(key_hash, offset)
+            if slot is None:
+                slot, tokens, updated = oldest, float(limit.amount), now
+            allowed, tokens, retry_after = _consume(tokens, updated, limit, now)
+            self.SLOT.pack_into(self._map, slot, key_hash, tokens, now)
+        return allowed, int(tokens), retry_after
+
+    async def set_deadline(self, key: str, until: float) -> None:
+        key_hash, offset = self._lookup(key)
+        now = time.time()
+        with self._locked(offset):
+            slot, oldest, _, _ = self._find(key_hash, offset)
+            self.SLOT.pack_into(self._map, oldest if slot is None else slot, key_hash, until, now)
+
+    async def get_deadline(self, key: str) -> float:
+        key_hash, offset = self._lookup(key)
+        with self._locked(offset, shared=True):
+            slot, _, until, _ = self._find(key_hash, offset)
+        return until if slot is not None else 0.0
+
+
+class RedisBackend:
+    """Buckets kept in Redis, for limits shared by several hosts. Needs the `redis` package."""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local amount = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or amount
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(amount, tokens + (now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(amount / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, limit: RateLimit, now: float) -> Tuple[bool, int, float]:
+        allowed, tokens = await self._script(
+            keys=[f"ratelimit:{key}"], args=[limit.amount, limit.refill_rate, now]
+        )
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (1 - tokens) / limit.refill_rate
+        return bool(allowed), int(tokens), retry_after
+
+    async def set_deadline(self, key: str, until: float) -> None:
+        ttl_ms = int((until - time.time()) * 1000)
+        if ttl_ms > 0:
+            await self._client.set(f"deadline:{key}", repr(until), px=ttl_ms)
+
+    async def get_deadline(self, key: str) -> float:
+        value = await self._client.get(f"deadline:{key}")
+        return float(value) if value is not None else 0.0
+
+
+def default_shm_path(name: str) -> str:
+    """
+    Shared memory file for `name`, namespaced by the project and database
+    so separate deployments (or test runs) on one host don't share tables.
+    """
+    namespace = hashlib.blake2b(
+        f"{settings.PROJECT_NAME}|{settings.DATABASE_URL}".encode(), digest_size=6
+    ).hexdigest()
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"fastapi-starter-{name}-{namespace}")
+
+
+def create_backend(storage_uri: str, name: str = "ratelimit") -> Any:
+    """
+    Build a backend from a storage URI: "memory://", "shm://" (default
+    file for `name`), "shm:///path/to/file" or "redis://host:6379/0".
+    shm:// falls back to memory:// where fcntl is unavailable (Windows).
+
+    Besides token buckets, every backend keeps per-key deadlines
+    (`set_deadline` / `get_deadline`, Unix times, 0 when unset).
+    """
+    scheme, _, path = storage_uri.partition("://")
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme == "shm":
+        try:
+            return SharedMemoryBackend(path or default_shm_path(name))
+        except ImportError:
+            logger.warning("shm:// needs fcntl, which this platform lacks; %s falls back to memory://", name)
+            return MemoryBackend()
+    if scheme in ("redis", "rediss"):
+        return RedisBackend(storage_uri)
+    raise ValueError(f"Unsupported rate limit storage: {storage_uri}")
+
+
+class RateLimitMiddleware:
+    """
+    Token bucket rate limiting per client address for the configured
+    (method, path) pairs. Other routes cost a single dict lookup. Limited
+    requests are rejected before routing or body parsing.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[Tuple[str, str], str], backend: Any):
+        self.app = app
+        self.limits = {route: RateLimit.parse(value) for route, value in limits.items()}
+        self.backend = backend
+        self.rejected = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit: Optional[RateLimit] = None
+        if scope["type"] == "http":
+            limit = self.limits.get((scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        key = f"{client[0] if client else '127.0.0.1'}:{scope['path']}"
+        allowed, remaining, retry_after = await self.backend.hit(key, limit, time.time())
+        headers = {
+            "X-RateLimit-Limit": str(limit.amount),
+            "X-RateLimit-Remaining": str(remaining),
+        }
+        if allowed:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message["headers"]) + [
+                        (name.lower().encode(), value.encode()) for name, value in headers.items()
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+            return
+
+        self.rejected += 1
+        rate_limited_requests.inc(scope["path"])
+        headers["Retry-After"] = str(math.ceil(retry_after))
+        response = ORJSONResponse(
+            status_code=429,
+            content={"code": 429, "message": "Too many requests, please try again later"},
+            headers=headers,
+        )
+        await response(scope, receive, send)
@@ -1,15 +1,20 @@
+import hashlib
+import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
-from jose import jwt
+from typing import Any, List, Union
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import tokens_issued
+from app.core.tokens import token_codec
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def create_token(subject: Union[str, Any], expires_delta: timedelta, type: str) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject), "type": type}
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    # jti keeps stored tokens unique even when issued in the same second
+    to_encode = {"exp": int(expire.timestamp()), "sub": str(subject), "type": type, "jti": uuid.uuid4().hex}
+    encoded_jwt = token_codec.encode(to_encode)
+    tokens_issued.inc(to_encode["type"])
     return encoded_jwt
 
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
@@ -18,8 +23,9 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_ACCESS_EXPIRATION_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    to_encode = {"exp": int(expire.timestamp()), "sub": str(subject), "type": "access"}
+    encoded_jwt = token_codec.encode(to_encode)
+    tokens_issued.inc(to_encode["type"])
     return encoded_jwt
 
 def create_refresh_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
@@ -28,12 +34,22 @@ def create_refresh_token(subject: Union[str, Any], expires_delta: timedelta = No
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=settings.JWT_REFRESH_EXPIRATION_DAYS)
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    to_encode = {"exp": int(expire.timestamp()), "sub": str(subject), "type": "refresh", "jti": uuid.uuid4().hex}
+    encoded_jwt = token_codec.encode(to_encode)
+    tokens_issued.inc(to_encode["type"])
     return encoded_jwt
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def get_password_hashes(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+def get_token_digest(token: str) -> str:
+    """
+    Fixed-size digest under which tokens are stored and looked up.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
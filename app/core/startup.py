@@ -0,0 +1,69 @@
+"""
+Startup timing.
+
+`app.main` imports this module first, so importing it also times the
+imports of the heavy dependencies (the first import of a package pays for
+everything it pulls in). Later phases are recorded with `mark()` and the
+whole report is logged once the app is ready to serve.
+"""
+import importlib
+import logging
+import sys
+import time
+from importlib.util import find_spec
+from typing import Dict, List, Tuple
+
+# uvicorn's logger, so the report shows up with the server's default log config
+logger = logging.getLogger("uvicorn.error")
+
+# In dependency order, so each figure mostly covers the package itself
+HEAVY_DEPENDENCIES = (
+    "pydantic",
+    "email_validator",
+    "starlette",
+    "fastapi",
+    "sqlalchemy",
+    "passlib.context",
+    "cryptography.hazmat.primitives.asymmetric.ec",
+    "orjson",
+)
+
+
+class StartupReport:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> float:
+        """Record the time since the previous mark as `phase`."""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.phases.append((phase, elapsed))
+        return elapsed
+
+    def time_imports(self, modules: Tuple[str, ...]) -> None:
+        for name in modules:
+            if name in sys.modules or find_spec(name.partition(".")[0]) is None:
+                continue
+            importlib.import_module(name)
+            self.mark(f"import {name}")
+
+    @property
+    def total_seconds(self) -> float:
+        return self._last - self.started
+
+    def log(self) -> None:
+        lines = [f"  {phase:<52} {seconds * 1000:9.1f} ms" for phase, seconds in self.phases]
+        logger.info("Startup took %.1f ms:\n%s", self.total_seconds * 1000, "\n".join(lines))
+
+    def get_stats(self) -> Dict[str, float]:
+        stats: Dict[str, float] = {}
+        for phase, seconds in self.phases:
+            stats[phase] = stats.get(phase, 0.0) + seconds
+        return stats
+
+
+startup_report = StartupReport()
+startup_report.time_imports(HEAVY_DEPENDENCIES)
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+from string import Template
+from typing import Dict, Tuple
+
+
+@dataclass(frozen=True)
+class MessageTemplate:
+    subject: Template
+    text: Template
+
+    def render(self, **context: str) -> Tuple[str, str]:
+        return self.subject.substitute(context), self.text.substitute(context)
+
+
+# Parsed once at import; rendering is a single substitution per part
+TEMPLATES: Dict[str, MessageTemplate] = {
+    "reset_password": MessageTemplate(
+        subject=Template("Reset password"),
+        text=Template(
+            "Dear user,\n"
+            "To reset your password, click on this link: $frontend_url/reset-password?token=$token\n"
+            "If you did not request any password resets, then ignore this email."
+        ),
+    ),
+    "verify_email": MessageTemplate(
+        subject=Template("Email Verification"),
+        text=Template(
+            "Dear user,\n"
+            "To verify your email, click on this link: $frontend_url/verify-email?token=$token\n"
+            "If you did not create an account, then ignore this email."
+        ),
+    ),
+}
+
+
+def render(name: str, **context: str) -> Tuple[str, str]:
+    """Render template `name` into (subject, text)."""
+    return TEMPLATES[name].render(**context)
@@ -0,0 +1,301 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+
+from app.core.config import settings
+from app.core.metrics import token_verifications
+from app.schemas.token import TokenPayload
+
+DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+class TokenError(Exception):
+    pass
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class HmacKey:
+    """Shared-secret key (HS256/384/512); never published."""
+
+    kid = None
+
+    def __init__(self, secret: str, algorithm: str = "HS256"):
+        if algorithm not in DIGESTS:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        self.alg = algorithm
+        self.can_sign = True
+        self._hmac = hmac.new(secret.encode(), digestmod=DIGESTS[algorithm])
+
+    def sign(self, signing_input: bytes) -> bytes:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def verify(self, signature: bytes, signing_input: bytes) -> bool:
+        return hmac.compare_digest(signature, self.sign(signing_input))
+
+
+class AsymmetricKey:
+    """
+    Ed25519 (EdDSA) or P-256 (ES256) key loaded from PEM. Public-only keys
+    verify tokens signed before a rotation but cannot sign new ones.
+    """
+
+    def __init__(self, key: Any):
+        if isinstance(key, (ed25519.Ed25519PrivateKey, ec.EllipticCurvePrivateKey)):
+            self._private_key = key
+            self._public_key = key.public_key()
+        else:
+            self._private_key = None
+            self._public_key = key
+        self.can_sign = self._private_key is not None
+
+        if isinstance(self._public_key, ed25519.Ed25519PublicKey):
+            self.alg = "EdDSA"
+            raw = self._public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            self.jwk = {"crv": "Ed25519", "kty": "OKP", "x": _b64encode(raw).decode()}
+        elif isinstance(self._public_key, ec.EllipticCurvePublicKey) and self._public_key.curve.name == "secp256r1":
+            self.alg = "ES256"
+            numbers = self._public_key.public_numbers()
+            self.jwk = {
+                "crv": "P-256",
+                "kty": "EC",
+                "x": _b64encode(numbers.x.to_bytes(32, "big")).decode(),
+                "y": _b64encode(numbers.y.to_bytes(32, "big")).decode(),
+            }
+        else:
+            raise ValueError("Only Ed25519 and P-256 keys are supported")
+        # RFC 7638 thumbprint: stable across restarts and hosts
+        self.kid = _b64encode(hashlib.sha256(orjson.dumps(self.jwk, option=orjson.OPT_SORT_KEYS)).digest()).decode()
+
+    @classmethod
+    def from_pem(cls, data: bytes) -> "AsymmetricKey":
+        if b"PRIVATE KEY" in data:
+            return cls(serialization.load_pem_private_key(data, password=None))
+        return cls(serialization.load_pem_public_key(data))
+
+    def sign(self, signing_input: bytes) -> bytes:
+        if self.alg == "EdDSA":
+            return self._private_key.sign(signing_input)
+        r, s = decode_dss_signature(self._private_key.sign(signing_input, ec.ECDSA(hashes.SHA256())))
+        return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+    def verify(self, signature: bytes, signing_input: bytes) -> bool:
+        try:
+            if self.alg == "EdDSA":
+                self._public_key.verify(signature, signing_input)
+            else:
+                if len(signature) != 64:
+                    return False
+                der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+                self._public_key.verify(der, signing_input, ec.ECDSA(hashes.SHA256()))
+        except InvalidSignature:
+            return False
+        return True
+
+    def public_pem(self) -> bytes:
+        return self._public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+    def to_public_jwk(self) -> Dict[str, str]:
+        return {**self.jwk, "kid": self.kid, "alg": self.alg, "use": "sig"}
+
+
+def load_keys(paths: Sequence[str]) -> List[AsymmetricKey]:
+    keys = []
+    for path in paths:
+        with open(path, "rb") as f:
+            keys.append(AsymmetricKey.from_pem(f.read()))
+    return keys
+
+
+def _header_segment(key: Any) -> bytes:
+    header = {"alg": key.alg, "typ": "JWT"}
+    if key.kid:
+        header["kid"] = key.kid
+    return _b64encode(orjson.dumps(header))
+
+
+class TokenCodec:
+    """
+    Encodes and verifies JWTs. With asymmetric `keys` the first one signs
+    (with a `kid` header) and every key verifies, so tokens issued before a
+    rotation stay valid; otherwise tokens are HMAC-signed with `secret`.
+    With `accept_hmac`, HMAC tokens are accepted next to the keys, which
+    lets a switch to asymmetric signing happen without logging anybody
+    out; without it, `secret` no longer verifies anything once keys are set.
+
+    Header segments are built once, and validated tokens are cached until
+    they expire, so a token presented again costs one dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        algorithm: str = "HS256",
+        cache_size: int = 10000,
+        keys: Sequence[AsymmetricKey] = (),
+        accept_hmac: bool = True,
+    ):
+        hmac_key = HmacKey(secret, algorithm)
+        if keys and not keys[0].can_sign:
+            raise ValueError("The first signing key must be a private key")
+        self.signing_key = keys[0] if keys else hmac_key
+        self.algorithm = self.signing_key.alg
+        self.cache_size = cache_size
+        self._header = _header_segment(self.signing_key)
+        # Exact header segment -> key, so known headers are never parsed
+        self._hmac_key = hmac_key if accept_hmac or not keys else None
+        verifiers = [hmac_key, *keys] if self._hmac_key is not None else list(keys)
+        self._verifiers = {_header_segment(key): key for key in verifiers}
+        self._keys_by_kid = {key.kid: key for key in keys}
+        self.jwks = orjson.dumps({"keys": [key.to_public_jwk() for key in keys]})
+        self._cache: "OrderedDict[str, TokenPayload]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        signing_input = self._header + b"." + _b64encode(orjson.dumps(claims))
+        return (signing_input + b"." + _b64encode(self.signing_key.sign(signing_input))).decode()
+
+    def _get_verifier(self, header: bytes) -> Any:
+        key = self._verifiers.get(header)
+        if key is not None:
+            return key
+        fields = orjson.loads(_b64decode(header))
+        if "kid" in fields:
+            key = self._keys_by_kid.get(fields["kid"])
+        elif self._hmac_key is not None and fields.get("alg") == self._hmac_key.alg:
+            key = self._hmac_key
+        if key is None or fields.get("alg") != key.alg:
+            raise TokenError("Invalid token header")
+        return key
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """
+        Verify the signature and expiry of a token and return its claims.
+        Raises TokenError when the token is malformed, forged or expired.
+        """
+        try:
+            signing_input, _, signature = token.encode().rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+            key = self._get_verifier(header)
+            if not key.verify(_b64decode(signature), signing_input):
+                raise TokenError("Signature verification failed")
+            claims = orjson.loads(_b64decode(payload))
+        except TokenError:
+            raise
+        except (ValueError, TypeError, AttributeError, orjson.JSONDecodeError):
+            raise TokenError("Malformed token")
+
+        if not isinstance(claims, dict):
+            raise TokenError("Malformed token")
+        exp = claims.get("exp")
+        if exp is not None and (not isinstance(exp, (int, float)) or exp <= time.time()):
+            raise TokenError("Signature has expired")
+        return claims
+
+    def verify(self, token: str) -> TokenPayload:
+        """
+        Like `decode`, but returns a validated TokenPayload and remembers it
+        until the token's `exp`, bounded to `cache_size` entries (LRU).
+        """
+        payload: Optional[TokenPayload] = self._cache.get(token)
+        if payload is not None:
+            if payload.exp is None or payload.exp > time.time():
+                self.hits += 1
+                token_verifications.inc("cached")
+                self._cache.move_to_end(token)
+                return payload
+            del self._cache[token]
+            token_verifications.inc("expired")
+            raise TokenError("Signature has expired")
+
+        self.misses += 1
+        try:
+            payload = TokenPayload(**self.decode(token))
+        except (TypeError, ValueError, TokenError) as exc:
+            token_verifications.inc("rejected")
+            raise TokenError(str(exc))
+        token_verifications.inc("verified")
+        if self.cache_size > 0:
+            self._cache[token] = payload
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return payload
+
+    def warm_up(self) -> None:
+        """Sign and verify a throwaway token, so no request pays for the crypto backend setup."""
+        self.decode(self.encode({"exp": int(time.time()) + 60, "sub": "warmup", "type": "warmup"}))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._cache),
+            "max_entries": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+token_codec = TokenCodec(
+    settings.JWT_SECRET,
+    settings.JWT_ALGORITHM,
+    cache_size=settings.TOKEN_CACHE_MAX_ENTRIES,
+    keys=load_keys([path.strip() for path in (settings.JWT_KEY_FILES or "").split(",") if path.strip()]),
+    accept_hmac=settings.JWT_ACCEPT_HMAC,
+)
+
+
+def generate_key(algorithm: str) -> bytes:
+    """Create a private signing key in PEM form."""
+    if algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    elif algorithm == "ES256":
+        key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JWT signing key tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate-key", help="print a new private key (PEM)")
+    generate.add_argument("--algorithm", choices=["EdDSA", "ES256"], default="EdDSA")
+    public = commands.add_parser("public-key", help="print the public key (PEM) of a private key file")
+    public.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "generate-key":
+        print(generate_key(args.algorithm).decode(), end="")
+    else:
+        print(load_keys([args.path])[0].public_pem().decode(), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,3 @@
 from .crud_user import user
-from .crud_token import token
\ No newline at end of file
+from .crud_token import token
+from .crud_email import email_outbox
\ No newline at end of file
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.email import OutboxEmail
+
+
+class CRUDEmailOutbox:
+    async def enqueue(self, db: AsyncSession, *, recipient: str, subject: str, body: str) -> OutboxEmail:
+        message = OutboxEmail(
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.add(message)
+        await db.flush()
+        return message
+
+    async def claim_due(self, db: AsyncSession, *, now: datetime, limit: int, lease: timedelta) -> List[OutboxEmail]:
+        """
+        Take up to `limit` due messages by pushing their `next_attempt_at`
+        past the lease, so other senders skip them. Messages of a sender that
+        died are picked up again once the lease runs out.
+        """
+        due = (
+            select(OutboxEmail.id)
+            .where(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.id)
+            .limit(limit)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            due = due.with_for_update(skip_locked=True)
+        result = await db.execute(
+            update(OutboxEmail)
+            .where(
+                OutboxEmail.id.in_(due.scalar_subquery()),
+                OutboxEmail.status == "pending",
+                OutboxEmail.next_attempt_at <= now,
+            )
+            .values(next_attempt_at=now + lease, attempts=OutboxEmail.attempts + 1)
+            .returning(OutboxEmail)
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(result.scalars().all(), key=lambda message: message.id)
+
+    async def mark_sent(self, db: AsyncSession, ids: List[int], now: datetime) -> None:
+        if ids:
+            await db.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(ids))
+                .values(status="sent", sent_at=now, body="", last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+
+    async def mark_failed(
+        self, db: AsyncSession, id: int, *, error: str, retry_at: Optional[datetime] = None
+    ) -> None:
+        """
+        Record a failed attempt; the message is retried at `retry_at`, or
+        given up on when it is None.
+        """
+        values = {"last_error": error[:500]}
+        if retry_at is None:
+            values.update(status="failed", body="")
+        else:
+            values["next_attempt_at"] = retry_at
+        await db.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id == id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def delete_finished(self, db: AsyncSession, *, before: datetime, limit: int = 1000) -> int:
+        """
+        Delete up to `limit` sent or given up messages queued before `before`.
+        Returns the number of rows removed.
+        """
+        batch = (
+            select(OutboxEmail.id)
+            .where(OutboxEmail.status.in_(("sent", "failed")), OutboxEmail.created_at < before)
+            .limit(limit)
+        )
+        result = await db.execute(
+            delete(OutboxEmail)
+            .where(OutboxEmail.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+email_outbox = CRUDEmailOutbox()
@@ -1,38 +1,83 @@
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import get_token_digest
 from app.models.token import Token
 from datetime import datetime
 
 class CRUDToken:
-    def create(self, db: Session, token: str, user_id: int, type: str, expires: datetime) -> Token:
+    async def create(self, db: AsyncSession, token: str, user_id: int, type: str, expires: datetime) -> Token:
         db_token = Token(
-            token=token,
+            token_digest=get_token_digest(token),
             user_id=user_id,
             type=type,
             expires=expires,
             blacklisted=False
         )
         db.add(db_token)
-        db.commit()
-        db.refresh(db_token)
+        await db.flush()
         return db_token
 
-    def get_by_token(self, db: Session, token: str, type: str) -> Optional[Token]:
-        return db.query(Token).filter(
-            Token.token == token, 
+    async def get_by_token(self, db: AsyncSession, token: str, type: str) -> Optional[Token]:
+        result = await db.execute(select(Token).filter(
+            Token.token_digest == get_token_digest(token), 
             Token.type == type, 
             Token.blacklisted == False
-        ).first()
+        ))
+        return result.scalars().first()
 
-    def delete_tokens_by_user(self, db: Session, user_id: int, type: str):
+    async def delete_tokens_by_user(self, db: AsyncSession, user_id: int, type: str):
         # Equivalent to deleteMany in Mongoose
-        db.query(Token).filter(Token.user_id == user_id, Token.type == type).delete()
-        db.commit()
+        await db.execute(delete(Token).where(Token.user_id == user_id, Token.type == type))
 
-    def blacklist_token(self, db: Session, token_str: str, type: str):
-        token_doc = self.get_by_token(db, token_str, type)
+    async def rotate(
+        self, db: AsyncSession, *, token: str, new_token: str, user_id: int, type: str, expires: datetime
+    ) -> bool:
+        """
+        Blacklist `token` and store `new_token` with an UPDATE ... RETURNING
+        followed by the INSERT, both in the caller's transaction.
+        Returns False when `token` is unknown, already used or does not
+        belong to `user_id`; the caller must then roll back (raising from the
+        endpoint does that), so replays are rejected even when refreshes race.
+        """
+        result = await db.execute(
+            update(Token)
+            .where(
+                Token.token_digest == get_token_digest(token),
+                Token.type == type,
+                Token.blacklisted == False,
+            )
+            .values(blacklisted=True)
+            .returning(Token.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        owner_id = result.scalar_one_or_none()
+        if owner_id is None or owner_id != user_id:
+            return False
+
+        db.add(Token(
+            token_digest=get_token_digest(new_token),
+            user_id=user_id,
+            type=type,
+            expires=expires,
+            blacklisted=False
+        ))
+        await db.flush()
+        return True
+
+    async def delete_expired(self, db: AsyncSession, now: datetime, limit: int = 1000) -> int:
+        """
+        Delete up to `limit` expired or blacklisted tokens.
+        Returns the number of rows removed.
+        """
+        batch = select(Token.id).where(or_(Token.expires < now, Token.blacklisted == True)).limit(limit)
+        result = await db.execute(delete(Token).where(Token.id.in_(batch)))
+        return result.rowcount
+
+    async def blacklist_token(self, db: AsyncSession, token_str: str, type: str):
+        token_doc = await self.get_by_token(db, token_str, type)
         if token_doc:
             token_doc.blacklisted = True
-            db.commit()
+            await db.flush()
 
-token = CRUDToken()
\ No newline at end of file
+token = CRUDToken()
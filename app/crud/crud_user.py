@@ -1,31 +1,117 @@
-from typing import Any, Dict, Optional, Union
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+from sqlalchemy import event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.core.hashing import password_hasher
+from app.core.principal import principal_cache
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
+def invalidate_principal_on_commit(db: AsyncSession, user_id: int) -> None:
+    """
+    Drop the user's cached principal once the session commits. Dropping it
+    earlier would let a concurrent request cache the old row again.
+    """
+    pending = db.info.setdefault("invalidated_principals", set())
+    if not pending:
+        def invalidate(session: Any) -> None:
+            for id in session.info.pop("invalidated_principals", ()):
+                principal_cache.invalidate(id)
+        event.listen(db.sync_session, "after_commit", invalidate, once=True)
+    pending.add(user_id)
+
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
-    def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        result = await db.execute(select(User).filter(User.email == email))
+        return result.scalars().first()
+
+    async def get_existing_emails(self, db: AsyncSession, *, emails: Iterable[str]) -> Set[str]:
+        result = await db.execute(select(User.email).where(User.email.in_(list(emails))))
+        return set(result.scalars().all())
+
+    async def create_many(self, db: AsyncSession, *, objs_in: List[UserCreate]) -> List[int]:
+        """
+        Insert many users at once: passwords are hashed across all hashing
+        workers, then rows are written with COPY on Postgres (asyncpg) or a
+        single executemany elsewhere. If an email turns out to be taken (a
+        concurrent insert), the batch is rolled back to a savepoint and
+        retried row by row. Returns the positions in `objs_in` of the rows
+        skipped because their email already exists.
+        """
+        hashed_passwords = await password_hasher.hash_many([obj_in.password for obj_in in objs_in])
+        rows = [
+            {
+                "email": obj_in.email,
+                "hashed_password": hashed_password,
+                "name": obj_in.name,
+                "role": obj_in.role,
+                "is_active": obj_in.is_active,
+                "is_email_verified": obj_in.is_email_verified,
+            }
+            for obj_in, hashed_password in zip(objs_in, hashed_passwords)
+        ]
+        if not rows:
+            return []
+
+        try:
+            async with db.begin_nested():
+                await self._insert_rows(db, rows)
+            return []
+        except IntegrityError:
+            pass
+
+        rejected = []
+        for i, row in enumerate(rows):
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(User.__table__), [row])
+            except IntegrityError:
+                rejected.append(i)
+        return rejected
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    async def _insert_rows(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        conn = await db.connection()
+        if conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg":
+            raw = await conn.get_raw_connection()
+            driver_conn = raw.driver_connection
+            if not driver_conn.is_in_transaction():
+                # Make SQLAlchemy open its transaction so COPY joins it
+                await conn.exec_driver_sql("SELECT 1")
+            columns = list(rows[0])
+            try:
+                await driver_conn.copy_records_to_table(
+                    User.__tablename__,
+                    records=[tuple(row[column] for column in columns) for row in rows],
+                    columns=columns,
+                )
+            except Exception as exc:
+                # COPY bypasses SQLAlchemy, so asyncpg's UniqueViolationError
+                # (SQLSTATE 23505) arrives untranslated
+                if getattr(exc, "sqlstate", None) == "23505":
+                    raise IntegrityError(f"COPY {User.__tablename__}", None, exc) from exc
+                raise
+        else:
+            await db.execute(insert(User.__table__), rows)
+
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+        hashed_password = await password_hasher.hash(obj_in.password)
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashed_password,
             name=obj_in.name,
             role=obj_in.role,
             is_active=obj_in.is_active,
             is_email_verified=obj_in.is_email_verified,
+            updated_at=None, # known on insert, saves a post-insert SELECT
         )
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.flush()
         return db_obj
 
-    def update(
-        self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
+    async def update(
+        self, db: AsyncSession, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
     ) -> User:
         if isinstance(obj_in, dict):
             update_data = obj_in
@@ -33,18 +119,25 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             update_data = obj_in.model_dump(exclude_unset=True)
             
         if "password" in update_data and update_data["password"]:
-            hashed_password = get_password_hash(update_data["password"])
+            hashed_password = await password_hasher.hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
             
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        db_obj = await super().update(db, db_obj=db_obj, obj_in=update_data)
+        invalidate_principal_on_commit(db, db_obj.id)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: int) -> User:
+        obj = await super().remove(db, id=id)
+        invalidate_principal_on_commit(db, id)
+        return obj
 
-    def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
-        user = self.get_by_email(db, email=email)
+    async def authenticate(self, db: AsyncSession, *, email: str, password: str) -> Optional[User]:
+        user = await self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
         return user
 
-user = CRUDUser(User)
\ No newline at end of file
+user = CRUDUser(User)
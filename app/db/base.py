@@ -1,3 +1,5 @@
 from app.db.session import Base  # noqa
 from app.models.user import User  # noqa
-from app.models.token import Token # noqa
\ No newline at end of file
+from app.models.token import Token # noqa
+from app.models.email import OutboxEmail # noqa
+from app.models.heartbeat import ReplicationHeartbeat # noqa
\ No newline at end of file
@@ -1,13 +1,15 @@
+import asyncio
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, schemas
 from app.core.config import settings
+from app.db.session import SessionLocal
 
 logger = logging.getLogger(__name__)
 
-def init_db(db: Session) -> None:
+async def init_db(db: AsyncSession) -> None:
     # Create superuser if it doesn't exist
-    user = crud.user.get_by_email(db, email="admin@example.com")
+    user = await crud.user.get_by_email(db, email="admin@example.com")
     if not user:
         user_in = schemas.UserCreate(
             email="admin@example.com",
@@ -17,7 +19,16 @@ def init_db(db: Session) -> None:
             is_active=True,
             is_email_verified=True,
         )
-        user = crud.user.create(db, obj_in=user_in)
+        user = await crud.user.create(db, obj_in=user_in)
+        await db.commit()
         logger.info("Superuser created")
     else:
-        logger.info("Superuser already exists")
\ No newline at end of file
+        logger.info("Superuser already exists")
+
+async def main() -> None:
+    async with SessionLocal() as db:
+        await init_db(db)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Per-request SQL instrumentation.
+
+Cursor listeners on the engine count the statements of the current
+request and their time, remember how often each statement shape (the SQL
+text, with parameters bound separately) ran, log slow statements and
+enforce the request's query budget. A statement shape repeated
+SQL_N_PLUS_ONE_THRESHOLD times in one request is reported as a likely N+1.
+"""
+import contextvars
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Budgets raise in these environments and are only logged elsewhere
+ENFORCING_ENVIRONMENTS = {"development", "test"}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    __slots__ = ("queries", "seconds", "shapes", "budget")
+
+    def __init__(self, budget: Optional[int] = None):
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes: Dict[str, int] = {}
+        self.budget = budget
+
+    def repeated_shapes(self, threshold: int) -> Dict[str, int]:
+        if threshold <= 0:
+            return {}
+        return {statement: count for statement, count in self.shapes.items() if count >= threshold}
+
+
+query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+
+def query_budget(limit: int) -> Callable[[], None]:
+    """
+    Route dependency capping the statements a request may run, e.g.
+    `dependencies=[Depends(query_budget(3))]`.
+    """
+    def set_budget() -> None:
+        stats = query_stats.get()
+        if stats is not None:
+            stats.budget = limit
+
+    return set_budget
+
+
+def parameters_shape(parameters: Any, executemany: bool = False) -> str:
+    """Describe bound parameters by type only, so values never reach the logs."""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{len(parameters)} x {parameters_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+def _enforce_budget(stats: QueryStats, statement: str) -> None:
+    if stats.budget is None or stats.queries <= stats.budget:
+        return
+    message = f"Query budget of {stats.budget} exceeded by: {statement[:200]}"
+    if settings.ENVIRONMENT in ENFORCING_ENVIRONMENTS:
+        raise QueryBudgetExceeded(message)
+    if stats.queries == stats.budget + 1:
+        logger.warning(message)
+
+
+def instrument_queries(engine: Any) -> None:
+    """Attach the per-request cursor listeners to an (async) engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    slow_seconds = settings.SQL_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = query_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.shapes[statement] = stats.shapes.get(statement, 0) + 1
+            _enforce_budget(stats, statement)
+        conn.info["instrumentation_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("instrumentation_start", time.perf_counter())
+        stats = query_stats.get()
+        if stats is not None:
+            stats.seconds += elapsed
+        if slow_seconds and elapsed >= slow_seconds:
+            logger.warning(
+                "Slow query (%.1f ms): %s params=%s",
+                elapsed * 1000, " ".join(statement.split()), parameters_shape(parameters, executemany),
+            )
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Tracks the SQL of each request. Repeated statement shapes are logged as
+    N+1 suspects, and with SQL_DEBUG_HEADERS the totals are returned in
+    X-DB-Queries, X-DB-Time-Ms and X-DB-N-Plus-One.
+    """
+
+    def __init__(self, app: ASGIApp, budget: Optional[int] = None, n_plus_one_threshold: int = 5, debug_headers: bool = False):
+        self.app = app
+        self.budget = budget
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(self.budget)
+        token = query_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if self.debug_headers and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Queries"] = str(stats.queries)
+                headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
+                headers["X-DB-N-Plus-One"] = str(len(stats.repeated_shapes(self.n_plus_one_threshold)))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
+            for statement, count in stats.repeated_shapes(self.n_plus_one_threshold).items():
+                logger.warning(
+                    "Possible N+1 in %s %s: statement ran %s times: %s",
+                    scope["method"], scope["path"], count, " ".join(statement.split())[:300],
+                )
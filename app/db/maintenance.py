@@ -0,0 +1,263 @@
+"""
+Database maintenance tasks.
+
+Run from the command line:
+    python -m app.db.maintenance purge-tokens [--batch-size N]
+    python -m app.db.maintenance purge-outbox [--batch-size N]
+    python -m app.db.maintenance partition-tokens   # Postgres only, one-off
+
+or in-process through `run_periodic_token_purge` and
+`run_periodic_outbox_purge`, which the app starts on boot when
+TOKEN_PURGE_INTERVAL_SECONDS / EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS > 0.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PurgeResult:
+    rows_deleted: int = 0
+    batches: int = 0
+    partitions_dropped: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+# --- Postgres partitioning of tokens by `expires` ---
+
+async def tokens_is_partitioned(db: AsyncSession) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    relkind = await db.scalar(text("SELECT relkind FROM pg_class WHERE oid = 'tokens'::regclass"))
+    return relkind == "p"
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return _month_start(_month_start(value) + timedelta(days=32))
+
+
+async def ensure_token_partitions(
+    db: AsyncSession, start: datetime, end: datetime, commit: bool = True
+) -> List[str]:
+    """
+    Create the monthly partitions `tokens_pYYYYMM` covering [start, end).
+    Returns the names of the partitions that were created. With
+    `commit=False` they are left in the caller's transaction.
+    """
+    created = []
+    month = _month_start(start)
+    while month < end:
+        upper = _next_month(month)
+        name = f"tokens_p{month:%Y%m}"
+        exists = await db.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+        if not exists:
+            await db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF tokens "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = upper
+    if commit:
+        await db.commit()
+    return created
+
+
+async def drop_expired_token_partitions(db: AsyncSession, now: datetime) -> List[str]:
+    """
+    Drop monthly partitions whose whole range has already expired.
+    """
+    rows = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'tokens'::regclass AND c.relname LIKE 'tokens\\_p%' "
+        "ORDER BY c.relname"
+    ))
+    dropped = []
+    for (name,) in rows:
+        upper = _next_month(datetime.strptime(name[len("tokens_p"):], "%Y%m"))
+        if upper <= now:
+            await db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    await db.commit()
+    return dropped
+
+
+def _partition_horizon(now: datetime) -> datetime:
+    # Far enough ahead for the longest-lived token issued today
+    return now + timedelta(days=settings.JWT_REFRESH_EXPIRATION_DAYS + 31)
+
+
+async def partition_tokens_table(db: AsyncSession) -> None:
+    """
+    One-off conversion of `tokens` into a table range-partitioned by month of
+    `expires`. The rename, the copy and the new indexes are committed in a
+    single transaction, so run it during a quiet period; on failure the
+    original table is left untouched. Expired partitions are then dropped by `purge_tokens`.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        raise RuntimeError("Token partitioning is only supported on PostgreSQL")
+    if await tokens_is_partitioned(db):
+        logger.info("tokens is already partitioned")
+        return
+
+    now = datetime.utcnow()
+    oldest = await db.scalar(text("SELECT min(expires) FROM tokens")) or now
+
+    statements = [
+        "ALTER TABLE tokens RENAME TO tokens_unpartitioned",
+        "ALTER INDEX tokens_pkey RENAME TO tokens_unpartitioned_pkey",
+        "CREATE TABLE tokens (LIKE tokens_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (expires)",
+        # The partition key has to be part of the primary key
+        "ALTER TABLE tokens ADD PRIMARY KEY (id, expires)",
+        "ALTER TABLE tokens ADD FOREIGN KEY (user_id) REFERENCES users (id)",
+        "ALTER SEQUENCE tokens_id_seq OWNED BY tokens.id",
+        "CREATE TABLE tokens_default PARTITION OF tokens DEFAULT",
+    ]
+    for statement in statements:
+        await db.execute(text(statement))
+    await ensure_token_partitions(db, min(oldest, now), _partition_horizon(now), commit=False)
+    for statement in [
+        "INSERT INTO tokens SELECT * FROM tokens_unpartitioned",
+        "DROP TABLE tokens_unpartitioned",
+        "CREATE INDEX ix_tokens_id ON tokens (id)",
+        "CREATE INDEX ix_tokens_token_digest_type ON tokens (token_digest, type)",
+    ]:
+        await db.execute(text(statement))
+    await db.commit()
+
+
+# --- Purge ---
+
+async def _delete_in_batches(
+    db: AsyncSession, result: PurgeResult, delete_batch: Callable[[], Awaitable[int]], batch_size: int
+) -> None:
+    """
+    Run `delete_batch` until it removes less than a full batch, committing
+    after each one so no lock is held for long.
+    """
+    while True:
+        deleted = await delete_batch()
+        await db.commit()
+        if not deleted:
+            break
+        result.rows_deleted += deleted
+        result.batches += 1
+        if deleted < batch_size:
+            break
+
+
+async def purge_tokens(db: AsyncSession, batch_size: int = 1000) -> PurgeResult:
+    """
+    Delete expired and blacklisted tokens in small batches, committing after
+    each one so no lock is held for long. On a partitioned Postgres table,
+    fully expired partitions are dropped first and upcoming ones created.
+    """
+    result = PurgeResult()
+    start = time.perf_counter()
+    now = datetime.utcnow()
+
+    if await tokens_is_partitioned(db):
+        result.partitions_dropped = await drop_expired_token_partitions(db, now)
+        await ensure_token_partitions(db, now, _partition_horizon(now))
+
+    await _delete_in_batches(db, result, lambda: crud.token.delete_expired(db, now=now, limit=batch_size), batch_size)
+
+    result.seconds = time.perf_counter() - start
+    logger.info(
+        "Token purge removed %s rows in %s batches and dropped %s partitions in %.3fs",
+        result.rows_deleted, result.batches, len(result.partitions_dropped), result.seconds,
+    )
+    return result
+
+
+async def purge_outbox(db: AsyncSession, batch_size: int = 1000) -> PurgeResult:
+    """
+    Delete sent and failed outbox messages older than
+    EMAIL_OUTBOX_RETENTION_DAYS, in batches like `purge_tokens`.
+    """
+    result = PurgeResult()
+    start = time.perf_counter()
+    before = datetime.utcnow() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+
+    await _delete_in_batches(
+        db, result, lambda: crud.email_outbox.delete_finished(db, before=before, limit=batch_size), batch_size
+    )
+
+    result.seconds = time.perf_counter() - start
+    logger.info(
+        "Outbox purge removed %s rows in %s batches in %.3fs", result.rows_deleted, result.batches, result.seconds
+    )
+    return result
+
+
+async def _run_periodically(
+    purge: Callable[..., Awaitable[PurgeResult]], interval_seconds: float, batch_size: int
+) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with SessionLocal() as db:
+                await purge(db, batch_size=batch_size)
+        except Exception:
+            logger.exception("%s failed", purge.__name__)
+
+
+async def run_periodic_token_purge(interval_seconds: float, batch_size: int) -> None:
+    """
+    Background loop purging tokens every `interval_seconds`.
+    """
+    await _run_periodically(purge_tokens, interval_seconds, batch_size)
+
+
+async def run_periodic_outbox_purge(interval_seconds: float, batch_size: int) -> None:
+    """
+    Background loop purging finished outbox messages every `interval_seconds`.
+    """
+    await _run_periodically(purge_outbox, interval_seconds, batch_size)
+
+
+async def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.db.maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    purge = commands.add_parser("purge-tokens", help="Delete expired and blacklisted tokens")
+    purge.add_argument("--batch-size", type=int, default=settings.TOKEN_PURGE_BATCH_SIZE)
+    purge_emails = commands.add_parser("purge-outbox", help="Delete old sent and failed outbox emails")
+    purge_emails.add_argument("--batch-size", type=int, default=settings.EMAIL_OUTBOX_PURGE_BATCH_SIZE)
+    commands.add_parser("partition-tokens", help="Partition tokens by expiry month (PostgreSQL)")
+    args = parser.parse_args(argv)
+
+    async with SessionLocal() as db:
+        if args.command == "purge-tokens":
+            result = await purge_tokens(db, batch_size=args.batch_size)
+            print(
+                f"Removed {result.rows_deleted} tokens in {result.batches} batches, "
+                f"dropped {len(result.partitions_dropped)} partitions in {result.seconds:.3f}s"
+            )
+        elif args.command == "purge-outbox":
+            result = await purge_outbox(db, batch_size=args.batch_size)
+            print(f"Removed {result.rows_deleted} emails in {result.batches} batches in {result.seconds:.3f}s")
+        elif args.command == "partition-tokens":
+            await partition_tokens_table(db)
+            print("tokens is partitioned by expires")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Schema migrations on deploy.
+
+    python -m app.db.migrations upgrade
+
+Compares the database revision with the migration heads first and only
+runs `alembic upgrade head` when they differ. The check reads the revision
+files as text and queries `alembic_version` with the plain DB-API driver,
+so a boot with a current schema skips importing Alembic, SQLAlchemy and
+the app models. Anything the quick check cannot read falls back to Alembic.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from typing import Optional, Set
+from urllib.parse import unquote, urlsplit
+
+from app.core.config import settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ALEMBIC_INI = os.path.join(ROOT, "alembic.ini")
+VERSIONS_DIR = os.path.join(ROOT, "alembic", "versions")
+
+REVISION_RE = re.compile(r"^revision\s*(?::[^=]*)?=\s*['\"](\w+)['\"]", re.MULTILINE)
+DOWN_REVISION_RE = re.compile(r"^down_revision\s*(?::[^=]*)?=\s*(.+)$", re.MULTILINE)
+
+
+def script_heads(versions_dir: str = VERSIONS_DIR) -> Optional[Set[str]]:
+    """Head revisions of the migration scripts, or None if a file can't be parsed."""
+    revisions, parents = set(), set()
+    for path in glob.glob(os.path.join(versions_dir, "*.py")):
+        with open(path) as f:
+            source = f.read()
+        revision, down_revision = REVISION_RE.search(source), DOWN_REVISION_RE.search(source)
+        if revision is None or down_revision is None:
+            return None
+        revisions.add(revision.group(1))
+        # A single id, None, or a tuple of ids for merge revisions
+        parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+
+def database_revisions(database_url: str) -> Optional[Set[str]]:
+    """Revisions stamped in alembic_version, or None if the quick check can't tell."""
+    url = urlsplit(database_url)
+    scheme = url.scheme.split("+")[0]
+    try:
+        if scheme == "sqlite":
+            import sqlite3
+
+            path = unquote(url.path[1:]) if url.path.startswith("/") else unquote(url.path)
+            if not path or path == ":memory:" or not os.path.exists(path):
+                return None
+            connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        elif scheme == "postgresql":
+            import psycopg2
+
+            connection = psycopg2.connect(database_url.replace(url.scheme, "postgresql", 1))
+        else:
+            return None
+    except Exception:
+        return None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT version_num FROM alembic_version")
+        return {row[0] for row in cursor.fetchall()}
+    except Exception:
+        return None
+    finally:
+        connection.close()
+
+
+def is_up_to_date(database_url: str) -> bool:
+    heads = script_heads()
+    return bool(heads) and database_revisions(database_url) == heads
+
+
+def upgrade() -> bool:
+    """Upgrade to head unless already there. Returns whether Alembic ran."""
+    if is_up_to_date(settings.DATABASE_URL):
+        return False
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    # Resolve script_location against the ini file, not the working directory
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(config, "head")
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Database migrations")
+    parser.add_argument("command", choices=["upgrade"])
+    parser.parse_args()
+
+    start = time.perf_counter()
+    if upgrade():
+        print(f"Database migrated to head in {(time.perf_counter() - start) * 1000:.0f} ms")
+    else:
+        print(f"Database schema is current, skipped migrations ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Connection pool sizing and health.
+
+The pool is sized per worker from the worker count, the connections one
+worker may use at once and the database's connection budget (see
+`pool_limits`). Instead of pinging on
+every checkout (`pool_pre_ping`), a connection is only pinged when it sat
+idle for longer than DB_POOL_LIVENESS_IDLE_SECONDS, which is when servers
+and proxies drop them. Connections are recycled after
+DB_POOL_RECYCLE_SECONDS with some jitter, so connections opened together
+are not all reopened together.
+"""
+import random
+import time
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import exc
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+
+# Recycle each connection at a random point in the last 10% of its lifetime
+RECYCLE_JITTER = 0.1
+
+
+def pool_limits(workers: int, worker_connections: int, max_connections: int | None) -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) for one worker process. Requests share one
+    event loop, so a worker's concurrent database use is capped by
+    `worker_connections`, and by its share of `max_connections`. Half of
+    that stays open; the other half is overflow opened for bursts.
+    """
+    budget = worker_connections
+    if max_connections:
+        budget = min(budget, max_connections // max(workers, 1))
+    budget = max(budget, 1)
+    pool_size = max(budget // 2, 1)
+    return pool_size, budget - pool_size
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that checks liveness only after idle periods, recycles
+    connections with jitter, and keeps checkout wait and timeout stats.
+    """
+
+    liveness_idle_seconds = settings.DB_POOL_LIVENESS_IDLE_SECONDS
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.liveness_checks = 0
+        self.liveness_failures = 0
+        self.recycled = 0
+
+    def _do_get(self) -> Any:
+        # Wait time includes opening a new connection when the pool has room
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.wait_seconds_total += elapsed
+            self.wait_seconds_max = max(self.wait_seconds_max, elapsed)
+        self.checkouts += 1
+        self._check(record)
+        return record
+
+    def _check(self, record: Any) -> None:
+        if record.dbapi_connection is None or "last_used" not in record.info:
+            return  # new or invalidated: about to be (re)connected anyway
+
+        recycle_after = record.info.get("recycle_after")
+        if recycle_after is not None and time.time() - record.starttime > recycle_after:
+            # Soft invalidation makes get_connection() reopen it right away
+            record.invalidate(soft=True)
+            self.recycled += 1
+            return
+
+        if time.monotonic() - record.info["last_used"] < self.liveness_idle_seconds:
+            return
+        self.liveness_checks += 1
+        try:
+            self._dialect.do_ping(record.dbapi_connection)
+        except Exception as e:
+            self.liveness_failures += 1
+            record.invalidate(e)
+
+    def _do_return_conn(self, record: Any) -> None:
+        record.info["last_used"] = time.monotonic()
+        if self._recycle > 0 and "recycle_after" not in record.info:
+            record.info["recycle_after"] = self._recycle * (1 - RECYCLE_JITTER * random.random())
+        super()._do_return_conn(record)
+
+    def recreate(self) -> "MonitoredQueuePool":
+        self.logger.info("Pool recreating")
+        return self.__class__(
+            self._creator,
+            pool_size=self._pool.maxsize,
+            max_overflow=self._max_overflow,
+            pre_ping=self._pre_ping,
+            use_lifo=self._pool.use_lifo,
+            timeout=self._timeout,
+            recycle=self._recycle,
+            echo=self.echo,
+            logging_name=self._orig_logging_name,
+            reset_on_return=self._reset_on_return,
+            _dispatch=self.dispatch,
+            dialect=self._dialect,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "wait_seconds_total": self.wait_seconds_total,
+            "liveness_checks": self.liveness_checks,
+            "liveness_failures": self.liveness_failures,
+            "recycled": self.recycled,
+        }
+
+
+def pool_options(url: URL) -> Dict[str, Any]:
+    """Keyword arguments for create_async_engine."""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}  # in-memory SQLite lives in a single connection
+    pool_size, max_overflow = pool_limits(
+        settings.WEB_CONCURRENCY, settings.DB_WORKER_CONNECTIONS, settings.DB_MAX_CONNECTIONS
+    )
+    return {
+        "poolclass": MonitoredQueuePool,
+        "pool_size": settings.DB_POOL_SIZE or pool_size,
+        "max_overflow": settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None else max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_use_lifo": True,
+    }
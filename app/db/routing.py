@@ -0,0 +1,214 @@
+"""
+Read replica routing.
+
+Sessions opened for GET/HEAD requests may send their SELECTs to a replica,
+the same one for the whole session; everything else, and any session that
+has written, uses the primary. After a write, the authenticated user and
+every user whose rows were written are kept on the primary for
+REPLICA_STICKY_SECONDS so they read their own writes even while replicas
+catch up. Those windows live in a store shared by the workers
+(REPLICA_STICKY_STORAGE), so they hold whichever worker serves the next
+request.
+
+Replica lag is measured with a heartbeat row the app rewrites on the
+primary every REPLICA_CHECK_INTERVAL_SECONDS: its age on a replica is the
+replica's lag (to within one interval). Replicas lagging more than
+REPLICA_MAX_LAG_SECONDS, or unreachable, get no reads until they catch up;
+with no replica available, reads fall back to the primary.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence
+
+from sqlalchemy import CompoundSelect, DateTime, Select, TextClause, event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from app.core.rate_limit import MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_ID = 1
+
+
+def is_read(clause: Any) -> bool:
+    """Whether a statement only reads and may run on a replica."""
+    if isinstance(clause, (Select, CompoundSelect)):
+        return getattr(clause, "_for_update_arg", None) is None
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == "SELECT"
+    return False
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine] = (),
+        sticky_seconds: float = 5,
+        max_lag_seconds: float = 5,
+        sticky_store: Any = None,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.max_lag_seconds = max_lag_seconds
+        # Seconds behind the primary, None while unknown or unreachable
+        self.lag: List[Optional[float]] = [None] * len(self.replicas)
+        # Replicas serving reads; empty until the first check
+        self._available: List[AsyncEngine] = []
+        self._next = 0
+        # Sticky key -> Unix time until which it reads from the primary, kept
+        # in a rate limit backend (set_deadline / get_deadline)
+        self.sticky_store = sticky_store if sticky_store is not None else MemoryBackend()
+
+        # Metrics
+        self.replica_sessions = 0
+        self.fallback_sessions = 0
+        self.sticky_sessions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Next available replica (round robin), or None to use the primary."""
+        if not self._available:
+            self.fallback_sessions += 1
+            return None
+        self._next = (self._next + 1) % len(self._available)
+        self.replica_sessions += 1
+        return self._available[self._next]
+
+    async def mark_write(self, user_ids: Iterable[Hashable]) -> None:
+        if not self.replicas or self.sticky_seconds <= 0:
+            return
+        until = time.time() + self.sticky_seconds
+        for user_id in set(user_ids):
+            await self.sticky_store.set_deadline(f"sticky:user:{user_id}", until)
+
+    async def is_sticky(self, user_id: Hashable) -> bool:
+        if not self.replicas:
+            return False
+        if await self.sticky_store.get_deadline(f"sticky:user:{user_id}") <= time.time():
+            return False
+        self.sticky_sessions += 1
+        return True
+
+    async def write_heartbeat(self) -> None:
+        now = datetime.utcnow()
+        async with self.primary.begin() as conn:
+            result = await conn.execute(
+                text("UPDATE replication_heartbeat SET updated_at = :now WHERE id = :id"),
+                {"now": now, "id": HEARTBEAT_ID},
+            )
+            if result.rowcount:
+                return
+        try:
+            async with self.primary.begin() as conn:
+                await conn.execute(
+                    text("INSERT INTO replication_heartbeat (id, updated_at) VALUES (:id, :now)"),
+                    {"now": now, "id": HEARTBEAT_ID},
+                )
+        except IntegrityError:
+            pass  # another worker created it first
+
+    async def measure_lag(self, replica: AsyncEngine) -> Optional[float]:
+        async with replica.connect() as conn:
+            updated_at = await conn.scalar(
+                text("SELECT updated_at FROM replication_heartbeat WHERE id = :id")
+                .columns(updated_at=DateTime)
+                .bindparams(id=HEARTBEAT_ID)
+            )
+        if updated_at is None:
+            return None
+        return max((datetime.utcnow() - updated_at).total_seconds(), 0.0)
+
+    async def check(self) -> None:
+        """Refresh the heartbeat and the lag of every replica."""
+        await self.write_heartbeat()
+        available = []
+        for i, replica in enumerate(self.replicas):
+            try:
+                lag = await asyncio.wait_for(self.measure_lag(replica), timeout=max(self.max_lag_seconds, 1))
+            except Exception as exc:
+                if self.lag[i] is not None:
+                    logger.warning("Replica %s unreachable, reading from the primary: %s", i, exc)
+                lag = None
+            ok = lag is not None and lag <= self.max_lag_seconds
+            was_ok = replica in self._available
+            if was_ok and not ok and lag is not None:
+                logger.warning("Replica %s is %.1fs behind, reading from the primary", i, lag)
+            elif ok and not was_ok:
+                logger.info("Replica %s available (%.1fs behind)", i, lag)
+            self.lag[i] = lag
+            if ok:
+                available.append(replica)
+        self._available = available
+
+    async def run(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Replica check failed")
+                self._available = []
+            await asyncio.sleep(interval_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": len(self.replicas),
+            "available": len(self._available),
+            "lag_seconds": list(self.lag),
+            "replica_sessions": self.replica_sessions,
+            "fallback_sessions": self.fallback_sessions,
+            "sticky_sessions": self.sticky_sessions,
+        }
+
+
+class RoutingSession(Session):
+    """
+    Session that binds reads to a replica when opened with
+    `info={"use_replica": True}` and nothing has been written through it
+    yet. The replica is picked on the first read and kept for the session,
+    so a count and a page come from the same snapshot. Writes, flushes and
+    SELECT ... FOR UPDATE use the primary.
+    """
+
+    def __init__(self, *args: Any, router: Optional[ReplicaRouter] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def get_bind(self, mapper: Any = None, *, clause: Any = None, **kwargs: Any) -> Any:
+        if kwargs.get("bind") is not None:
+            pass  # explicit bind wins
+        elif clause is not None:
+            if self._flushing or not is_read(clause):
+                self.info["wrote"] = True
+            elif (
+                self.router is not None
+                and self.router.enabled
+                and self.info.get("use_replica")
+                and not self.info.get("wrote")
+            ):
+                if "replica" not in self.info:
+                    self.info["replica"] = self.router.choose()
+                if self.info["replica"] is not None:
+                    return self.info["replica"].sync_engine
+        elif self._flushing:
+            self.info["wrote"] = True
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_written_users(session: Session, flush_context: Any) -> None:
+    """Remember whose rows were written, to keep them on the primary after the commit."""
+    written = session.info.setdefault("written_user_ids", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if getattr(obj, "__tablename__", None) == "users":
+            written.add(obj.id)
+        elif getattr(obj, "user_id", None) is not None:
+            written.add(obj.user_id)
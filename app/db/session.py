@@ -1,21 +1,83 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import asyncio
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.rate_limit import create_backend
+from app.db.instrumentation import instrument_queries
+from app.db.pool import pool_options
+from app.db.routing import ReplicaRouter, RoutingSession
 
-# Determine if we are using SQLite to add specific arguments
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    # check_same_thread is needed for SQLite in multi-threaded environments like FastAPI
-    connect_args = {"check_same_thread": False}
+# Async drivers used for each sync URL scheme accepted in DATABASE_URL.
+# DATABASE_URL itself stays in its sync form so Alembic can keep using it.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
 
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args=connect_args,
-    pool_pre_ping=True # Helps with lost connections in Postgres
+def get_async_database_url(database_url: str) -> URL:
+    """
+    Translate a sync DATABASE_URL (sqlite:// or postgresql://) into the
+    matching async driver URL (aiosqlite or asyncpg).
+    """
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+# Sized per worker, with liveness checks only after idle periods (see app.db.pool)
+_url = get_async_database_url(settings.DATABASE_URL)
+engine = create_async_engine(_url, **pool_options(_url))
+instrument_engine(engine)
+instrument_queries(engine)
+
+def create_replica_engines(urls: str | None) -> list:
+    engines = []
+    for url in (urls or "").split(","):
+        if not url.strip():
+            continue
+        replica_url = get_async_database_url(url.strip())
+        replica = create_async_engine(replica_url, **pool_options(replica_url))
+        instrument_engine(replica, pool_metrics=False)
+        instrument_queries(replica)
+        engines.append(replica)
+    return engines
+
+# Reads of GET/HEAD requests go to these when configured (see app.db.routing)
+replica_engines = create_replica_engines(settings.DATABASE_REPLICA_URLS)
+replica_router = ReplicaRouter(
+    engine,
+    replica_engines,
+    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    sticky_store=create_backend(settings.REPLICA_STICKY_STORAGE, name="replica-sticky") if replica_engines else None,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async def warm_pool(connections: int) -> int:
+    """
+    Open up to `connections` pooled connections ahead of the first requests.
+    Returns how many were opened; pools that keep no connections are skipped.
+    """
+    pool = engine.sync_engine.pool
+    if connections <= 0 or not hasattr(pool, "size"):
+        return 0
+    connections = min(connections, pool.size())
+    opened = await asyncio.gather(*[engine.connect() for _ in range(connections)])
+    for connection in opened:
+        await connection.close()
+    return len(opened)
+
+# expire_on_commit=False keeps attributes loaded after commit, since lazy
+# refreshes are not allowed on an AsyncSession
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    sync_session_class=RoutingSession,
+    router=replica_router,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 # New SQLAlchemy 2.0 style for declarative base
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    pass
@@ -1,44 +1,88 @@
+# Imported first so the startup report includes the heavy dependency imports
+from app.core.startup import startup_report
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import anyio
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 
 from app.api.v1.api import api_router
+from app.core.compression import CompressionMiddleware, compression_stats
 from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.core.metrics import MetricsExporter, MetricsMiddleware, registry
+from app.core.principal import principal_cache
+from app.core.rate_limit import RateLimitMiddleware, create_backend
+from app.core.tokens import token_codec
+from app.db.instrumentation import QueryInstrumentationMiddleware
+from app.db.maintenance import run_periodic_outbox_purge, run_periodic_token_purge
+from app.db.session import engine, replica_router, warm_pool
+from app.utils.email import email_sender
 
-# Setup Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json",
-    description="FastAPI Starter Kit boilerplate",
-    version="1.0.0",
-)
-
-# Initialize Rate Limiter
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
-
-# GZIP Compression
-app.add_middleware(GZipMiddleware, minimum_size=1000)
-
-# CORS
-if settings.BACKEND_CORS_ORIGINS:
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=[str(origin) for origin in settings.BACKEND_CORS_ORIGINS],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+logger = logging.getLogger(__name__)
+
+async def warm_up() -> None:
+    """
+    Do the one-off work the first requests would otherwise pay for: opening
+    pool connections, starting the hashing workers and the JWT backend.
+    """
+    await warm_pool(settings.DB_POOL_WARMUP_CONNECTIONS)
+    startup_report.mark("warm database pool")
+    token_codec.warm_up()
+    startup_report.mark("warm JWT signing")
+    await password_hasher.warm_up()
+    startup_report.mark("start password hashing workers")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_report.mark("server startup")
+    # Threads for blocking work (sync routes, compression, SMTP)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    if settings.STARTUP_WARMUP:
+        try:
+            await warm_up()
+        except Exception:
+            # The app still works cold, e.g. while the database is not up yet
+            logger.exception("Startup warmup failed")
+
+    background_tasks = []
+    if settings.METRICS_ENABLED and settings.METRICS_DIR:
+        app.state.metrics_exporter.write()
+        background_tasks.append(asyncio.create_task(
+            app.state.metrics_exporter.run(settings.METRICS_FLUSH_INTERVAL_SECONDS)
+        ))
+    if settings.TOKEN_PURGE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            run_periodic_token_purge(settings.TOKEN_PURGE_INTERVAL_SECONDS, settings.TOKEN_PURGE_BATCH_SIZE)
+        ))
+    if settings.EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            run_periodic_outbox_purge(settings.EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS, settings.EMAIL_OUTBOX_PURGE_BATCH_SIZE)
+        ))
+    if settings.EMAIL_POLL_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            email_sender.run(settings.EMAIL_POLL_INTERVAL_SECONDS)
+        ))
+    if replica_router.enabled:
+        background_tasks.append(asyncio.create_task(
+            replica_router.run(settings.REPLICA_CHECK_INTERVAL_SECONDS)
+        ))
+    startup_report.mark("start background tasks")
+    startup_report.log()
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # A task cancelled before it first ran never reaches its cleanup
+    app.state.metrics_exporter.remove()
+    password_hasher.shutdown()
 
 # --- Global Exception Handler ---
-@app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     error_msg = str(exc)
     status_code = 500
@@ -62,8 +106,174 @@ async def global_exception_handler(request: Request, exc: Exception):
         content=response_data
     )
 
-app.include_router(api_router, prefix=settings.API_V1_STR)
+# --- Metrics ---
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    return pool.get_stats() if hasattr(pool, "get_stats") else {}
+
+def register_metrics() -> None:
+    """
+    Expose the stats the components already keep, read when /metrics is
+    scraped. The components are process-wide, so registering again (another
+    `create_app()`) replaces the callbacks by name instead of adding series.
+    """
+    registry.callback(
+        "password_hash_jobs", "Password hashing jobs by state.", "gauge",
+        lambda: {(key,): password_hasher.get_stats()[key] for key in ("in_flight", "queue_depth", "bulk_in_flight")}, ["state"],
+    )
+    registry.callback(
+        "password_hash_jobs_total", "Password hashing jobs by outcome.", "counter",
+        lambda: {(key,): password_hasher.get_stats()[key] for key in ("submitted", "completed", "failed", "rejected")}, ["outcome"],
+    )
+    registry.callback(
+        "principal_cache_events_total", "Principal cache lookups and removals.", "counter",
+        lambda: {(key,): principal_cache.get_stats()[key] for key in ("hits", "misses", "evictions", "invalidations")},
+        ["event"],
+    )
+    registry.callback(
+        "compression_bytes_total", "Response bytes before and after compression.", "counter",
+        lambda: {
+            (encoding, direction): stats[f"bytes_{direction}"]
+            for encoding, stats in compression_stats.get_stats()["encodings"].items()
+            for direction in ("in", "out")
+        },
+        ["encoding", "direction"],
+    )
+    registry.callback(
+        "compression_cpu_seconds_total", "CPU time spent compressing responses.", "counter",
+        lambda: {(encoding,): stats["cpu_seconds"] for encoding, stats in compression_stats.get_stats()["encodings"].items()},
+        ["encoding"],
+    )
+    registry.callback(
+        "emails_total", "Outbox emails by delivery outcome.", "counter",
+        lambda: {(key,): value for key, value in email_sender.get_stats().items()}, ["outcome"],
+    )
+    registry.callback(
+        "db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", "counter",
+        lambda: {(): pool_stats()["wait_seconds_total"]} if pool_stats() else {},
+    )
+    registry.callback(
+        "db_pool_wait_seconds_max", "Longest wait for a pooled connection (worst worker).", "gauge",
+        lambda: {(): pool_stats()["wait_seconds_max"]} if pool_stats() else {},
+        aggregate="max",
+    )
+    registry.callback(
+        "db_pool_events_total", "Pool checkout timeouts, liveness checks and recycles.", "counter",
+        lambda: {
+            (key,): value for key, value in pool_stats().items()
+            if key in ("timeouts", "liveness_checks", "liveness_failures", "recycled")
+        },
+        ["event"],
+    )
+    registry.callback(
+        "db_replica_lag_seconds", "Replication lag per read replica (absent while unreachable).", "gauge",
+        lambda: {(str(i),): lag for i, lag in enumerate(replica_router.lag) if lag is not None}, ["replica"],
+        aggregate="max",
+    )
+    registry.callback(
+        "db_routed_sessions_total", "Read-only request sessions by where their reads were routed.", "counter",
+        lambda: {
+            ("replica",): replica_router.replica_sessions,
+            ("primary_fallback",): replica_router.fallback_sessions,
+            ("primary_sticky",): replica_router.sticky_sessions,
+        } if replica_router.enabled else {},
+        ["target"],
+    )
+    registry.callback(
+        "app_startup_phase_seconds", "Time spent in each startup phase (slowest worker).", "gauge",
+        lambda: {(phase,): seconds for phase, seconds in startup_report.get_stats().items()}, ["phase"],
+        aggregate="max",
+    )
+
+def create_app() -> FastAPI:
+    """
+    Build the application. `app` below is the instance uvicorn serves;
+    tests and tools can build their own with `create_app()`.
+
+    Each app gets its own middleware stack (rate limit buckets included),
+    routes, metrics exporter and lifespan background tasks. Settings, the
+    database engines and sessions, the password hasher, the caches and the
+    metrics registry are process-wide singletons shared by every app.
+    """
+    startup_report.mark("import app modules")
+    register_metrics()
+
+    app = FastAPI(
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+        title=settings.PROJECT_NAME,
+        openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        description="FastAPI Starter Kit boilerplate",
+        version="1.0.0",
+    )
+    app.state.metrics_exporter = MetricsExporter(settings.METRICS_DIR)
+
+    # Rate Limiting
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(
+            RateLimitMiddleware,
+            limits={
+                ("POST", f"{settings.API_V1_STR}/auth/login"): settings.RATE_LIMIT_LOGIN,
+                ("POST", f"{settings.API_V1_STR}/auth/register"): settings.RATE_LIMIT_REGISTER,
+                ("POST", f"{settings.API_V1_STR}/auth/forgot-password"): settings.RATE_LIMIT_FORGOT_PASSWORD,
+            },
+            backend=create_backend(settings.RATE_LIMIT_STORAGE),
+        )
+
+    # Response compression (zstd/brotli/gzip)
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        encodings=[e.strip() for e in settings.COMPRESSION_ENCODINGS.split(",") if e.strip()],
+        enabled=settings.COMPRESSION_ENABLED,
+    )
+
+    # CORS
+    if settings.BACKEND_CORS_ORIGINS:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=[str(origin) for origin in settings.BACKEND_CORS_ORIGINS],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+    # Request metrics (latency covers every middleware below)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Per-request SQL statistics, read by the metrics middleware
+    app.add_middleware(
+        QueryInstrumentationMiddleware,
+        budget=settings.SQL_QUERY_BUDGET,
+        n_plus_one_threshold=settings.SQL_N_PLUS_ONE_THRESHOLD,
+        debug_headers=settings.SQL_DEBUG_HEADERS,
+    )
+
+    app.add_exception_handler(Exception, global_exception_handler)
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to FastAPI Starter Kit", "docs": "/docs"}
+
+    @app.get("/.well-known/jwks.json")
+    async def jwks():
+        """
+        Public keys for verifying access tokens without calling this API.
+        """
+        return Response(
+            content=token_codec.jwks,
+            media_type="application/json",
+            headers={"Cache-Control": f"public, max-age={settings.JWT_JWKS_MAX_AGE_SECONDS}"},
+        )
+
+    if settings.METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            return PlainTextResponse(app.state.metrics_exporter.collect(), media_type="text/plain; version=0.0.4")
+
+    startup_report.mark("create app")
+    return app
 
-@app.get("/")
-def root():
-    return {"message": "Welcome to FastAPI Starter Kit", "docs": "/docs"}
\ No newline at end of file
+app = create_app()
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, Integer
+from app.db.session import Base
+
+class ReplicationHeartbeat(Base):
+    """
+    Single row the app rewrites on the primary; how old it is on a replica
+    is that replica's lag.
+    """
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    updated_at = Column(DateTime, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
@@ -7,11 +7,16 @@ class Token(Base):
     __tablename__ = "tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, index=True, nullable=False)
+    # Hex SHA-256 of the JWT; the token itself is never stored
+    token_digest = Column(String(64), nullable=False)
     type = Column(String, nullable=False)  # refresh, resetPassword, verifyEmail
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     expires = Column(DateTime, nullable=False)
     blacklisted = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", backref="tokens")
\ No newline at end of file
+    user = relationship("User", backref="tokens")
+
+    __table_args__ = (
+        Index("ix_tokens_token_digest_type", "token_digest", "type"),
+    )
@@ -6,6 +6,8 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
+    # Substring search on name/email is indexed outside of this model
+    # (pg_trgm GIN on Postgres, users_fts FTS5 table on SQLite), see app/utils/search.py
     name = Column(String, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
@@ -17,4 +19,8 @@ class User(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Fetch server-generated values (created_at, updated_at) with RETURNING
+    # during the flush instead of a separate SELECT
+    __mapper_args__ = {"eager_defaults": True}
\ No newline at end of file
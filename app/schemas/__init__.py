@@ -1,3 +1,6 @@
 from .token import TokenData, AuthTokens, TokenPayload
-from .user import UserCreate, UserUpdate, UserResponse, UserPaginatedResponse
+from .user import (
+    UserCreate, UserUpdate, UserResponse, UserPaginatedResponse,
+    UserBulkImportError, UserBulkImportResponse,
+)
 from .auth import AuthResponse
\ No newline at end of file
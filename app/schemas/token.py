@@ -11,4 +11,6 @@ class AuthTokens(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: str | None = None
-    type: str | None = None
\ No newline at end of file
+    type: str | None = None
+    exp: int | None = None
+    jti: str | None = None
\ No newline at end of file
@@ -36,4 +36,21 @@ class UserPaginatedResponse(BaseModel):
     count: int
     page: int
     limit: int
-    total_pages: int
\ No newline at end of file
+    total_pages: int
+    # True when count and total_pages come from an estimate or a cached count
+    count_estimated: bool = False
+    # Opaque keyset cursor for the next page, only set in cursor mode
+    next_cursor: str | None = None
+
+# Bulk import
+class UserBulkImportError(BaseModel):
+    line: int
+    email: str | None = None
+    error: str
+
+class UserBulkImportResponse(BaseModel):
+    created: int
+    failed: int
+    errors: List[UserBulkImportError]
+    # True when more errors happened than are listed in `errors`
+    errors_truncated: bool = False
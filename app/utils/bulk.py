@@ -0,0 +1,102 @@
+import codecs
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Streaming parsers for bulk user uploads. Records are yielded as they
+# arrive so an upload of any size is processed in constant memory.
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_TYPES:
+        return "ndjson"
+    if media_type in CSV_TYPES:
+        return "csv"
+    return None
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Split a byte stream into `(line_number, line)` pairs, 1-based.
+    """
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip(b"\r")
+    if buffer.strip():
+        yield line_no + 1, buffer.rstrip(b"\r")
+
+
+async def iter_records(
+    stream: AsyncIterator[bytes], fmt: str
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Yield `(line_number, record, error)` for every non-empty line; exactly
+    one of `record` and `error` is set. CSV uploads need a header row and
+    one record per line; empty CSV cells are treated as missing values.
+    """
+    header: Optional[List[str]] = None
+    async for line_no, raw in iter_lines(stream):
+        if line_no == 1:
+            # Excel and some editors start UTF-8 files with a byte order mark
+            raw = raw.removeprefix(codecs.BOM_UTF8)
+        if not raw.strip():
+            continue
+        try:
+            line = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            yield line_no, None, "Line is not valid UTF-8"
+            continue
+
+        if fmt == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, "Invalid JSON"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, record, None
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, None, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_no, {key: value for key, value in zip(header, values) if value != ""}, None
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, line: int, error: str, email: Any = None) -> None:
+        """`email` is reported only when it is a string; uploads may hold anything there."""
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "email": email if isinstance(email, str) else None, "error": error})
+
+    def to_response(self) -> Dict[str, Any]:
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
@@ -0,0 +1,125 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Literal, Optional, Tuple, get_args
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+# Strategies for the total row count of a listing:
+# * exact    - SELECT count(*) over the filtered query (default)
+# * window   - count(*) OVER() returned alongside the page rows
+# * estimate - planner estimate on Postgres (reltuples / EXPLAIN rows)
+# * cached   - exact count memoized for a few seconds per filter
+CountStrategy = Literal["exact", "window", "estimate", "cached"]
+COUNT_STRATEGIES = get_args(CountStrategy)
+
+# Below this many rows an exact count is cheap, so estimates are not worth the error
+EXACT_COUNT_THRESHOLD = 10000
+
+
+async def exact_count(db: AsyncSession, query: Select) -> int:
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+def explain_statement(query: Select, dialect: Any) -> Tuple[str, Any]:
+    """
+    SQL and driver parameters of `EXPLAIN (FORMAT JSON)` for `query`. Values
+    stay bound parameters, so user input never ends up in the SQL text.
+    """
+    compiled = query.order_by(None).compile(dialect=dialect)
+    params: Any = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return f"EXPLAIN (FORMAT JSON) {compiled}", params
+
+
+async def estimated_count(db: AsyncSession, query: Select, table_name: str, filtered: bool) -> Optional[int]:
+    """
+    Ask the Postgres planner how many rows `query` returns. Returns None
+    when no estimate is available (other databases, or a never analyzed table).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+
+    if not filtered:
+        estimate = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": table_name},
+        )
+    else:
+        # Sent through the driver as compiled, placeholders in its own paramstyle
+        statement, params = explain_statement(query, db.get_bind().dialect)
+        conn = await db.connection()
+        plan = (await conn.exec_driver_sql(statement, params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]["Plan"]["Plan Rows"]
+
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+class CountCache:
+    """
+    Short-lived, per-process cache of exact counts keyed by the listing filters.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, int]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: int) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+count_cache = CountCache(ttl_seconds=settings.USER_COUNT_CACHE_TTL_SECONDS)
+
+
+async def count_rows(
+    db: AsyncSession,
+    query: Select,
+    strategy: str,
+    *,
+    table_name: str,
+    filtered: bool,
+    cache_key: Hashable = None,
+) -> Tuple[int, bool]:
+    """
+    Count the rows of `query` with the given strategy.
+    Returns `(count, is_estimated)`. The "window" strategy is resolved by the
+    caller together with the page query; here it behaves like "exact".
+    """
+    if strategy == "estimate":
+        estimate = await estimated_count(db, query, table_name, filtered)
+        if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate, True
+    elif strategy == "cached":
+        cached = count_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+        total = await exact_count(db, query)
+        count_cache.set(cache_key, total)
+        return total, False
+
+    return await exact_count(db, query), False
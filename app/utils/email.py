@@ -1,25 +1,262 @@
+import asyncio
 import logging
+import random
+import smtplib
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.core import templates
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.email import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# Messages claimed by a sender are left alone by the others for this long
+CLAIM_LEASE = timedelta(minutes=5)
+# Pooled SMTP connections unused for longer than this are reopened
+SMTP_IDLE_TIMEOUT_SECONDS = 60
+RETRY_MAX_DELAY_SECONDS = 3600
+
+
+class PermanentDeliveryError(Exception):
+    pass
+
+
+class LogTransport:
+    """Used when SMTP_HOST is not set: emails are only logged."""
+
+    def send_many(self, messages: List[OutboxEmail]) -> Dict[int, Optional[Exception]]:
+        for message in messages:
+            logging.info(f"--- EMAIL SENT ---")
+            logging.info(f"To: {message.recipient}")
+            logging.info(f"Subject: {message.subject}")
+            logging.info(f"Content: {message.body}")
+            logging.info(f"------------------")
+        return {message.id: None for message in messages}
+
+    def close(self) -> None:
+        pass
+
+
+class SmtpTransport:
+    """
+    Sends batches over one pooled SMTP connection, reopened after it has
+    been idle for SMTP_IDLE_TIMEOUT_SECONDS or dropped by the server.
+    Blocking; the sender calls it from a worker thread.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str], sender: str):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.port == 465:
+            smtp: smtplib.SMTP = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls()
+                smtp.ehlo()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _get_connection(self) -> smtplib.SMTP:
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT_SECONDS:
+            self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+            self._last_used = time.monotonic()
+        return self._smtp
+
+    def _build(self, message: OutboxEmail) -> EmailMessage:
+        mime = EmailMessage()
+        mime["From"] = self.sender
+        mime["To"] = message.recipient
+        mime["Subject"] = message.subject
+        mime["Message-ID"] = make_msgid()
+        mime.set_content(message.body)
+        return mime
+
+    def send_many(self, messages: List[OutboxEmail]) -> Dict[int, Optional[Exception]]:
+        results: Dict[int, Optional[Exception]] = {}
+        for message in messages:
+            for attempt in range(2):
+                try:
+                    self._get_connection().send_message(self._build(message))
+                    self._last_used = time.monotonic()
+                    results[message.id] = None
+                except smtplib.SMTPServerDisconnected as exc:
+                    # Stale pooled connection: reconnect once and resend
+                    self.close()
+                    results[message.id] = exc
+                    continue
+                except smtplib.SMTPRecipientsRefused as exc:
+                    results[message.id] = PermanentDeliveryError(str(exc.recipients))
+                except smtplib.SMTPResponseException as exc:
+                    if exc.smtp_code >= 500:
+                        results[message.id] = PermanentDeliveryError(f"{exc.smtp_code} {exc.smtp_error!r}")
+                    else:
+                        results[message.id] = exc
+                    self._reset()
+                except (OSError, smtplib.SMTPException) as exc:
+                    self.close()
+                    results[message.id] = exc
+                break
+        self._last_used = time.monotonic()
+        return results
+
+    def _reset(self) -> None:
+        try:
+            self._smtp.rset()
+        except Exception:
+            self.close()
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+class EmailSender:
+    """
+    Background delivery of the email outbox. Requests only insert the
+    message in their own transaction; this loop claims due messages in
+    batches, sends them and schedules failed ones for a retry with
+    exponential backoff until EMAIL_MAX_ATTEMPTS is reached.
+    """
+
+    def __init__(self, transport: Any, batch_size: int = 50, max_attempts: int = 8, retry_base_seconds: float = 30):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # Metrics
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _retry_at(self, attempts: int, now: datetime) -> Optional[datetime]:
+        if attempts >= self.max_attempts:
+            return None
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), RETRY_MAX_DELAY_SECONDS)
+        return now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    async def process_batch(self) -> int:
+        """Send one batch of due messages; returns how many were claimed."""
+        async with SessionLocal() as db:
+            messages = await crud.email_outbox.claim_due(
+                db, now=datetime.utcnow(), limit=self.batch_size, lease=CLAIM_LEASE
+            )
+            await db.commit()
+        if not messages:
+            return 0
+
+        results = await asyncio.to_thread(self.transport.send_many, messages)
+
+        now = datetime.utcnow()
+        async with SessionLocal() as db:
+            sent = [message.id for message in messages if results.get(message.id) is None]
+            await crud.email_outbox.mark_sent(db, sent, now)
+            self.sent += len(sent)
+            for message in messages:
+                error = results.get(message.id)
+                if error is None:
+                    continue
+                retry_at = None if isinstance(error, PermanentDeliveryError) else self._retry_at(message.attempts, now)
+                if retry_at is None:
+                    self.failed += 1
+                    logger.error("Giving up on email %s to %s: %s", message.id, message.recipient, error)
+                else:
+                    self.retried += 1
+                    logger.warning("Email %s failed (attempt %s), retrying: %s", message.id, message.attempts, error)
+                await crud.email_outbox.mark_failed(db, message.id, error=str(error), retry_at=retry_at)
+            await db.commit()
+        return len(messages)
+
+    async def run(self, poll_interval_seconds: float) -> None:
+        """
+        Deliver until cancelled, waking up on `notify()` or every
+        `poll_interval_seconds` for retries.
+        """
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                try:
+                    claimed = await self.process_batch()
+                except Exception:
+                    logger.exception("Email delivery failed")
+                    claimed = 0
+                if claimed >= self.batch_size:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self._wakeup = None
+            await asyncio.to_thread(self.transport.close)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed}
+
+
+def create_transport() -> Any:
+    if not settings.SMTP_HOST:
+        return LogTransport()
+    return SmtpTransport(
+        settings.SMTP_HOST,
+        settings.SMTP_PORT or 587,
+        settings.SMTP_USERNAME,
+        settings.SMTP_PASSWORD,
+        settings.EMAIL_FROM or settings.SMTP_USERNAME or "",
+    )
+
+
+email_sender = EmailSender(
+    create_transport(),
+    batch_size=settings.EMAIL_SEND_BATCH_SIZE,
+    max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+    retry_base_seconds=settings.EMAIL_RETRY_BASE_SECONDS,
+)
+
+
+async def send_email(db: AsyncSession, to: str, subject: str, text: str) -> None:
+    """
+    Queue an email in the caller's transaction. It is delivered by the
+    background sender, which is woken up as soon as the transaction commits.
+    """
+    await crud.email_outbox.enqueue(db, recipient=to, subject=subject, body=text)
+    event.listen(db.sync_session, "after_commit", lambda session: email_sender.notify(), once=True)
+
+async def send_reset_password_email(db: AsyncSession, to: str, token: str) -> None:
+    subject, text = templates.render("reset_password", frontend_url=settings.FRONTEND_URL, token=token)
+    await send_email(db, to, subject, text)
 
-# In a real app, use fastapi-mail or boto3 SES here.
-# Currently mocking to print to console like development mode.
-
-def send_email(to: str, subject: str, text: str):
-    logging.info(f"--- EMAIL SENT ---")
-    logging.info(f"To: {to}")
-    logging.info(f"Subject: {subject}")
-    logging.info(f"Content: {text}")
-    logging.info(f"------------------")
-
-def send_reset_password_email(to: str, token: str):
-    subject = "Reset password"
-    # Replace logic with your frontend URL
-    reset_url = f"http://localhost:3000/reset-password?token={token}"
-    text = f"Dear user,\nTo reset your password, click on this link: {reset_url}\nIf you did not request any password resets, then ignore this email."
-    send_email(to, subject, text)
-
-def send_verification_email(to: str, token: str):
-    subject = "Email Verification"
-    verify_url = f"http://localhost:3000/verify-email?token={token}"
-    text = f"Dear user,\nTo verify your email, click on this link: {verify_url}\nIf you did not create an account, then ignore this email."
-    send_email(to, subject, text)
\ No newline at end of file
+async def send_verification_email(db: AsyncSession, to: str, token: str) -> None:
+    subject, text = templates.render("verify_email", frontend_url=settings.FRONTEND_URL, token=token)
+    await send_email(db, to, subject, text)
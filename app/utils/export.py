@@ -0,0 +1,88 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+import orjson
+
+# Streaming encoders for the user export. Each one consumes batches of rows
+# (mappings of column name to value) and yields encoded chunks, so memory
+# use is bounded by the batch size rather than by the number of rows.
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+FILE_EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows"}
+
+RowBatches = AsyncIterator[Sequence[Dict[str, Any]]]
+
+
+async def ndjson_chunks(batches: RowBatches, columns: List[str]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(orjson.dumps({col: row[col] for col in columns}) + b"\n" for row in rows)
+
+
+async def csv_chunks(batches: RowBatches, columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in batches:
+        writer.writerows([row[col] for col in columns] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """
+    Minimal writable file for pyarrow that hands out what was written so far.
+    """
+
+    def __init__(self) -> None:
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def arrow_chunks(batches: RowBatches, arrow_schema: Any) -> AsyncIterator[bytes]:
+    """
+    Encode rows as an Arrow IPC stream, one record batch per row batch.
+    Requires `pyarrow`.
+    """
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, arrow_schema)
+    async for rows in batches:
+        columns = {name: [row[name] for row in rows] for name in arrow_schema.names}
+        writer.write_batch(pa.record_batch(columns, schema=arrow_schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
@@ -0,0 +1,98 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Collection, List, Optional, Tuple
+
+from sqlalchemy import String, and_, literal, or_, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+# Keyset (cursor) pagination helpers.
+#
+# A cursor is an opaque, url-safe token holding the sort field, the sort
+# direction and the (sort value, id) pair of the last row on a page. The
+# next page is then fetched with a seek such as
+#     WHERE (col, id) > (:value, :id) ORDER BY col, id
+# so its cost does not depend on how deep into the listing we are.
+# NULL sort values are always placed last, in both directions.
+#
+# Sorting is limited to the fields listed by the caller: the sort value of
+# the last row is readable in the cursor, and ordering by a column leaks its
+# values one comparison at a time. Other fields fall back to the default
+# order, as they always have, except sensitive ones, which are rejected.
+
+# Largest page of a cursor listing; larger limits are clamped to it
+MAX_PAGE_SIZE = 1000
+
+def parse_sort(
+    sort_by: Optional[str], allowed: Collection[str], rejected: Collection[str] = ()
+) -> Tuple[str, str]:
+    """
+    Parse a `field:direction` string. Empty values and fields not in
+    `allowed` give `id:asc`; fields in `rejected` raise ValueError.
+    """
+    field_name, _, direction = (sort_by or "").partition(":")
+    if field_name in rejected:
+        raise ValueError(f"Cannot sort by {field_name!r}")
+    if field_name not in allowed:
+        return "id", "asc"
+    return field_name, "desc" if direction.lower() == "desc" else "asc"
+
+def clamp_page_size(limit: int) -> int:
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+def encode_cursor(field: str, direction: str, value: Any, id: int) -> str:
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps({"f": field, "d": direction, "v": value, "id": id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, allowed: Collection[str]) -> Tuple[str, str, Any, int]:
+    """
+    Returns `(field, direction, value, id)`. Raises ValueError on a malformed
+    cursor or one sorting by a field not in `allowed`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        field, direction, value, last_id = data["f"], data["d"], data["v"], int(data["id"])
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except (ValueError, TypeError, KeyError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if direction not in ("asc", "desc") or field not in allowed:
+        raise ValueError("Invalid cursor")
+    return field, direction, value, last_id
+
+def keyset_order_by(column: Any, id_column: Any, direction: str) -> List[Any]:
+    if column is id_column:
+        return [id_column.desc() if direction == "desc" else id_column.asc()]
+    if direction == "desc":
+        return [column.desc().nulls_last(), id_column.desc()]
+    return [column.asc().nulls_last(), id_column.asc()]
+
+def keyset_filter(
+    column: Any, id_column: Any, direction: str, value: Any, last_id: int, dialect_name: str = ""
+) -> ColumnElement:
+    """
+    Build the seek predicate for rows strictly after `(value, last_id)`
+    in the ordering produced by `keyset_order_by`.
+    """
+    if isinstance(value, datetime) and dialect_name == "sqlite":
+        # SQLite stores datetimes as text, and CURRENT_TIMESTAMP defaults have
+        # no fractional part, so compare against the stored text form
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        value = literal(value.strftime(fmt), String())
+    after_id = id_column < last_id if direction == "desc" else id_column > last_id
+    if column is id_column:
+        return after_id
+    if value is None:
+        # Already inside the trailing NULL block: only ids are left to compare
+        return and_(column.is_(None), after_id)
+
+    if direction == "desc":
+        seek = tuple_(column, id_column) < tuple_(value, last_id)
+    else:
+        seek = tuple_(column, id_column) > tuple_(value, last_id)
+    if column.nullable:
+        return or_(seek, column.is_(None))
+    return seek
@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, column, func, or_, select, table, text, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.user import User
+
+# Substring search over users.name / users.email.
+#
+# Postgres serves `ILIKE '%term%'` from the pg_trgm GIN indexes created by
+# migration 4f2b9c7e1a3d, so the filter itself is unchanged there. SQLite has
+# no such index type, so the same LIKE is run against the `users_fts` FTS5
+# trigram table (kept in sync with users by triggers) and joined back by id.
+# Matching semantics are the same as a plain ILIKE in both cases.
+
+users_fts = table("users_fts", column("rowid"), column("name"), column("email"))
+
+# Trigrams can't narrow down shorter terms: FTS5 would scan its whole table,
+# which costs more than scanning users directly, so those use a plain ILIKE
+FTS_MIN_TERM_LENGTH = 3
+
+# Whether the FTS table exists, per database URL. Databases created without
+# running migrations fall back to a plain ILIKE scan.
+_fts_available: Dict[str, bool] = {}
+
+
+async def has_fts(db: AsyncSession) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    key = str(bind.url)
+    if key not in _fts_available:
+        found = await db.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'")
+        )
+        _fts_available[key] = bool(found)
+    return _fts_available[key]
+
+
+def _columns_for(scope: str) -> List[str]:
+    return ["name", "email"] if scope == "all" else [scope]
+
+
+def search_condition(scope: str, search: str, use_fts: bool) -> ColumnElement:
+    """
+    Match `search` as a case-insensitive substring of the columns in `scope`
+    ("name", "email" or "all").
+    """
+    pattern = f"%{search}%"
+    fields = _columns_for(scope)
+    if use_fts and len(search) >= FTS_MIN_TERM_LENGTH:
+        matches = [select(users_fts.c.rowid).where(users_fts.c[field].like(pattern)) for field in fields]
+        ids = matches[0] if len(matches) == 1 else union(*matches)
+        return User.id.in_(ids)
+    conditions = [getattr(User, field).ilike(pattern) for field in fields]
+    return conditions[0] if len(conditions) == 1 else or_(*conditions)
+
+
+def rank_expression(scope: str, search: str, dialect_name: str) -> Optional[ColumnElement]:
+    """
+    Relevance of a row for `search`, higher is better. Uses trigram
+    similarity on Postgres, and exact > prefix > substring elsewhere.
+    """
+    fields = [getattr(User, field) for field in _columns_for(scope)]
+    if dialect_name == "postgresql":
+        scores = [func.coalesce(func.similarity(field, search), 0) for field in fields]
+        return scores[0] if len(scores) == 1 else func.greatest(*scores)
+
+    term = search.lower()
+    scores = [
+        case(
+            (func.lower(field) == term, 2),
+            (func.lower(field).like(f"{term}%"), 1),
+            else_=0,
+        )
+        for field in fields
+    ]
+    return scores[0] if len(scores) == 1 else func.max(*scores)
@@ -6,9 +6,10 @@ set -e
 echo "Starting deployment script..."
 
 # Run database migrations
-# This ensures the tables exist in Postgres before the app starts
+# This ensures the tables exist in Postgres before the app starts.
+# Alembic only runs when the database is behind the migration scripts.
 echo "Running database migrations..."
-alembic upgrade head
+python -m app.db.migrations upgrade
 
 # Start the application
 # Host 0.0.0.0 is crucial for Docker to expose the port
@@ -0,0 +1,89 @@
+import asyncio
+import dataclasses
+
+import pytest
+from sqlalchemy import delete, select
+
+from app import crud
+from app.core.principal import Principal, principal_cache
+from app.db.session import SessionLocal
+from app.models.email import OutboxEmail
+from tests.conftest import ADMIN_EMAIL, login
+
+pytestmark = pytest.mark.anyio
+
+
+async def _refresh(client, refresh_token: str):
+    return await client.post("/auth/refresh-tokens", json={"refreshToken": refresh_token})
+
+
+async def test_refresh_rotates_the_token(client):
+    tokens = await login(client)
+
+    response = await _refresh(client, tokens["refresh"])
+    assert response.status_code == 200, response.text
+    rotated = response.json()["refresh"]["token"]
+    assert rotated != tokens["refresh"]
+
+    response = await client.get("/users/", headers={"Authorization": f"Bearer {response.json()['access']['token']}"})
+    assert response.status_code == 200
+
+
+async def test_replayed_refresh_token_is_rejected(client):
+    tokens = await login(client)
+    rotated = (await _refresh(client, tokens["refresh"])).json()["refresh"]["token"]
+
+    assert (await _refresh(client, tokens["refresh"])).status_code == 401
+    # The replay does not burn the token that replaced it
+    assert (await _refresh(client, rotated)).status_code == 200
+
+
+async def test_concurrent_refreshes_have_one_winner(client):
+    tokens = await login(client)
+
+    responses = await asyncio.gather(*[_refresh(client, tokens["refresh"]) for _ in range(8)])
+
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [200] + [401] * 7
+    winner = next(response for response in responses if response.status_code == 200)
+    assert (await _refresh(client, winner.json()["refresh"]["token"])).status_code == 200
+
+
+async def test_logged_out_refresh_token_is_rejected(client):
+    tokens = await login(client)
+
+    response = await client.post("/auth/logout", json={"refreshToken": tokens["refresh"]})
+    assert response.status_code == 204
+    assert (await _refresh(client, tokens["refresh"])).status_code == 401
+
+
+async def test_refresh_rejects_access_tokens(client):
+    tokens = await login(client)
+    assert (await _refresh(client, tokens["access"])).status_code == 401
+
+
+async def test_authenticated_requests_are_served_from_the_principal_cache(client):
+    headers = {"Authorization": f"Bearer {(await login(client))['access']}"}
+    principal_cache.clear()
+    hits = principal_cache.hits
+
+    for _ in range(3):
+        assert (await client.get("/users/", headers=headers)).status_code == 200
+    assert principal_cache.hits == hits + 2
+
+
+async def test_verification_email_goes_to_the_stored_address(client):
+    headers = {"Authorization": f"Bearer {(await login(client))['access']}"}
+    async with SessionLocal() as db:
+        admin = await crud.user.get_by_email(db, email=ADMIN_EMAIL)
+        await db.execute(delete(OutboxEmail))
+        await db.commit()
+    # As cached by a worker that has not seen an email change yet
+    principal_cache.set(dataclasses.replace(Principal.from_user(admin), email="old@example.com"))
+
+    response = await client.post("/auth/send-verification-email", headers=headers)
+    assert response.status_code == 204
+
+    async with SessionLocal() as db:
+        assert list(await db.scalars(select(OutboxEmail.recipient))) == [ADMIN_EMAIL]
+    principal_cache.clear()
@@ -0,0 +1,225 @@
+import csv
+import io
+import json
+import sys
+
+import pytest
+
+from app.utils import pagination
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+_admin_headers: dict = {}
+
+
+async def _admin(client) -> dict:
+    # One login per module; bcrypt makes each one slow
+    if not _admin_headers:
+        _admin_headers["Authorization"] = f"Bearer {(await login(client))['access']}"
+    return _admin_headers
+
+
+@pytest.mark.parametrize("strategy", ["exact", "window", "estimate", "cached"])
+async def test_count_strategies(client, strategy):
+    response = await client.get("/users/", params={"countStrategy": strategy}, headers=await _admin(client))
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["count"] >= len(body["results"]) >= 1
+    assert body["count_estimated"] is False
+
+
+async def test_unknown_count_strategy_is_rejected(client):
+    response = await client.get("/users/", params={"countStrategy": "bogus"}, headers=await _admin(client))
+    assert response.status_code == 422
+
+
+async def _bulk(client, body: bytes, content_type: str):
+    headers = {**await _admin(client), "Content-Type": content_type}
+    response = await client.post("/users/bulk", content=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_bulk_import_ndjson_reports_errors_per_line(client):
+    body = b"\n".join([
+        b'{"email": "bulk-nd-1@example.com", "password": "password123", "name": "One"}',
+        b'{"email": "bulk-nd-2@example.com", "password": "password123"}',
+        b"",
+        b"not json",
+        b"[1, 2]",
+        b'{"email": 123, "password": "password123"}',
+        b'{"email": "bulk-nd-3@example.com", "password": "short"}',
+        b'{"email": "bulk-nd-1@example.com", "password": "password123"}',
+        b'{"email": "admin@example.com", "password": "password123"}',
+    ])
+    report = await _bulk(client, body, "application/x-ndjson")
+
+    assert report["created"] == 2
+    assert report["failed"] == 6
+    errors = {error["line"]: error for error in report["errors"]}
+    assert errors[4]["error"] == "Invalid JSON"
+    assert errors[5]["error"] == "Expected a JSON object"
+    assert errors[6]["email"] is None and errors[6]["error"].startswith("email:")
+    assert errors[7]["email"] == "bulk-nd-3@example.com" and errors[7]["error"].startswith("password:")
+    assert errors[8]["error"] == "Duplicate email in upload"
+    assert errors[9]["error"] == "Email already taken"
+
+    # The imported users can log in
+    await login(client, "bulk-nd-2@example.com", "password123")
+
+
+async def test_bulk_import_csv_with_byte_order_mark(client):
+    body = (
+        "\ufeffemail,password,name,role\r\n"
+        "bulk-csv-1@example.com,password123,Csv One,\r\n"
+        "bulk-csv-2@example.com,password123,,admin\r\n"
+        "bulk-csv-3@example.com,password123\r\n"
+    ).encode()
+    report = await _bulk(client, body, "text/csv; charset=utf-8")
+
+    assert report["created"] == 2
+    assert report["errors"] == [{"line": 4, "email": None, "error": "Expected 4 columns, got 2"}]
+
+    response = await client.get("/users/", params={"search": "bulk-csv", "sortBy": "email:asc"}, headers=await _admin(client))
+    results = response.json()["results"]
+    assert [(user["name"], user["role"]) for user in results] == [("Csv One", "user"), (None, "admin")]
+
+
+async def test_bulk_import_rejects_other_content_types(client):
+    response = await client.post("/users/bulk", content=b"{}", headers={**await _admin(client), "Content-Type": "application/json"})
+    assert response.status_code == 415
+
+
+PAGER_NAMES = ["Carol", None, "alice", "Bob", None, "Dave", "Bob"]
+
+
+async def _pager_users(client) -> None:
+    """Users matched by search=pager- (idempotent: reruns report them as taken)."""
+    body = "\n".join(
+        json.dumps({"email": f"pager-{i}@example.com", "password": "password123", "name": name})
+        for i, name in enumerate(PAGER_NAMES)
+    )
+    await _bulk(client, body.encode(), "application/x-ndjson")
+
+
+async def _list(client, **params):
+    params = {"search": "pager-", "scope": "email", **params}
+    return await client.get("/users/", params=params, headers=await _admin(client))
+
+
+async def _walk(client, sort_by: str, limit: int) -> list:
+    response = await _list(client, sortBy=sort_by, limit=limit, cursor="")
+    ids = []
+    while True:
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body["results"]) <= limit
+        ids += [user["id"] for user in body["results"]]
+        if not body["next_cursor"]:
+            return ids
+        response = await _list(client, limit=limit, cursor=body["next_cursor"])
+
+
+@pytest.mark.parametrize("sort_by", ["id:asc", "name:asc", "name:desc", "created_at:desc", "is_active:asc"])
+async def test_cursor_walk_matches_page_mode(client, sort_by):
+    await _pager_users(client)
+    paged = [user["id"] for user in (await _list(client, sortBy=sort_by)).json()["results"]]
+
+    assert len(paged) == len(PAGER_NAMES)
+    assert await _walk(client, sort_by, limit=2) == paged
+    assert await _walk(client, sort_by, limit=3) == paged
+
+
+async def test_null_names_sort_last_in_both_directions(client):
+    await _pager_users(client)
+    for direction in ("asc", "desc"):
+        names = [user["name"] for user in (await _list(client, sortBy=f"name:{direction}")).json()["results"]]
+        assert names[-2:] == [None, None]
+        assert None not in names[:-2]
+
+
+async def test_unknown_sort_fields_fall_back_to_id(client):
+    await _pager_users(client)
+    by_id = [user["id"] for user in (await _list(client)).json()["results"]]
+    assert by_id == sorted(by_id)
+
+    for sort_by in ("nope:desc", "__table__", "metadata:asc"):
+        response = await _list(client, sortBy=sort_by)
+        assert response.status_code == 200
+        assert [user["id"] for user in response.json()["results"]] == by_id
+
+
+async def test_sensitive_sort_fields_are_rejected(client):
+    for params in ({"sortBy": "hashed_password:asc"}, {"sortBy": "hashed_password", "cursor": ""}):
+        response = await _list(client, **params)
+        assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    "e30",  # {}
+    pagination.encode_cursor("hashed_password", "asc", "$2b$", 1),
+    pagination.encode_cursor("name", "sideways", "a", 1),
+])
+async def test_invalid_cursors_are_rejected(client, cursor):
+    response = await _list(client, cursor=cursor)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+async def test_page_size_is_only_clamped_in_cursor_mode(client):
+    await _pager_users(client)
+    response = await _list(client, limit=5000)
+    assert response.status_code == 200
+    assert response.json()["limit"] == 5000
+
+    body = (await _list(client, limit=5000, cursor="")).json()
+    assert body["limit"] == pagination.MAX_PAGE_SIZE
+    assert len(body["results"]) == len(PAGER_NAMES)
+
+    body = (await _list(client, limit=0, cursor="")).json()
+    assert body["limit"] == 1 and len(body["results"]) == 1 and body["next_cursor"]
+
+
+async def _export(client, **params):
+    params = {"search": "pager-", "scope": "email", **params}
+    return await client.get("/users/export", params=params, headers=await _admin(client))
+
+
+async def test_export_ndjson(client):
+    await _pager_users(client)
+    listed = (await _list(client, limit=100)).json()["results"]
+
+    response = await _export(client, format="ndjson")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert 'filename="users.ndjson"' in response.headers["content-disposition"]
+    assert [json.loads(line) for line in response.text.splitlines()] == listed
+
+
+async def test_export_csv(client):
+    await _pager_users(client)
+    listed = (await _list(client, limit=100)).json()["results"]
+
+    response = await _export(client, format="csv")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == ["id", "email", "name", "role", "is_active", "is_email_verified"]
+    assert [row[1] for row in rows] == [user["email"] for user in listed]
+    # NULL names are written as empty fields
+    assert [row[2] for row in rows] == [user["name"] or "" for user in listed]
+
+
+async def test_export_arrow_without_pyarrow(client, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    response = await _export(client, format="arrow")
+    assert response.status_code == 501
+    assert "pyarrow" in response.json()["detail"]
+
+
+async def test_export_rejects_unknown_formats(client):
+    response = await _export(client, format="xlsx")
+    assert response.status_code == 400
@@ -0,0 +1,178 @@
+"""
+Microbenchmarks of the auth and user listing hot paths, run in process
+against a freshly seeded SQLite database (no server, no network).
+
+    python -m tests.benchmarks.bench_primitives            # all cases
+    python -m tests.benchmarks.bench_primitives token list  # cases matching "token" or "list"
+
+Results are appended to .benchmarks/history.jsonl and each line shows the
+ops/s change from the previous run.
+"""
+import contextlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+os.environ.setdefault("ENVIRONMENT", "production")
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.api import deps  # noqa: E402
+from app.api.v1.endpoints import users as users_endpoint  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.tokens import token_codec  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils import pagination  # noqa: E402
+from tests.benchmarks import harness  # noqa: E402
+
+SEED_USERS = 1000
+SEED_TOKENS = 1000
+PASSWORD = "password123"
+
+
+async def seed() -> Dict[str, Any]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # One bcrypt hash shared by every seeded user keeps seeding fast
+    hashed_password = security.get_password_hash(PASSWORD)
+    async with SessionLocal() as db:
+        await db.execute(insert(models.User), [
+            {
+                "email": f"user{i}@example.com",
+                "name": f"Benchmark User {i}",
+                "hashed_password": hashed_password,
+                "role": "admin" if i == 0 else "user",
+                "is_active": True,
+                "is_email_verified": i % 2 == 0,
+            }
+            for i in range(SEED_USERS)
+        ])
+        admin_id = await db.scalar(select(models.User.id).where(models.User.email == "user0@example.com"))
+        expires = datetime.utcnow() + timedelta(days=30)
+        refresh_tokens = [security.create_refresh_token(admin_id) for _ in range(SEED_TOKENS)]
+        for token in refresh_tokens:
+            await crud.token.create(db, token=token, user_id=admin_id, type="refresh", expires=expires)
+        await db.commit()
+
+    return {
+        "admin_id": admin_id,
+        "hashed_password": hashed_password,
+        "access_token": security.create_access_token(admin_id),
+        "refresh_token": refresh_tokens[SEED_TOKENS // 2],
+    }
+
+
+def user_page(rows: int) -> Dict[str, Any]:
+    return {
+        "results": [
+            {
+                "id": i,
+                "email": f"user{i}@example.com",
+                "name": f"Benchmark User {i}",
+                "role": "user",
+                "is_active": True,
+                "is_email_verified": False,
+            }
+            for i in range(rows)
+        ],
+        "count": SEED_USERS,
+        "page": 1,
+        "limit": rows,
+        "total_pages": (SEED_USERS + rows - 1) // rows,
+        "count_estimated": False,
+        "next_cursor": None,
+    }
+
+
+@contextlib.asynccontextmanager
+async def cases() -> AsyncIterator[Dict[str, Callable[[], Any]]]:
+    data = await seed()
+    access_token = data["access_token"]
+    page = user_page(100)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    async with SessionLocal() as db, httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def get_current_user() -> None:
+            await deps.get_current_user(db=db, token=access_token)
+
+        async def get_by_email() -> None:
+            await crud.user.get_by_email(db, email="user500@example.com")
+
+        async def get_by_token() -> None:
+            await crud.token.get_by_token(db, token=data["refresh_token"], type="refresh")
+
+        async def build_list_query() -> None:
+            # The statement read_users builds for ?role=user&sortBy=created_at:desc&page=3
+            query = await users_endpoint._filter_users(
+                db,
+                select(*[getattr(models.User, column) for column in users_endpoint.USER_RESPONSE_COLUMNS]),
+                role="user",
+                search=None,
+                scope="all",
+            )
+            field_name, direction = pagination.parse_sort("created_at:desc", users_endpoint.USER_SORT_FIELDS)
+            column = getattr(models.User, field_name)
+            query = query.add_columns(column.label("sort_key"))
+            query.order_by(column.desc()).offset(200).limit(100).compile(engine.sync_engine)
+
+        def page_body(results: Any) -> Dict[str, Any]:
+            return {**page, "results": results}
+
+        async def orm_pydantic_page() -> None:
+            # What read_users did before: full ORM entities validated through
+            # UserPaginatedResponse and dumped by Pydantic
+            users = (await db.execute(select(models.User).order_by(models.User.id).limit(100))).scalars().all()
+            schemas.UserPaginatedResponse.model_validate(page_body(users)).model_dump_json()
+            db.expunge_all()
+
+        async def rows_orjson_page() -> None:
+            # What read_users does now: only the response columns, dumped by orjson
+            query = select(*[getattr(models.User, column) for column in users_endpoint.USER_RESPONSE_COLUMNS])
+            rows = (await db.execute(query.order_by(models.User.id).limit(100))).mappings().all()
+            orjson.dumps(page_body([{column: row[column] for column in users_endpoint.USER_RESPONSE_COLUMNS} for row in rows]))
+
+        async def list_users() -> None:
+            response = await client.get("/v1/users/?limit=100", headers=headers)
+            assert response.status_code == 200, response.text
+
+        async def get_user() -> None:
+            response = await client.get(f"/v1/users/{data['admin_id']}", headers=headers)
+            assert response.status_code == 200, response.text
+
+        yield {
+            "security.create_access_token": lambda: security.create_access_token(data["admin_id"]),
+            "token_codec.decode": lambda: token_codec.decode(access_token),
+            "deps.get_current_user (cached)": get_current_user,
+            "security.verify_password": lambda: security.verify_password(PASSWORD, data["hashed_password"]),
+            "crud.user.get_by_email": get_by_email,
+            "crud.token.get_by_token": get_by_token,
+            "read_users query build+compile": build_list_query,
+            "UserPaginatedResponse 100 rows": lambda: schemas.UserPaginatedResponse.model_validate(page).model_dump_json(),
+            "orjson page 100 rows": lambda: orjson.dumps(page),
+            "page 100 rows: ORM + UserPaginatedResponse": orm_pydantic_page,
+            "page 100 rows: column rows + orjson": rows_orjson_page,
+            "ASGI GET /v1/users?limit=100": list_users,
+            "ASGI GET /v1/users/{id}": get_user,
+        }
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    try:
+        harness.main("primitives", cases)
+    finally:
+        os.remove(DATABASE_PATH)
@@ -0,0 +1,39 @@
+"""
+Microbenchmark of the JWT codec against python-jose.
+
+    python -m tests.benchmarks.bench_tokens
+"""
+import contextlib
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from jose import jwt  # noqa: E402
+
+from app.core.tokens import TokenCodec  # noqa: E402
+from tests.benchmarks import harness  # noqa: E402
+
+SECRET = "benchmark-secret"
+
+
+@contextlib.asynccontextmanager
+async def cases():
+    codec = TokenCodec(SECRET, "HS256")
+    exp = datetime.now(timezone.utc) + timedelta(minutes=30)
+    claims = {"exp": int(exp.timestamp()), "sub": "42", "type": "access"}
+    token = codec.encode(claims)
+    assert jwt.decode(token, SECRET, algorithms=["HS256"]) == codec.decode(token)
+
+    yield {
+        "encode   jose": lambda: jwt.encode(claims, SECRET, algorithm="HS256"),
+        "encode   codec": lambda: codec.encode(claims),
+        "decode   jose": lambda: jwt.decode(token, SECRET, algorithms=["HS256"]),
+        "decode   codec": lambda: codec.decode(token),
+        "verify   codec (cached)": lambda: codec.verify(token),
+    }
+
+
+if __name__ == "__main__":
+    harness.main("tokens", cases)
@@ -0,0 +1,153 @@
+"""
+Small runner shared by the benchmark scripts.
+
+Each case is timed for at least `min_time` seconds (best of `repeat`
+rounds) and then run again under tracemalloc to measure the memory it
+allocates per operation. Results are appended to a JSON lines history
+file so runs can be compared across commits.
+"""
+import asyncio
+import inspect
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".benchmarks", "history.jsonl")
+
+
+async def _call(func: Callable[[], Any], is_async: bool) -> None:
+    if is_async:
+        await func()
+    else:
+        func()
+
+
+async def _time(func: Callable[[], Any], is_async: bool, number: int) -> float:
+    start = time.perf_counter()
+    if is_async:
+        for _ in range(number):
+            await func()
+    else:
+        for _ in range(number):
+            func()
+    return time.perf_counter() - start
+
+
+async def measure(func: Callable[[], Any], min_time: float = 0.2, repeat: int = 3, alloc_samples: int = 20) -> Dict[str, float]:
+    """Ops/sec and allocation figures of `func`, a plain callable or a coroutine function."""
+    is_async = inspect.iscoroutinefunction(func)
+    await _call(func, is_async)  # warm up caches and compiled statements
+
+    # Grow the batch until one round takes long enough to time reliably
+    number = 1
+    while True:
+        elapsed = await _time(func, is_async, number)
+        if elapsed >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 10 if elapsed < min_time / 100 else 2
+    rounds = max(1, int(min_time / max(elapsed, 1e-9)))
+    best = min([await _time(func, is_async, number * rounds) for _ in range(repeat)]) / (number * rounds)
+
+    # Allocated bytes and blocks per operation, from the traced peak and the
+    # blocks still alive afterwards (caches and leaks show up in the latter)
+    samples = max(1, min(alloc_samples, number * rounds))
+    tracemalloc.start()
+    try:
+        peaks = []
+        blocks_before = _traced_blocks()
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            await _call(func, is_async)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        retained = (_traced_blocks() - blocks_before) / samples
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+
+    return {
+        "ops_per_sec": 1 / best,
+        "us_per_op": best * 1e6,
+        "peak_alloc_bytes": peaks[len(peaks) // 2],
+        "retained_blocks": retained,
+    }
+
+
+def _traced_blocks() -> int:
+    return sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(suite: str, path: str = HISTORY_PATH) -> Dict[str, Dict[str, float]]:
+    """Latest recorded result of every case of `suite`."""
+    previous: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["suite"] == suite:
+                    previous.update(entry["results"])
+    return previous
+
+
+def record(suite: str, results: Dict[str, Dict[str, float]], path: str = HISTORY_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "suite": suite,
+        "timestamp": time.time(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def report(name: str, result: Dict[str, float], previous: Optional[Dict[str, float]] = None) -> None:
+    change = ""
+    if previous:
+        change = f" {result['ops_per_sec'] / previous['ops_per_sec'] - 1:+7.1%}"
+    print(
+        f"{name:<34} {result['ops_per_sec']:12,.0f} ops/s {result['us_per_op']:11.1f} us/op"
+        f" {result['peak_alloc_bytes'] / 1024:9.1f} KiB peak {result['retained_blocks']:7.1f} blocks kept{change}"
+    )
+
+
+async def run_suite(suite: str, cases: Dict[str, Callable[[], Any]], selected: List[str], save: bool, min_time: float) -> Dict[str, Dict[str, float]]:
+    previous = load_previous(suite)
+    results = {}
+    for name, func in cases.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = await measure(func, min_time=min_time)
+        report(name, results[name], previous.get(name))
+    if save and results:
+        record(suite, results)
+    return results
+
+
+def main(suite: str, cases_factory: Callable[[], Any], argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: `cases_factory()` is an async context manager yielding the cases."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"{suite} benchmarks")
+    parser.add_argument("filters", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent timing each case")
+    parser.add_argument("--no-save", action="store_true", help=f"do not append the results to {HISTORY_PATH}")
+    args = parser.parse_args(argv)
+
+    async def run() -> None:
+        async with cases_factory() as cases:
+            await run_suite(suite, cases, args.filters, not args.no_save, args.min_time)
+
+    asyncio.run(run())
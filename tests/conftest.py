@@ -0,0 +1,72 @@
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, Dict
+
+import pytest
+
+# Settings are read when app modules are imported, so point them at a
+# throwaway database before any test module imports the app
+TEST_DIR = tempfile.mkdtemp(prefix="fastapi-starter-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'app.db')}"
+os.environ["JWT_SECRET"] = "test-secret"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["RATE_LIMIT_STORAGE"] = "memory://"
+os.environ["SMTP_HOST"] = ""
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.pop("METRICS_DIR", None)
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "password123"
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def database() -> None:
+    """Migrated test database with the default admin."""
+    from app.core.hashing import password_hasher
+    from app.db import migrations
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal, engine
+
+    async def seed() -> None:
+        async with SessionLocal() as db:
+            await init_db(db)
+        await engine.dispose()
+
+    migrations.upgrade()
+    asyncio.run(seed())
+    yield
+    password_hasher.shutdown()
+
+
+@pytest.fixture
+async def db_engine(database) -> AsyncIterator[None]:
+    """Gives back pooled connections at the end, since every test runs its own event loop."""
+    from app.db.session import engine
+
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(db_engine):
+    import httpx
+
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test/v1") as client:
+        yield client
+
+
+async def login(client, email: str = ADMIN_EMAIL, password: str = ADMIN_PASSWORD) -> Dict[str, str]:
+    """Access and refresh tokens of a fresh login."""
+    response = await client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    tokens = response.json()["tokens"]
+    return {"access": tokens["access"]["token"], "refresh": tokens["refresh"]["token"]}
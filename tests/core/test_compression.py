@@ -0,0 +1,138 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from starlette.types import Receive, Scope, Send
+
+from app.core.compression import CompressionMiddleware, CompressionPolicy, negotiate
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"results": [' + b",".join(b'{"id": %d, "name": "User %d"}' % (i, i) for i in range(200)) + b"]}"
+
+DECODERS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+def _app(chunks, content_type: bytes = b"application/json", headers=(), sized: bool = True):
+    """Inner ASGI app sending `chunks` as one response, sized or streamed."""
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        raw = [(b"content-type", content_type), *headers]
+        if sized:
+            raw.append((b"content-length", str(sum(map(len, chunks))).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": raw})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    return app
+
+
+async def _call(app, accept_encoding: str = "gzip", policy=None, **kwargs):
+    """Run the middleware around `app` and return (headers, body messages)."""
+    messages = []
+
+    async def send(message) -> None:
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    if policy is not None:
+        scope["compression"] = policy  # as set by the compression() route dependency
+    await CompressionMiddleware(app, **kwargs)(scope, receive, send)
+    start, *bodies = messages
+    return {k.decode(): v.decode() for k, v in start["headers"]}, bodies
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br, zstd", "zstd"),
+    ("gzip, br", "br"),
+    ("gzip", "gzip"),
+    ("zstd;q=0.5, gzip", "gzip"),
+    ("*", "zstd"),
+    ("br;q=0, *;q=0.1", "zstd"),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("", None),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, ["zstd", "br", "gzip"]) == expected
+
+
+@pytest.mark.parametrize("encoding", ["zstd", "br", "gzip"])
+async def test_responses_are_compressed_with_the_negotiated_encoding(encoding):
+    headers, bodies = await _call(_app([BODY]), accept_encoding=encoding)
+
+    assert headers["content-encoding"] == encoding
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(bodies[0]["body"]) < len(BODY)
+    assert DECODERS[encoding](bodies[0]["body"]) == BODY
+
+
+async def test_unacceptable_encodings_pass_through():
+    headers, bodies = await _call(_app([BODY]), accept_encoding="identity")
+    assert "content-encoding" not in headers
+    assert bodies[0]["body"] == BODY
+
+
+@pytest.mark.parametrize("sized", [True, False])
+async def test_bodies_below_minimum_size_are_not_compressed(sized):
+    headers, bodies = await _call(_app([BODY], sized=sized), minimum_size=len(BODY) + 1)
+    assert "content-encoding" not in headers
+    assert b"".join(message["body"] for message in bodies) == BODY
+
+    headers, bodies = await _call(_app([BODY], sized=sized), minimum_size=len(BODY))
+    assert headers["content-encoding"] == "gzip"
+
+
+async def test_sized_bodies_sent_in_chunks_are_compressed_whole():
+    chunks = [BODY[:100], BODY[100:200], BODY[200:]]
+    headers, bodies = await _call(_app(chunks))
+
+    assert len(bodies) == 1
+    assert int(headers["content-length"]) == len(bodies[0]["body"])
+    assert gzip.decompress(bodies[0]["body"]) == BODY
+
+
+async def test_streaming_responses_are_flushed_chunk_by_chunk():
+    chunks = [BODY, BODY, BODY, b""]
+    headers, bodies = await _call(_app(chunks, content_type=b"application/x-ndjson", sized=False))
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert [message["more_body"] for message in bodies] == [True, True, True, False]
+
+    # Each chunk is decodable as soon as it arrives
+    decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for message in bodies[:-1]:
+        assert decoder.decompress(message["body"]) == BODY
+    assert decoder.decompress(bodies[-1]["body"]) + decoder.flush() == b""
+    assert decoder.eof
+
+
+async def test_already_encoded_bodies_are_left_alone():
+    encoded = gzip.compress(BODY)
+    app = _app([encoded], headers=[(b"content-encoding", b"gzip")])
+    headers, bodies = await _call(app, accept_encoding="zstd")
+
+    assert headers["content-encoding"] == "gzip"
+    assert bodies[0]["body"] == encoded
+
+
+async def test_incompressible_content_types_are_left_alone():
+    headers, bodies = await _call(_app([BODY], content_type=b"image/png"))
+    assert "content-encoding" not in headers
+    assert bodies[0]["body"] == BODY
+
+
+async def test_routes_can_opt_out():
+    headers, bodies = await _call(_app([BODY]), policy=CompressionPolicy(enabled=False))
+    assert "content-encoding" not in headers
+    assert bodies[0]["body"] == BODY
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.hashing import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+def _die_once(marker: str) -> str:
+    """Run in a pool worker: kill it the first time, like an OOM kill would."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def _fail() -> None:
+    raise ValueError("bad hash")
+
+
+async def test_jobs_beyond_the_queue_get_a_503():
+    hasher = PasswordHasher(max_workers=1, queue_size=1)
+    hasher._executor = ThreadPoolExecutor(1)
+    release = threading.Event()
+    try:
+        running = [asyncio.create_task(hasher._run("hash", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert hasher.get_stats()["queue_depth"] == 1
+
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher._run("hash", release.wait)
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers == {"Retry-After": "1"}
+
+        # Warmup and bulk jobs are not bounded
+        unbounded = asyncio.create_task(hasher._run("warmup", release.wait, bounded=False))
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(*running, unbounded)
+    finally:
+        release.set()
+        hasher.shutdown()
+
+    stats = hasher.get_stats()
+    assert (stats["submitted"], stats["completed"], stats["failed"], stats["rejected"]) == (3, 3, 0, 1)
+    assert stats["in_flight"] == 0
+
+
+async def test_failed_jobs_are_not_counted_as_completed():
+    hasher = PasswordHasher(max_workers=1)
+    hasher._executor = ThreadPoolExecutor(1)
+    try:
+        with pytest.raises(ValueError):
+            await hasher._run("verify", _fail)
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.get_stats()
+    assert (stats["completed"], stats["failed"], stats["in_flight"]) == (0, 1, 0)
+
+
+async def test_pool_is_replaced_when_a_worker_dies(tmp_path):
+    hasher = PasswordHasher(max_workers=1)
+    try:
+        broken = hasher._get_executor()
+        assert await hasher._run("hash", _die_once, str(tmp_path / "died")) == "ok"
+        assert hasher._executor is not broken
+        # The new pool keeps serving jobs
+        assert await hasher.hash("password123")
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.get_stats()
+    assert (stats["restarts"], stats["completed"], stats["failed"]) == (1, 2, 0)
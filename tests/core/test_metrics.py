@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.core.metrics import MetricsExporter, Registry, merge_snapshots, render
+
+
+def _worker_registry(jobs: int, lag: float, latencies: list) -> Registry:
+    registry = Registry()
+    registry.counter("test_jobs_total", "Jobs.", ["outcome"]).inc("ok", amount=jobs)
+    histogram = registry.histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in latencies:
+        histogram.observe(value)
+    registry.callback("test_in_flight", "In flight.", "gauge", lambda: {(): 2})
+    registry.callback("test_lag_seconds", "Lag.", "gauge", lambda: {("0",): lag}, ["replica"], aggregate="max")
+    return registry
+
+
+def test_render_single_process():
+    text = render(merge_snapshots([_worker_registry(3, 0.5, [0.05, 0.5, 5]).snapshot()]))
+
+    assert "# TYPE test_jobs_total counter" in text
+    assert 'test_jobs_total{outcome="ok"} 3' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_latency_seconds_count 3" in text
+    assert "test_latency_seconds_sum 5.55" in text
+
+
+def test_snapshots_are_summed_except_max_gauges():
+    merged = merge_snapshots([
+        _worker_registry(3, 0.5, [0.05]).snapshot(),
+        _worker_registry(4, 2.5, [0.5]).snapshot(),
+    ])
+
+    assert merged["test_jobs_total"]["samples"] == {("ok",): 7}
+    assert merged["test_latency_seconds"]["samples"][()] == [1, 1, 0, 0.55]
+    assert merged["test_in_flight"]["samples"] == {(): 4}
+    assert merged["test_lag_seconds"]["samples"] == {("0",): 2.5}
+
+
+def test_callbacks_validate_their_aggregation():
+    registry = Registry()
+    with pytest.raises(ValueError):
+        registry.callback("test_total", "Total.", "counter", dict, aggregate="max")
+    with pytest.raises(ValueError):
+        registry.callback("test_gauge", "Gauge.", "gauge", dict, aggregate="avg")
+
+
+def test_failing_callbacks_report_no_samples():
+    registry = Registry()
+    registry.callback("test_broken", "Broken.", "gauge", lambda: 1 / 0)
+    assert registry.snapshot()["metrics"]["test_broken"]["samples"] == []
+
+
+def test_collect_merges_live_workers_and_skips_other_files(tmp_path):
+    finished = subprocess.Popen([sys.executable, "-c", "pass"])
+    finished.wait()
+    for pid, jobs in ((os.getppid(), 5), (finished.pid, 100)):
+        snapshot = _worker_registry(jobs, 1.0, []).snapshot()
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(snapshot))
+    (tmp_path / "metrics-backup.json").write_text("{}")
+    (tmp_path / "metrics-.json").write_text("{}")
+    (tmp_path / f"metrics-{os.getppid()}.json.tmp").write_text("partial")
+    (tmp_path / "README").write_text("stray")
+
+    text = MetricsExporter(str(tmp_path)).collect()
+
+    # Only the live worker counts; the exited one is gone with its process
+    assert 'test_jobs_total{outcome="ok"} 5' in text
@@ -0,0 +1,72 @@
+import pytest
+
+from app import crud
+from app.core import principal as principal_module
+from app.core.principal import Principal, PrincipalCache, principal_cache
+from app.db.session import SessionLocal
+from tests.conftest import ADMIN_EMAIL
+
+pytestmark = pytest.mark.anyio
+
+
+def _principal(id: int, email: str = "user@example.com") -> Principal:
+    return Principal(id=id, email=email, role="user", is_active=True)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_module.time, "monotonic", lambda: now[0])
+    cache = PrincipalCache(ttl_seconds=60)
+    cache.set(_principal(1))
+
+    now[0] += 59
+    assert cache.get(1) == _principal(1)
+    now[0] += 1
+    assert cache.get(1) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PrincipalCache(max_entries=2)
+    cache.set(_principal(1))
+    cache.set(_principal(2))
+    cache.get(1)
+    cache.set(_principal(3))
+
+    assert cache.get(2) is None
+    assert cache.get(1) and cache.get(3)
+    assert cache.get_stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("settings", [{"max_entries": 0}, {"ttl_seconds": 0}])
+def test_cache_can_be_disabled(settings):
+    cache = PrincipalCache(**settings)
+    cache.set(_principal(1))
+    assert cache.get(1) is None
+
+
+@pytest.mark.parametrize("change", [{"role": "admin"}, {"is_active": False}, {"email": "moved@example.com"}])
+async def test_user_changes_invalidate_on_commit(db_engine, change):
+    async with SessionLocal() as db:
+        user = await crud.user.get_by_email(db, email=ADMIN_EMAIL)
+        original = {key: getattr(user, key) for key in change}
+        principal_cache.set(Principal.from_user(user))
+
+        await crud.user.update(db, db_obj=user, obj_in=change)
+        # A concurrent request may still read the committed row until then
+        assert principal_cache.get(user.id) is not None
+        await db.commit()
+        assert principal_cache.get(user.id) is None
+
+        await crud.user.update(db, db_obj=user, obj_in=original)
+        await db.commit()
+
+
+async def test_rolled_back_changes_keep_the_entry(db_engine):
+    async with SessionLocal() as db:
+        user = await crud.user.get_by_email(db, email=ADMIN_EMAIL)
+        cached = principal_cache.set(Principal.from_user(user))
+        await crud.user.update(db, db_obj=user, obj_in={"name": "Rolled back"})
+        await db.rollback()
+
+    assert principal_cache.get(cached.id) == cached
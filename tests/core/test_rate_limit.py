@@ -0,0 +1,79 @@
+import asyncio
+import multiprocessing
+import sys
+import time
+
+import pytest
+
+from app.core.rate_limit import MemoryBackend, RateLimit, SharedMemoryBackend, create_backend, default_shm_path
+
+# Slow refill, so no token comes back while the test runs
+LIMIT = "10/hour"
+
+
+def _hit(path: str, attempts: int) -> int:
+    """Run in a worker process: hit one shared bucket, return how many hits were allowed."""
+    backend = SharedMemoryBackend(path)
+    limit = RateLimit.parse(LIMIT)
+
+    async def hits() -> int:
+        allowed = 0
+        for _ in range(attempts):
+            ok, _, _ = await backend.hit("10.0.0.1:/v1/auth/login", limit, time.time())
+            allowed += ok
+        return allowed
+
+    return asyncio.run(hits())
+
+
+def test_shared_memory_buckets_are_shared_between_processes(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        allowed = pool.starmap(_hit, [(path, 15), (path, 15)])
+
+    assert sum(allowed) == 10
+    # The bucket is still empty for this process too
+    assert _hit(path, 1) == 0
+
+
+def test_shared_memory_keys_are_independent(tmp_path):
+    backend = SharedMemoryBackend(str(tmp_path / "ratelimit"))
+    limit = RateLimit.parse("2/hour")
+
+    async def hits(key: str) -> list:
+        return [(await backend.hit(key, limit, time.time()))[0] for _ in range(3)]
+
+    assert asyncio.run(hits("a")) == [True, True, False]
+    assert asyncio.run(hits("b")) == [True, True, False]
+
+
+def test_memory_backend_is_per_process_and_refills():
+    backend = MemoryBackend()
+    limit = RateLimit.parse("1/second")
+    now = time.time()
+
+    async def hit(at: float) -> bool:
+        return (await backend.hit("key", limit, at))[0]
+
+    assert asyncio.run(hit(now))
+    assert not asyncio.run(hit(now + 0.1))
+    assert asyncio.run(hit(now + 1.1))
+
+
+@pytest.mark.parametrize("value", ["5", "5/fortnight", "x/minute"])
+def test_invalid_limits_are_rejected(value):
+    with pytest.raises(ValueError):
+        RateLimit.parse(value)
+
+
+def test_default_shm_files_are_namespaced(monkeypatch):
+    ratelimit, sticky = default_shm_path("ratelimit"), default_shm_path("replica-sticky")
+    assert ratelimit != sticky
+
+    monkeypatch.setattr("app.core.rate_limit.settings.DATABASE_URL", "sqlite:///./other.db")
+    assert default_shm_path("ratelimit") != ratelimit
+
+
+def test_shm_falls_back_to_memory_without_fcntl(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "fcntl", None)  # import fcntl raises ImportError
+    assert isinstance(create_backend(f"shm://{tmp_path / 'ratelimit'}"), MemoryBackend)
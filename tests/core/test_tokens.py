@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+from app.core.tokens import AsymmetricKey, TokenCodec, TokenError, generate_key
+
+
+def _claims() -> dict:
+    return {"sub": "1", "exp": int(time.time()) + 60, "type": "access"}
+
+
+@pytest.fixture(scope="module")
+def key() -> AsymmetricKey:
+    return AsymmetricKey.from_pem(generate_key("EdDSA"))
+
+
+def test_hmac_tokens_accepted_during_switch(key):
+    hmac_token = TokenCodec("secret").encode(_claims())
+    codec = TokenCodec("secret", keys=[key])
+    assert codec.decode(hmac_token)["sub"] == "1"
+
+
+def test_hmac_tokens_rejected_when_turned_off(key):
+    hmac_token = TokenCodec("secret").encode(_claims())
+    codec = TokenCodec("secret", keys=[key], accept_hmac=False)
+    assert codec.decode(codec.encode(_claims()))["sub"] == "1"
+    with pytest.raises(TokenError):
+        codec.decode(hmac_token)
+    with pytest.raises(TokenError):
+        codec.verify(hmac_token)
+
+
+def test_hmac_only_setup_ignores_the_flag():
+    codec = TokenCodec("secret", accept_hmac=False)
+    assert codec.decode(codec.encode(_claims()))["sub"] == "1"
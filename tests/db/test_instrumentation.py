@@ -0,0 +1,95 @@
+import logging
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+
+from app.db import instrumentation
+from app.db.instrumentation import QueryBudgetExceeded, QueryInstrumentationMiddleware, parameters_shape, query_budget
+from app.db.session import SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+
+def _app(**options) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryInstrumentationMiddleware, **options)
+
+    @app.get("/repeated")
+    async def repeated(times: int = 4):
+        async with SessionLocal() as db:
+            for user_id in range(times):
+                await db.execute(text("SELECT id FROM users WHERE id = :id"), {"id": user_id})
+            await db.execute(text("SELECT count(*) FROM users"))
+        return {}
+
+    @app.get("/budgeted", dependencies=[Depends(query_budget(2))])
+    async def budgeted():
+        async with SessionLocal() as db:
+            for _ in range(3):
+                await db.execute(text("SELECT 1"))
+        return {}
+
+    return app
+
+
+async def _get(app: FastAPI, path: str, **params) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, params=params)
+
+
+@pytest.fixture
+def caplog_instrumentation(caplog, monkeypatch):
+    # Alembic's logging setup in the database fixture disables existing loggers
+    monkeypatch.setattr(instrumentation.logger, "disabled", False)
+    caplog.set_level(logging.WARNING, logger=instrumentation.logger.name)
+    return caplog
+
+
+async def test_repeated_statements_are_reported(db_engine, caplog_instrumentation):
+    response = await _get(_app(n_plus_one_threshold=3, debug_headers=True), "/repeated")
+
+    assert response.headers["X-DB-Queries"] == "5"
+    assert response.headers["X-DB-N-Plus-One"] == "1"
+    assert float(response.headers["X-DB-Time-Ms"]) > 0
+    warnings = [record.getMessage() for record in caplog_instrumentation.records]
+    assert len(warnings) == 1
+    assert warnings[0].startswith("Possible N+1 in GET /repeated: statement ran 4 times: SELECT id FROM users")
+
+
+async def test_statements_below_the_threshold_are_not_reported(db_engine, caplog_instrumentation):
+    response = await _get(_app(n_plus_one_threshold=3, debug_headers=True), "/repeated", times=2)
+
+    assert response.headers["X-DB-N-Plus-One"] == "0"
+    assert not caplog_instrumentation.records
+
+
+async def test_debug_headers_are_off_by_default(db_engine):
+    response = await _get(_app(), "/repeated")
+    assert "X-DB-Queries" not in response.headers
+
+
+async def test_route_budget_raises_outside_production(db_engine):
+    with pytest.raises(QueryBudgetExceeded):
+        await _get(_app(), "/budgeted")
+
+
+async def test_budget_is_only_logged_in_production(db_engine, monkeypatch, caplog_instrumentation):
+    monkeypatch.setattr(instrumentation.settings, "ENVIRONMENT", "production")
+    response = await _get(_app(), "/budgeted")
+
+    assert response.status_code == 200
+    messages = [record.getMessage() for record in caplog_instrumentation.records]
+    assert messages == ["Query budget of 2 exceeded by: SELECT 1"]
+
+
+async def test_app_wide_budget(db_engine):
+    with pytest.raises(QueryBudgetExceeded):
+        await _get(_app(budget=4), "/repeated")
+
+
+def test_parameter_shapes_hide_values():
+    assert parameters_shape({"email": "a@example.com", "id": 1}) == "{email: str, id: int}"
+    assert parameters_shape(("secret", 2.5)) == "(str, float)"
+    assert parameters_shape([("a", 1), ("b", 2)], executemany=True) == "2 x (str, int)"
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import crud
+from app.db import maintenance
+from app.db.session import SessionLocal
+from app.models.token import Token
+from tests.conftest import ADMIN_EMAIL
+
+pytestmark = pytest.mark.anyio
+
+
+async def _add_tokens(db, user_id: int, **counts: int) -> None:
+    now = datetime.utcnow()
+    kinds = {
+        "expired": (now - timedelta(minutes=1), False),
+        "blacklisted": (now + timedelta(days=1), True),
+        "valid": (now + timedelta(days=1), False),
+    }
+    for kind, count in counts.items():
+        expires, blacklisted = kinds[kind]
+        for i in range(count):
+            token = await crud.token.create(db, f"purge-{kind}-{i}-{now}", user_id, "refresh", expires)
+            token.blacklisted = blacklisted
+    await db.commit()
+
+
+async def test_purge_tokens_deletes_expired_and_blacklisted_in_batches(db_engine):
+    async with SessionLocal() as db:
+        await maintenance.purge_tokens(db)
+        admin = await crud.user.get_by_email(db, email=ADMIN_EMAIL)
+        await _add_tokens(db, admin.id, expired=3, blacklisted=2, valid=2)
+        kept = set(await db.scalars(select(Token.id)))
+
+        result = await maintenance.purge_tokens(db, batch_size=2)
+
+        assert (result.rows_deleted, result.batches, result.partitions_dropped) == (5, 3, [])
+        remaining = set(await db.scalars(select(Token.id)))
+        assert len(remaining) == len(kept) - 5
+        assert all(token.expires > datetime.utcnow() and not token.blacklisted
+                   for token in await db.scalars(select(Token)))
+
+
+@pytest.mark.parametrize("deleted, rows, batches", [
+    ([2, 2, 1], 5, 3),  # stops after a partial batch
+    ([2, 2, 0], 4, 2),  # or on the first empty one
+    ([0], 0, 0),
+])
+async def test_delete_in_batches_commits_each_batch(db_engine, deleted, rows, batches):
+    calls = iter(deleted)
+    commits = 0
+
+    class Session:
+        async def commit(self):
+            nonlocal commits
+            commits += 1
+
+    async def delete_batch():
+        return next(calls)
+
+    result = maintenance.PurgeResult()
+    await maintenance._delete_in_batches(Session(), result, delete_batch, batch_size=2)
+
+    assert (result.rows_deleted, result.batches) == (rows, batches)
+    assert commits == len(deleted)
+
+
+async def test_partitioning_needs_postgres(db_engine):
+    async with SessionLocal() as db:
+        assert not await maintenance.tokens_is_partitioned(db)
+        with pytest.raises(RuntimeError):
+            await maintenance.partition_tokens_table(db)
+
+
+def test_partition_months():
+    assert maintenance._month_start(datetime(2026, 3, 31, 23, 59)) == datetime(2026, 3, 1)
+    assert maintenance._next_month(datetime(2026, 12, 15)) == datetime(2027, 1, 1)
+    assert maintenance._next_month(datetime(2026, 1, 31)) == datetime(2026, 2, 1)
+
+
+async def test_periodic_purge_survives_failures(db_engine, monkeypatch, caplog):
+    runs = []
+
+    async def purge_tokens(db, batch_size):
+        runs.append(batch_size)
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(maintenance, "purge_tokens", purge_tokens)
+    # Alembic's logging setup in the database fixture disables existing loggers
+    monkeypatch.setattr(maintenance.logger, "disabled", False)
+    task = asyncio.create_task(maintenance._run_periodically(maintenance.purge_tokens, 0.01, 7))
+    while len(runs) < 3:
+        await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert runs[:3] == [7, 7, 7]
+    assert "purge_tokens failed" in caplog.text
+
+
+async def test_outbox_purge_command(db_engine, capsys):
+    await maintenance.main(["purge-outbox", "--batch-size", "10"])
+    assert capsys.readouterr().out.startswith("Removed ")
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app.db import migrations
+
+
+def test_models_match_migrations(database):
+    """Autogenerate finds nothing to do, so the objects created by hand in migrations are left alone."""
+    config = Config(migrations.ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(migrations.ROOT, "alembic"))
+    command.check(config)
+
+
+def test_quick_check_sees_the_migrated_database(database):
+    assert migrations.is_up_to_date(os.environ["DATABASE_URL"])
+
+
+def _revision(directory, name: str, down_revision: str) -> None:
+    (directory / f"{name}_migration.py").write_text(
+        f'"""{name}"""\nrevision = "{name}"\ndown_revision = {down_revision}\n'
+    )
+
+
+def test_script_heads_follow_merge_revisions(tmp_path):
+    _revision(tmp_path, "a1", "None")
+    _revision(tmp_path, "b2", "'a1'")
+    _revision(tmp_path, "c3", "'a1'")
+    assert migrations.script_heads(str(tmp_path)) == {"b2", "c3"}
+
+    _revision(tmp_path, "d4", "('b2', 'c3')")
+    assert migrations.script_heads(str(tmp_path)) == {"d4"}
+
+    (tmp_path / "broken.py").write_text("revision = make_revision()\n")
+    assert migrations.script_heads(str(tmp_path)) is None
+
+
+def test_quick_check_reads_the_stamped_revision(tmp_path):
+    path = tmp_path / "stale.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)")
+    connection.execute("INSERT INTO alembic_version VALUES ('0000old')")
+    connection.commit()
+    connection.close()
+
+    assert migrations.database_revisions(f"sqlite:///{path}") == {"0000old"}
+    assert not migrations.is_up_to_date(f"sqlite:///{path}")
+
+
+@pytest.mark.parametrize("url", ["sqlite:///does/not/exist.db", "sqlite://", "mysql://localhost/app"])
+def test_quick_check_defers_to_alembic_when_unsure(url):
+    assert migrations.database_revisions(url) is None
+    assert not migrations.is_up_to_date(url)
+
+
+def test_upgrade_skips_alembic_on_a_current_schema(database, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("Alembic should not run")
+
+    monkeypatch.setattr(command, "upgrade", fail)
+    assert migrations.upgrade() is False
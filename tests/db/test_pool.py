@@ -0,0 +1,86 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db import pool as pool_module
+from app.db.pool import MonitoredQueuePool, pool_limits, pool_options
+from app.db.session import get_async_database_url
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("workers, worker_connections, max_connections, expected", [
+    (1, 20, 90, (10, 10)),
+    (4, 20, 90, (10, 10)),
+    (8, 20, 90, (5, 6)),  # 11 per worker fit in 90
+    (100, 20, 90, (1, 0)),  # always at least one
+    (2, 7, None, (3, 4)),
+])
+def test_pool_limits(workers, worker_connections, max_connections, expected):
+    assert pool_limits(workers, worker_connections, max_connections) == expected
+
+
+def test_pool_size_does_not_follow_the_threadpool(monkeypatch):
+    monkeypatch.setattr(pool_module.settings, "WEB_CONCURRENCY", 2)
+    monkeypatch.setattr(pool_module.settings, "DB_WORKER_CONNECTIONS", 6)
+    monkeypatch.setattr(pool_module.settings, "DB_MAX_CONNECTIONS", None)
+    url = get_async_database_url("sqlite:///./pool.db")
+
+    for threads in (1, 200):
+        monkeypatch.setattr(pool_module.settings, "THREADPOOL_SIZE", threads)
+        options = pool_options(url)
+        assert (options["pool_size"], options["max_overflow"]) == (3, 3)
+
+    monkeypatch.setattr(pool_module.settings, "DB_POOL_SIZE", 9)
+    assert pool_options(url)["pool_size"] == 9
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MonitoredQueuePool, pool_size=4, max_overflow=0, pool_recycle=1000,
+    )
+    yield engine
+    await engine.dispose()
+
+
+async def _use(engine, connections: int = 1) -> None:
+    opened = [await engine.connect() for _ in range(connections)]
+    for connection in opened:
+        await connection.execute(text("SELECT 1"))
+        await connection.close()
+
+
+async def test_connections_are_only_pinged_after_idling(engine):
+    pool = engine.sync_engine.pool
+    pool.liveness_idle_seconds = 3600
+    for _ in range(3):
+        await _use(engine)
+    assert pool.get_stats()["liveness_checks"] == 0
+
+    pool.liveness_idle_seconds = 0
+    await _use(engine)
+    stats = pool.get_stats()
+    assert (stats["liveness_checks"], stats["liveness_failures"], stats["checkouts"]) == (1, 0, 4)
+
+
+async def test_recycle_deadlines_are_jittered(engine, monkeypatch):
+    records = []
+    event.listen(engine.sync_engine.pool, "checkin", lambda dbapi_connection, record: records.append(record))
+    await _use(engine, connections=4)
+
+    deadlines = {record.info["recycle_after"] for record in records}
+    assert len(deadlines) == 4
+    assert all(1000 * (1 - pool_module.RECYCLE_JITTER) <= deadline <= 1000 for deadline in deadlines)
+
+    # Past its own deadline, a connection is reopened on checkout
+    later = time.time() + 1000
+    monkeypatch.setattr(pool_module, "time", SimpleNamespace(
+        time=lambda: later, monotonic=time.monotonic, perf_counter=time.perf_counter,
+    ))
+    await _use(engine)
+    assert engine.sync_engine.pool.get_stats()["recycled"] == 1
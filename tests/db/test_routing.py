@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.rate_limit import SharedMemoryBackend
+from app.db.base import Base
+from app.db.routing import ReplicaRouter, RoutingSession
+from app.models.user import User
+
+pytestmark = pytest.mark.anyio
+
+
+async def _database(path: str, name: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            text("INSERT INTO users (id, email, name, hashed_password) VALUES (1, 'a@example.com', :name, 'x')"),
+            {"name": name},
+        )
+    return engine
+
+
+async def _copy_heartbeat(primary, replica, age: timedelta = timedelta(0)) -> None:
+    """Replicate the heartbeat row, `age` older than on the primary."""
+    async with primary.connect() as conn:
+        updated_at = await conn.scalar(text("SELECT updated_at FROM replication_heartbeat"))
+    async with replica.begin() as conn:
+        await conn.execute(text("DELETE FROM replication_heartbeat"))
+        await conn.execute(
+            text("INSERT INTO replication_heartbeat (id, updated_at) VALUES (1, :updated_at)"),
+            {"updated_at": datetime.fromisoformat(str(updated_at)) - age},
+        )
+
+
+@pytest.fixture
+async def databases(tmp_path):
+    """A primary and two stale replicas, each a SQLite file."""
+    primary = await _database(tmp_path / "primary.db", "Updated")
+    replicas = [await _database(tmp_path / f"replica{i}.db", f"Replica {i}") for i in range(2)]
+    yield primary, replicas
+    for engine in (primary, *replicas):
+        await engine.dispose()
+
+
+def _sessions(router: ReplicaRouter):
+    return async_sessionmaker(
+        bind=router.primary, sync_session_class=RoutingSession, router=router, expire_on_commit=False
+    )
+
+
+async def _name(db) -> str:
+    return await db.scalar(select(User.name).where(User.id == 1))
+
+
+async def test_reads_use_one_replica_per_session_and_writes_use_primary(databases):
+    primary, replicas = databases
+    router = ReplicaRouter(primary, replicas, max_lag_seconds=5)
+    await router.check()
+    for replica in replicas:
+        await _copy_heartbeat(primary, replica)
+    await router.check()
+    sessions = _sessions(router)
+
+    for _ in range(4):
+        async with sessions(info={"use_replica": True}) as db:
+            names = {await _name(db) for _ in range(5)}
+            assert len(names) == 1 and names.pop().startswith("Replica")
+
+    async with sessions(info={"use_replica": False}) as db:
+        assert await _name(db) == "Updated"
+
+    # Once a session writes, its later reads go to the primary
+    async with sessions(info={"use_replica": True}) as db:
+        await db.execute(update(User).where(User.id == 1).values(role="admin"))
+        assert await _name(db) == "Updated"
+        assert db.info["wrote"]
+    assert router.get_stats()["replica_sessions"] == 4
+
+
+async def test_lagging_or_missing_replicas_fall_back_to_primary(databases):
+    primary, replicas = databases
+    router = ReplicaRouter(primary, replicas[:1], max_lag_seconds=5)
+    sessions = _sessions(router)
+
+    # No heartbeat replicated yet: lag unknown
+    await router.check()
+    assert router.lag == [None]
+    async with sessions(info={"use_replica": True}) as db:
+        assert await _name(db) == "Updated"
+
+    await _copy_heartbeat(primary, replicas[0], age=timedelta(seconds=60))
+    await router.check()
+    assert router.lag[0] > 5
+    async with sessions(info={"use_replica": True}) as db:
+        assert await _name(db) == "Updated"
+
+    await _copy_heartbeat(primary, replicas[0])
+    await router.check()
+    assert router.lag[0] <= 5
+    async with sessions(info={"use_replica": True}) as db:
+        assert await _name(db) == "Replica 0"
+    assert router.get_stats()["fallback_sessions"] == 2
+
+
+async def test_flushed_rows_record_their_users(databases):
+    primary, replicas = databases
+    router = ReplicaRouter(primary, replicas)
+    async with _sessions(router)() as db:
+        user = await db.get(User, 1)
+        user.name = "Renamed"
+        await db.flush()
+        assert db.info["written_user_ids"] == {1}
+
+
+async def test_sticky_window_is_shared_between_workers(databases, tmp_path):
+    primary, replicas = databases
+    path = str(tmp_path / "sticky")
+    worker_a = ReplicaRouter(primary, replicas, sticky_seconds=60, sticky_store=SharedMemoryBackend(path))
+    worker_b = ReplicaRouter(primary, replicas, sticky_seconds=60, sticky_store=SharedMemoryBackend(path))
+
+    await worker_a.mark_write([7])
+    assert await worker_b.is_sticky(7)
+    assert not await worker_b.is_sticky(8)
+
+    # Expired windows no longer apply
+    await worker_a.sticky_store.set_deadline("sticky:user:7", 0)
+    assert not await worker_b.is_sticky(7)
@@ -0,0 +1,51 @@
+import os
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.startup import startup_report
+from app.main import create_app
+
+pytestmark = pytest.mark.anyio
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_each_app_has_its_own_middleware_and_exporter(db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN", "1/minute")
+    metric_names = set(registry.metrics)
+    first, second = create_app(), create_app()
+
+    assert first is not second
+    assert first.state.metrics_exporter is not second.state.metrics_exporter
+    # Registering the callbacks again replaces them
+    assert set(registry.metrics) == metric_names
+
+    login = {"email": "nobody@example.com", "password": "password123"}
+    async with _client(first) as client:
+        assert (await client.post("/v1/auth/login", json=login)).status_code == 401
+        assert (await client.post("/v1/auth/login", json=login)).status_code == 429
+    async with _client(second) as client:
+        # Rate limit buckets belong to the app that was built with them
+        assert (await client.post("/v1/auth/login", json=login)).status_code == 401
+        metrics = (await client.get("/metrics")).text
+    assert 'password_hash_jobs_total{outcome="submitted"}' in metrics
+
+
+async def test_lifespan_warms_up_and_stops_its_tasks(db_engine, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "EMAIL_POLL_INTERVAL_SECONDS", 0)
+    app = create_app()
+
+    async with app.router.lifespan_context(app):
+        phases = startup_report.get_stats()
+        assert {"warm database pool", "warm JWT signing", "start password hashing workers"} <= set(phases)
+        assert os.path.exists(app.state.metrics_exporter.path)
+
+    # A stopped worker's snapshot is removed, even if its exporter task never ran
+    assert not os.path.exists(app.state.metrics_exporter.path)
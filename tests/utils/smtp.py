@@ -0,0 +1,67 @@
+import socketserver
+import threading
+from typing import Dict, List, Tuple
+
+
+class SmtpStub:
+    """
+    Minimal SMTP server on a free local port, served from a thread. Keeps
+    the messages it accepts; `replies` maps a recipient to the reply sent
+    at the end of DATA instead of "250", e.g. "451 Try later".
+    """
+
+    def __init__(self) -> None:
+        self.messages: List[Tuple[List[str], str]] = []
+        self.replies: Dict[str, str] = {}
+        self.connections = 0
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str) -> None:
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self) -> None:
+                stub.connections += 1
+                recipients: List[str] = []
+                self.reply("220 stub ESMTP")
+                for raw in self.rfile:
+                    command = raw.decode().strip()
+                    verb = command[:4].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.reply("250 stub")
+                    elif verb == "MAIL":
+                        recipients = []
+                        self.reply("250 OK")
+                    elif verb == "RCPT":
+                        recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        lines = []
+                        for line in self.rfile:
+                            if line in (b".\r\n", b".\n"):
+                                break
+                            lines.append(line.decode())
+                        failure = next((stub.replies[r] for r in recipients if r in stub.replies), None)
+                        if failure:
+                            self.reply(failure)
+                        else:
+                            stub.messages.append((recipients, "".join(lines)))
+                            self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:  # RSET, NOOP
+                        self.reply("250 OK")
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def __enter__(self) -> "SmtpStub":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,25 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg2
+
+from app import models
+from app.utils.counting import explain_statement
+
+SEARCH = "o'k:%x"
+
+
+def _query():
+    return select(models.User.id).where(models.User.name.ilike(f"%{SEARCH}%")).order_by(models.User.id)
+
+
+def test_explain_keeps_positional_parameters_bound():
+    statement, params = explain_statement(_query(), asyncpg.dialect())
+    assert statement.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert SEARCH not in statement and "$1" in statement
+    assert "ORDER BY" not in statement
+    assert params == (f"%{SEARCH}%",)
+
+
+def test_explain_keeps_named_parameters_bound():
+    statement, params = explain_statement(_query(), psycopg2.dialect())
+    assert SEARCH not in statement and "%(name_1)s" in statement
+    assert params == {"name_1": f"%{SEARCH}%"}
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from app import crud
+from app.core.config import settings
+from app.db.maintenance import purge_outbox
+from app.db.session import SessionLocal
+from app.models.email import OutboxEmail
+from app.utils.email import EmailSender, SmtpTransport
+from tests.utils.smtp import SmtpStub
+
+pytestmark = pytest.mark.anyio
+
+RETRY_BASE_SECONDS = 30
+
+
+@pytest.fixture
+def smtp():
+    with SmtpStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+async def outbox(db_engine):
+    async with SessionLocal() as db:
+        await db.execute(delete(OutboxEmail))
+        await db.commit()
+
+
+def _sender(smtp: SmtpStub, max_attempts: int = 8) -> EmailSender:
+    transport = SmtpTransport("127.0.0.1", smtp.port, None, None, "noreply@example.com")
+    return EmailSender(transport, batch_size=10, max_attempts=max_attempts, retry_base_seconds=RETRY_BASE_SECONDS)
+
+
+async def _enqueue(*recipients: str) -> None:
+    async with SessionLocal() as db:
+        for recipient in recipients:
+            await crud.email_outbox.enqueue(db, recipient=recipient, subject="Hello", body=f"Hi {recipient}")
+        await db.commit()
+
+
+async def _messages() -> dict:
+    async with SessionLocal() as db:
+        return {message.recipient: message for message in (await db.scalars(select(OutboxEmail))).all()}
+
+
+async def _make_due(recipient: str) -> None:
+    async with SessionLocal() as db:
+        await db.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.recipient == recipient)
+            .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+
+def _assert_retry_in(message: OutboxEmail, seconds: float) -> None:
+    # Jittered by +-20%, measured from around now
+    delay = (message.next_attempt_at - datetime.utcnow()).total_seconds()
+    assert seconds * 0.8 - 5 <= delay <= seconds * 1.2
+
+
+async def test_batch_is_delivered_over_one_connection(outbox, smtp):
+    await _enqueue("a@example.com", "b@example.com", "c@example.com")
+    sender = _sender(smtp)
+
+    assert await sender.process_batch() == 3
+    sender.transport.close()
+
+    assert sorted(recipients[0] for recipients, _ in smtp.messages) == ["a@example.com", "b@example.com", "c@example.com"]
+    assert "Subject: Hello" in smtp.messages[0][1]
+    assert smtp.connections == 1
+    messages = await _messages()
+    assert {message.status for message in messages.values()} == {"sent"}
+    assert all(message.body == "" and message.sent_at for message in messages.values())
+    assert sender.get_stats() == {"sent": 3, "retried": 0, "failed": 0}
+
+
+async def test_temporary_failures_are_retried_with_backoff(outbox, smtp):
+    smtp.replies["busy@example.com"] = "451 Try again later"
+    await _enqueue("busy@example.com")
+    sender = _sender(smtp)
+
+    assert await sender.process_batch() == 1
+    message = (await _messages())["busy@example.com"]
+    assert (message.status, message.attempts) == ("pending", 1)
+    assert "451" in message.last_error
+    _assert_retry_in(message, RETRY_BASE_SECONDS)
+
+    # Not due yet
+    assert await sender.process_batch() == 0
+
+    # The delay doubles with each failed attempt
+    await _make_due("busy@example.com")
+    assert await sender.process_batch() == 1
+    message = (await _messages())["busy@example.com"]
+    assert message.attempts == 2
+    _assert_retry_in(message, RETRY_BASE_SECONDS * 2)
+
+    # Delivered once the server accepts it again
+    del smtp.replies["busy@example.com"]
+    await _make_due("busy@example.com")
+    assert await sender.process_batch() == 1
+    sender.transport.close()
+    message = (await _messages())["busy@example.com"]
+    assert (message.status, message.attempts, message.last_error) == ("sent", 3, None)
+    assert sender.get_stats() == {"sent": 1, "retried": 2, "failed": 0}
+
+
+async def test_permanent_failures_are_not_retried(outbox, smtp):
+    smtp.replies["bounce@example.com"] = "550 No such user"
+    await _enqueue("bounce@example.com", "ok@example.com")
+    sender = _sender(smtp)
+
+    assert await sender.process_batch() == 2
+    sender.transport.close()
+    messages = await _messages()
+    assert (messages["bounce@example.com"].status, messages["bounce@example.com"].attempts) == ("failed", 1)
+    assert messages["ok@example.com"].status == "sent"
+
+
+async def test_gives_up_after_max_attempts(outbox, smtp):
+    smtp.replies["busy@example.com"] = "451 Try again later"
+    await _enqueue("busy@example.com")
+    sender = _sender(smtp, max_attempts=2)
+
+    assert await sender.process_batch() == 1
+    await _make_due("busy@example.com")
+    assert await sender.process_batch() == 1
+    sender.transport.close()
+
+    message = (await _messages())["busy@example.com"]
+    assert (message.status, message.attempts) == ("failed", 2)
+    assert await sender.process_batch() == 0
+    assert sender.get_stats() == {"sent": 0, "retried": 1, "failed": 1}
+
+
+async def test_unreachable_server_is_retried(outbox, smtp):
+    await _enqueue("a@example.com")
+    sender = _sender(smtp)
+    sender.transport.port = 1  # nothing listens there
+
+    assert await sender.process_batch() == 1
+    message = (await _messages())["a@example.com"]
+    assert message.status == "pending" and message.last_error
+
+
+async def test_purge_removes_old_finished_messages(outbox):
+    await _enqueue("sent@example.com", "failed@example.com", "pending@example.com", "recent@example.com")
+    old = datetime.utcnow() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS + 1)
+    async with SessionLocal() as db:
+        for recipient, status in [
+            ("sent@example.com", "sent"), ("failed@example.com", "failed"), ("pending@example.com", "pending")
+        ]:
+            await db.execute(
+                update(OutboxEmail).where(OutboxEmail.recipient == recipient).values(status=status, created_at=old)
+            )
+        await db.execute(update(OutboxEmail).where(OutboxEmail.recipient == "recent@example.com").values(status="sent"))
+        await db.commit()
+
+    async with SessionLocal() as db:
+        result = await purge_outbox(db, batch_size=1)
+
+    assert (result.rows_deleted, result.batches) == (2, 2)
+    assert sorted(await _messages()) == ["pending@example.com", "recent@example.com"]
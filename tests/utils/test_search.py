@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import select
+
+from app import models
+from app.db.session import SessionLocal
+from app.utils import search
+
+pytestmark = pytest.mark.anyio
+
+USERS = [
+    ("Ann", "ann@search.test"),
+    ("Anna Karenina", "karenina@search.test"),
+    ("Joanne", "JO.ANNE@search.test"),
+    ("Bob", "bob@search.test"),
+    (None, "nameless@search.test"),
+    ("50% off_sale", "promo@search.test"),
+]
+
+
+@pytest.fixture
+async def users(db_engine):
+    async with SessionLocal() as db:
+        existing = set(await db.scalars(select(models.User.email).where(models.User.email.like("%@search.test"))))
+        for name, email in USERS:
+            if email not in existing:
+                db.add(models.User(name=name, email=email, hashed_password="x"))
+        await db.commit()
+        return {email: id for email, id in await db.execute(
+            select(models.User.email, models.User.id).where(models.User.email.like("%@search.test"))
+        )}
+
+
+async def _ids(scope: str, term: str, use_fts: bool) -> list:
+    async with SessionLocal() as db:
+        query = select(models.User.id).where(search.search_condition(scope, term, use_fts)).order_by(models.User.id)
+        return list(await db.scalars(query))
+
+
+async def test_fts_table_is_used_on_migrated_sqlite(users):
+    async with SessionLocal() as db:
+        assert await search.has_fts(db)
+
+
+@pytest.mark.parametrize("scope", ["name", "email", "all"])
+@pytest.mark.parametrize("term", ["ann", "ANN", "Anne", "a", "an", "jo.a", "@SEARCH.T", "% off", "_", "zzz"])
+async def test_fts_matches_ilike(users, scope, term):
+    assert await _ids(scope, term, use_fts=True) == await _ids(scope, term, use_fts=False)
+
+
+@pytest.mark.parametrize("term, uses_fts", [("a", False), ("an", False), ("ann", True)])
+def test_short_terms_skip_the_trigram_table(term, uses_fts):
+    condition = search.search_condition("all", term, use_fts=True)
+    assert ("users_fts" in str(condition.compile())) is uses_fts
+
+
+async def test_relevance_ranks_exact_then_prefix_then_substring(users):
+    rank = search.rank_expression("name", "ann", "sqlite")
+    async with SessionLocal() as db:
+        rows = await db.scalars(
+            select(models.User.email)
+            .where(search.search_condition("name", "ann", await search.has_fts(db)))
+            .order_by(rank.desc(), models.User.id)
+        )
+        assert list(rows) == ["ann@search.test", "karenina@search.test", "JO.ANNE@search.test"]